@@ -59,8 +59,17 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
+        'APP_DIRS': False,
         'OPTIONS': {
+            # Explicit cached loader: parsed templates are kept for the life of
+            # the process whatever DEBUG says (runserver still drops them when a
+            # template file changes). blog/apps.py fills it at startup.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -70,8 +79,37 @@ TEMPLATES = [
             ],
         },
     },
+    # Same templates/ directory, translated to Jinja2 at load time
+    # (blog/jinja2_env.py). Used only for the decks listed in
+    # DECK_TEMPLATE_ENGINES below.
+    {
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'NAME': 'jinja2',
+        'DIRS': [BASE_DIR / 'templates'],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'environment': 'blog.jinja2_env.environment',
+            'auto_reload': DEBUG,
+        },
+    },
 ]
 
+# Engine per deck template ("django" or "jinja2"); unlisted templates render
+# with Django. Check output parity first: manage.py check_jinja2_parity
+DECK_TEMPLATE_ENGINES = {
+    "volt.html": os.environ.get("VOLT_PDF_ENGINE", "django"),
+    "volt_Electricity.html": os.environ.get("VOLT_PDF_ENGINE", "django"),
+    "volt-electricity.html": os.environ.get("VOLT_DECK_ENGINE", "django"),
+    "volt-gas.html": os.environ.get("VOLT_DECK_ENGINE", "django"),
+}
+JINJA2_BYTECODE_CACHE_DIR = os.environ.get("JINJA2_BYTECODE_CACHE_DIR", str(BASE_DIR / '.jinja2_cache'))
+
+# Compile the deck templates when the app loads (blog/template_warmup.py):
+# the first request doesn't pay for parsing them, and a template syntax error
+# stops the process at startup. Web server processes only, not management
+# commands or render workers (blog/apps.py serves_requests).
+DECK_TEMPLATE_WARMUP = os.environ.get("DECK_TEMPLATE_WARMUP", "1") == "1"
+
 WSGI_APPLICATION = 'api.wsgi.application'
 
 
@@ -140,6 +178,115 @@ STAGING_MEDIA_URL = "/uploads/volt/staging/"
 PRODUCTION_MEDIA_URL = "/uploads/volt/production/"
 # MEDIA_URL = "/uploads/volt/"
 MEDIA_URL = "/media/"
+# Artifacts of hosts outside ARTIFACT_LOCATIONS (local dev). Its own directory:
+# everything under an artifact root is published, deduped and pruned.
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT") or os.path.join(BASE_DIR, "media")
+
+# Generated artifacts (blog/storage.py): media root + URL per CRM host; other
+# hosts use MEDIA_ROOT / MEDIA_URL. ARTIFACT_STORAGE = "s3" keeps that tree as
+# a local working copy and uploads every artifact in the background to an
+# S3-compatible bucket (endpoint_url can point at MinIO or a local stand-in),
+# serving it from public_url.
+ARTIFACT_LOCATIONS = {
+    "volt-crm.caansoft.com": (STAGING_MEDIA_ROOT, STAGING_MEDIA_URL),
+    "crm.volt-consulting.com": (PRODUCTION_MEDIA_ROOT, PRODUCTION_MEDIA_URL),
+}
+# Store identical artifacts once: content-addressed blobs under <root>/.blobs/
+# with the readable names as hard links.
+# `manage.py prune_artifacts` removes the blobs no name links to any more.
+ARTIFACT_DEDUPE = os.environ.get("ARTIFACT_DEDUPE", "1") == "1"
+# A generation that finds another one writing the same file name (same client,
+# society and day) writes <name>_v2, _v3, ... ("version") or waits for it and
+# replaces it ("wait"). Identical payloads coalesce in the render cache first.
+ARTIFACT_CONCURRENT_WRITES = os.environ.get("ARTIFACT_CONCURRENT_WRITES", "version")
+ARTIFACT_STORAGE = os.environ.get("ARTIFACT_STORAGE", "local")
+ARTIFACT_S3 = {
+    "bucket": os.environ.get("ARTIFACT_S3_BUCKET", ""),
+    "prefix": os.environ.get("ARTIFACT_S3_PREFIX", ""),
+    "public_url": os.environ.get("ARTIFACT_S3_PUBLIC_URL", ""),
+    "endpoint_url": os.environ.get("ARTIFACT_S3_ENDPOINT_URL") or None,
+    "region_name": os.environ.get("ARTIFACT_S3_REGION") or None,
+}
+# Retention (blog/retention.py, `manage.py prune_artifacts`): newest decks kept
+# per comparatif series, age of abandoned temp files, preview lifetime, and the
+# filesystem operations per second a run may use. ARTIFACT_RETENTION_INTERVAL
+# (seconds, 0 = off) runs it from a background thread instead of cron.
+ARTIFACT_RETENTION = {
+    "keep": int(os.environ.get("ARTIFACT_RETENTION_KEEP", "3")),
+    "tmp_age_seconds": int(os.environ.get("ARTIFACT_RETENTION_TMP_AGE", "3600")),
+    "preview_days": int(os.environ.get("ARTIFACT_RETENTION_PREVIEW_DAYS", "30")),
+    "io_rate": int(os.environ.get("ARTIFACT_RETENTION_IO_RATE", "200")),
+}
+ARTIFACT_RETENTION_INTERVAL = int(os.environ.get("ARTIFACT_RETENTION_INTERVAL", "0"))
+
+# Heavy render stages (PDF layout, charts, invoice rasterization) run in
+# supervised worker processes (blog/render_jobs.py): per-stage wall-clock
+# timeouts (seconds), a hard RSS kill limit, and recycling after N jobs or
+# once a worker's RSS stays above the recycle threshold.
+RENDER_JOBS_ENABLED = os.environ.get("RENDER_JOBS_ENABLED", "1") == "1"
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", "0")) or None
+RENDER_JOB_TIMEOUTS = {"pdf": 300, "preview": 120, "chart": 60, "invoice": 120}
+RENDER_WORKER_MAX_JOBS = 50
+RENDER_WORKER_RECYCLE_RSS_MB = 768
+RENDER_WORKER_MAX_RSS_MB = 2048
+
+# PDF rendering: lay each slide of a deck out on its own render worker and
+# merge the pages in order (blog/pdf_pipeline.py). Decks with fewer slides than
+# PDF_PARALLEL_MIN_SLIDES are always rendered in one pass.
+PDF_PARALLEL_RENDER = os.environ.get("PDF_PARALLEL_RENDER", "0") == "1"
+PDF_PARALLEL_MIN_SLIDES = 4
+
+# First-page/slide JPEG previews written to previews/ beside every deck.
+DECK_PREVIEW_COUNT = 1
+DECK_PREVIEW_WIDTH = 480
+
+# Saved HTML decks get .gz (and .br, if the brotli package is installed)
+# sidecars, refreshed on every edit, for nginx gzip_static/brotli_static.
+DECK_COMPRESSED_SIDECARS = True
+
+# Strip template whitespace and developer comments from saved HTML decks
+# (blog/html_minify.py); EDIT markers and contenteditable regions are kept
+# byte-exact so in-place editing keeps working.
+DECK_MINIFY_HTML = True
+
+# Saved HTML deck layout: "single" (one self-contained file) or "shell" (the
+# first DECK_SHELL_SLIDES slides inline, the others as <deck>.slides/slide-NN.html
+# fragments fetched while navigating). A payload "deckLayout" overrides it.
+DECK_HTML_LAYOUT = os.environ.get("DECK_HTML_LAYOUT", "single")
+DECK_SHELL_SLIDES = 1
+
+# In-house LLM (market analysis, invoice vision scans): one pooled keep-alive
+# session per process (blog/llm_client.py), at most LLM_POOL_MAXSIZE
+# connections to the host.
+LLM_API_BASE_URL = os.environ.get("LLM_API_BASE_URL", "https://gpt.caansoft.com/gpt")
+LLM_CONNECT_TIMEOUT = 10
+LLM_READ_TIMEOUT = 280
+LLM_POOL_MAXSIZE = int(os.environ.get("LLM_POOL_MAXSIZE", "8"))
+LLM_CONNECT_RETRIES = 2
+
+# Deck result cache (blog/render_cache.py): identical payloads posted again
+# within RENDER_CACHE_TIMEOUT get the already-generated artifact back. File
+# based so every worker process on the host shares it.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'render_results': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get("RENDER_CACHE_DIR", str(BASE_DIR / '.render_cache')),
+    },
+    # {% cache %} fragments of the static browser-deck slides (head/CSS, about,
+    # contract, contact, scripts), keyed by template version + their inputs.
+    'deck_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'deck-fragments',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+RENDER_CACHE_ENABLED = os.environ.get("RENDER_CACHE_ENABLED", "1") == "1"
+RENDER_CACHE_TIMEOUT = 24 * 60 * 60
+RENDER_CACHE_LOCK_DIR = os.environ.get("RENDER_CACHE_LOCK_DIR", str(BASE_DIR / '.render_locks'))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
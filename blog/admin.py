@@ -1,3 +1,12 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import GeneratedArtifact
+
+
+@admin.register(GeneratedArtifact)
+class GeneratedArtifactAdmin(admin.ModelAdmin):
+    list_display = ("path", "client_id", "comparatif_id", "energy_type", "kind", "size", "template_version",
+                    "created_at")
+    list_filter = ("kind", "energy_type", "template")
+    search_fields = ("client_id", "comparatif_id", "path", "sha256")
+    readonly_fields = ("created_at", "updated_at")
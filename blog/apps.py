@@ -1,6 +1,43 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+def serves_requests():
+    """Whether this process serves HTTP. ready() also runs in management
+    commands and in the render workers (render_jobs sets RENDER_WORKER before
+    their django.setup()), which must not pay for the template warmup or
+    start background threads; under runserver only the autoreloader's child
+    serves."""
+    if os.environ.get('RENDER_WORKER'):
+        return False
+    program = os.path.basename(sys.argv[0]) if sys.argv else ''
+    if program in ('manage.py', 'django-admin', '__main__.py'):
+        if sys.argv[1:2] != ['runserver']:
+            return False
+        return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+    return True
 
 
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        # Parse every deck template once, before the first request, and refuse
+        # to start on one that doesn't compile (blog/template_warmup.py).
+        if getattr(settings, 'DECK_TEMPLATE_WARMUP', False) and serves_requests():
+            from .template_warmup import warm_templates
+            timings = warm_templates()
+            print('Deck templates compiled in {:.0f} ms ({})'.format(
+                sum(timings.values()),
+                ', '.join('{} {:.0f} ms'.format(name, ms) for name, ms in timings.items()),
+            ))
+
+        # Periodic artifact retention for deployments without cron (blog/retention.py).
+        interval = getattr(settings, 'ARTIFACT_RETENTION_INTERVAL', 0)
+        if interval and serves_requests():
+            from .retention import start_retention_scheduler
+            start_retention_scheduler(interval)
@@ -0,0 +1,100 @@
+"""
+Structural helpers for rendered deck HTML.
+
+Both deck families are a flat run of independent slides: the PDF decks
+(volt.html, volt_Electricity.html) are top-level <div class="containerN">
+children of <body>, the browser decks (volt-electricity.html, volt-gas.html)
+are <section> children of <deck-stage>. The splitters here cut a rendered
+document into (prefix, [slide, ...], suffix) without parsing it into a tree,
+so prefix + "".join(slides) + suffix is always the original string.
+"""
+
+import re
+
+_TAG_RE = re.compile(r'<!--.*?-->|<(/?)([a-zA-Z][\w:-]*)\b[^>]*?(/?)>', re.S)
+_RAW_TEXT_TAGS = {'script', 'style', 'textarea', 'title'}
+_VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+              'meta', 'param', 'source', 'track', 'wbr'}
+_BODY_RE = re.compile(r'<body\b[^>]*>', re.I)
+_BODY_END_RE = re.compile(r'</body\s*>', re.I)
+_DECK_RE = re.compile(r'<deck-stage\b[^>]*>', re.I)
+_DECK_END_RE = re.compile(r'</deck-stage\s*>', re.I)
+
+
+def _is_page_break_only(chunk):
+    """True for top-level filler such as volt.html's
+    <div style="page-break-after: always;"></div> between slides -- it has no
+    content of its own, so it's glued onto the preceding slide instead of
+    becoming a (blank) document of its own."""
+    text = re.sub(r'<!--.*?-->|<(script|style)\b.*?</\1\s*>', '', chunk, flags=re.S | re.I)
+    text = re.sub(r'<[^>]+>', '', text)
+    return not text.strip() and '<img' not in chunk.lower()
+
+
+def _split_children(html_content, open_re, close_re):
+    """Split the children of the element matched by open_re/close_re (first
+    opening tag, last closing tag) into top-level chunks. Returns None when
+    either tag is missing."""
+    opening = open_re.search(html_content)
+    closing = None
+    for m in close_re.finditer(html_content):
+        closing = m
+    if not opening or not closing or closing.start() < opening.end():
+        return None
+
+    start, stop = opening.end(), closing.start()
+    slides = []
+    open_tags = []
+    chunk_start = start
+    pos = start
+    while pos < stop:
+        m = _TAG_RE.search(html_content, pos, stop)
+        if not m:
+            break
+        pos = m.end()
+        if m.group(2) is None:  # comment
+            continue
+        closing, tag, self_closing = m.group(1), m.group(2).lower(), m.group(3)
+        if closing:
+            # Close back to the matching open tag, as a browser does: an
+            # element left unclosed inside a slide ends with the slide, and
+            # a stray closing tag is ignored.
+            if tag in open_tags:
+                del open_tags[len(open_tags) - 1 - open_tags[::-1].index(tag):]
+        elif tag in _RAW_TEXT_TAGS:
+            end = html_content.lower().find(f'</{tag}', pos, stop)
+            pos = stop if end == -1 else html_content.index('>', end) + 1
+        elif tag not in _VOID_TAGS and not self_closing:
+            open_tags.append(tag)
+            continue
+        if not open_tags:
+            chunk = html_content[chunk_start:pos]
+            if not _is_page_break_only(chunk):
+                slides.append(chunk)
+                chunk_start = pos
+            elif slides:
+                slides[-1] += chunk
+                chunk_start = pos
+            # else: leading filler stays pending and is prepended to the first slide
+
+    if chunk_start < stop:
+        if slides:
+            slides[-1] += html_content[chunk_start:stop]
+        else:
+            slides.append(html_content[chunk_start:stop])
+
+    return html_content[:start], slides, html_content[stop:]
+
+
+def split_html_slides(html_content):
+    """Split a rendered PDF deck into (prefix, [slide, ...], suffix) where
+    prefix is everything up to and including <body ...>, each slide is one
+    top-level element inside <body> (with the whitespace/comments before it),
+    and suffix is </body> onwards. Returns None when there is no <body>."""
+    return _split_children(html_content, _BODY_RE, _BODY_END_RE)
+
+
+def split_deck_sections(html_content):
+    """Same as split_html_slides, but for the browser decks: the slides are
+    the <section> children of <deck-stage>. Returns None without one."""
+    return _split_children(html_content, _DECK_RE, _DECK_END_RE)
@@ -0,0 +1,433 @@
+"""
+Streaming writer for the saved browser decks.
+
+render_to_string() builds the whole 350 KB+ deck in memory, and injecting
+the editor marker into <head> with str.replace() made another full copy
+before anything reached the disk. Here the template is rendered node by
+node -- descending into {% if %}, {% for %} and {% with %}, so the provider
+table loops stream one row at a time -- and the output goes to a temp file
+next to the target in pieces of about CHUNK_SIZE; only the document head is
+held back until its </head> is seen (so the marker can go in front of it).
+The temp file is then renamed over the target, so readers never see a
+half-written deck. Measured with tracemalloc (benchmark_templates payloads,
+128 providers), the peak allocation while saving volt-electricity.html
+(866 KB) is about 0.4 MB, against 6.9 MB for render_to_string() plus the
+write, and 3.9 MB when only the top-level nodes were streamed (the provider
+loop was one 775 KB chunk). The largest single piece left is a {% cache %}
+fragment, which is one stored string either way.
+
+This walks Django's node classes directly (Template.render()'s
+render_context/bind_template setup, IfNode/ForNode/WithNode attributes), so
+a Django upgrade that changes them shows up in blog/tests.py, which checks
+that the chunks join into exactly what Template.render() returns.
+
+write_split_deck() is the alternative "shell" layout: the document with only
+its first slide(s) inline, plus one fragment file per remaining <deck-stage>
+slide in <deck>.slides/, fetched by a small inline loader as the viewer
+navigates (and in the background once the page has loaded).
+
+write_compressed_sidecars() keeps <deck>.html.gz (and .br when the brotli
+package is installed) next to a deck so nginx can serve them with
+gzip_static/brotli_static instead of compressing every view on the fly.
+A generation writes the .br at brotli's best quality (11, ~0.4 s for a
+170 KB deck); an inline-editor save, which holds the deck's lock meanwhile,
+uses EDIT_BROTLI_QUALITY (~4 ms, ~15% larger) and the next generation
+compresses it fully again.
+"""
+
+import glob
+import gzip
+import itertools
+import os
+import re
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.template.base import VariableDoesNotExist
+from django.template.context import make_context
+from django.template.defaulttags import ForNode, IfNode, WithNode
+from django.template.loader import get_template
+
+from .html_minify import minify_chunks
+
+try:
+    import brotli
+except ImportError:  # optional: only the .gz sidecar is written without it
+    brotli = None
+
+_HEAD_END = "</head>"
+_SPLIT_TAG_RE = re.compile(r'<(/?)(section|deck-stage)\b[^>]*>', re.I)
+FRAGMENT_DIR_SUFFIX = ".slides"
+CHUNK_SIZE = 32 * 1024  # rendered nodes are joined into pieces of about this size
+EDIT_BROTLI_QUALITY = 5
+
+# Fills the placeholder <section data-deck-fragment="..."> slides of a shell
+# deck: the shown slide and the next one on every slidechange, then the rest in
+# the background after load. Fetched markup replaces the placeholder's children
+# so deck-stage keeps the same slide elements (and its live thumbnails update).
+_FRAGMENT_LOADER = """<script>
+(function () {
+    var stage = document.querySelector('deck-stage');
+    if (!stage) return;
+    var pending = new Map();
+    function load(slide) {
+        if (!slide || !slide.hasAttribute('data-deck-fragment')) return Promise.resolve();
+        if (pending.has(slide)) return pending.get(slide);
+        var p = fetch(slide.getAttribute('data-deck-fragment'), { cache: 'no-cache' })
+            .then(function (r) { if (!r.ok) throw new Error('HTTP ' + r.status); return r.text(); })
+            .then(function (html) {
+                var t = document.createElement('template');
+                t.innerHTML = html;
+                var section = t.content.querySelector('section');
+                section.querySelectorAll('[contenteditable="true"]').forEach(function (el) {
+                    el.setAttribute('spellcheck', 'false');
+                });
+                slide.replaceChildren.apply(slide, Array.prototype.slice.call(section.childNodes));
+                slide.removeAttribute('data-deck-fragment');
+            })
+            .catch(function (err) { pending.delete(slide); console.warn('deck fragment failed:', err); });
+        pending.set(slide, p);
+        return p;
+    }
+    function loadAll() {
+        return Promise.all(Array.prototype.map.call(stage.querySelectorAll(':scope > [data-deck-fragment]'), load));
+    }
+    stage.addEventListener('slidechange', function (e) {
+        var slide = e.detail && e.detail.slide;
+        load(slide);
+        if (slide) load(slide.nextElementSibling);
+    });
+    var active = stage.querySelector(':scope > [data-deck-active]');
+    load(active);
+    if (active) load(active.nextElementSibling);
+    window.addEventListener('load', function () {
+        var rest = Array.prototype.slice.call(stage.querySelectorAll(':scope > [data-deck-fragment]'));
+        (function next() {
+            var slide = rest.shift();
+            if (slide) load(slide).then(function () { (window.requestIdleCallback || setTimeout)(next); });
+        })();
+    });
+    var btn = document.getElementById('downloadPDFBtn');
+    if (btn) btn.addEventListener('click', function (e) {
+        if (!stage.querySelector(':scope > [data-deck-fragment]')) return;
+        e.stopImmediatePropagation();
+        loadAll().then(function () { window.print(); });
+    }, true);
+    window.__voltDeckFragments = { load: load, loadAll: loadAll };
+})();
+</script>"""
+
+
+def deck_engine(template_name):
+    """Template engine alias ("django" or "jinja2") that renders a deck,
+    from settings.DECK_TEMPLATE_ENGINES."""
+    return getattr(settings, "DECK_TEMPLATE_ENGINES", {}).get(template_name) or "django"
+
+
+def _iter_if(node, context):
+    # IfNode.render(), yielding the chosen branch node by node
+    for condition, nodelist in node.conditions_nodelists:
+        if condition is not None:
+            try:
+                match = condition.eval(context)
+            except VariableDoesNotExist:
+                match = None
+        else:
+            match = True
+        if match:
+            yield from _iter_nodes(nodelist, context)
+            return
+
+
+def _iter_for(node, context):
+    # ForNode.render(), yielding each iteration node by node
+    parentloop = context["forloop"] if "forloop" in context else {}
+    with context.push():
+        values = node.sequence.resolve(context, ignore_failures=True)
+        if values is None:
+            values = []
+        if not hasattr(values, "__len__"):
+            values = list(values)
+        len_values = len(values)
+        if len_values < 1:
+            yield from _iter_nodes(node.nodelist_empty, context)
+            return
+        if node.is_reversed:
+            values = reversed(values)
+        unpack = len(node.loopvars) > 1
+        loop_dict = context["forloop"] = {"parentloop": parentloop}
+        for i, item in enumerate(values):
+            loop_dict.update(counter0=i, counter=i + 1, revcounter=len_values - i,
+                             revcounter0=len_values - i - 1, first=i == 0, last=i == len_values - 1)
+            if unpack:
+                try:
+                    len_item = len(item)
+                except TypeError:
+                    len_item = 1
+                if len(node.loopvars) != len_item:
+                    raise ValueError(f"Need {len(node.loopvars)} values to unpack in for loop; got {len_item}. ")
+                context.update(dict(zip(node.loopvars, item)))
+            else:
+                context[node.loopvars[0]] = item
+            yield from _iter_nodes(node.nodelist_loop, context)
+            if unpack:
+                context.pop()
+
+
+def _iter_with(node, context):
+    values = {key: value.resolve(context) for key, value in node.extra_context.items()}
+    with context.push(**values):
+        yield from _iter_nodes(node.nodelist, context)
+
+
+_CONTAINER_NODES = {IfNode: _iter_if, ForNode: _iter_for, WithNode: _iter_with}
+
+
+def _iter_nodes(nodelist, context):
+    """Render nodelist node by node, descending into {% if %}, {% for %} and
+    {% with %} so that the provider loops stream one row at a time. Anything
+    else -- {% cache %} fragments included, which are one stored string
+    anyway -- is rendered whole by its own render_annotated()."""
+    for node in nodelist:
+        container = _CONTAINER_NODES.get(type(node))
+        if container is None:
+            yield node.render_annotated(context)
+        else:
+            yield from container(node, context)
+
+
+def iter_template_chunks(template_name, context):
+    """Yield the rendered output of template_name in pieces that join into
+    exactly what Template.render() returns (blog/tests.py checks this on
+    every deck). Decks switched to Jinja2 stream through
+    Template.generate() instead."""
+    backend_template = get_template(template_name, using=deck_engine(template_name))
+    if deck_engine(template_name) != "django":
+        yield from backend_template.template.generate(context)
+        return
+    template = backend_template.template
+    ctx = make_context(context, autoescape=backend_template.backend.engine.autoescape)
+    with ctx.render_context.push_state(template):
+        with ctx.bind_template(template):
+            ctx.template_name = template.name
+            pieces, size = [], 0
+            for piece in _iter_nodes(template.nodelist, ctx):
+                pieces.append(piece)
+                size += len(piece)
+                if size >= CHUNK_SIZE:
+                    yield "".join(pieces)
+                    pieces, size = [], 0
+            if pieces:
+                yield "".join(pieces)
+
+
+def write_chunks_atomic(chunks, path, head_injection=""):
+    """Write chunks to path through a temp file + os.replace().
+
+    head_injection is inserted right before the first </head>; if the
+    document has none it goes first, as save_html_file always did. Returns
+    the number of characters written."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".html")
+    written = 0
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            pending = [] if head_injection else None
+            for chunk in chunks:
+                if pending is not None:
+                    pending.append(chunk)
+                    if _HEAD_END not in "".join(pending[-2:]):
+                        continue
+                    head = "".join(pending)
+                    pending = None
+                    chunk = head.replace(_HEAD_END, head_injection + "\n" + _HEAD_END, 1)
+                f.write(chunk)
+                written += len(chunk)
+            if pending is not None:
+                chunk = head_injection + "\n" + "".join(pending)
+                f.write(chunk)
+                written += len(chunk)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return written
+
+
+def stream_template_to_file(template_name, context, path, head_injection="", minify=False,
+                            shell_slides=None):
+    """Render template_name with context straight into path (atomically),
+    inserting head_injection before </head> and, with minify=True, passing
+    the stream through html_minify first. Returns the characters written.
+
+    With shell_slides set, path gets the shell layout instead (write_split_deck)
+    and the return value is the list of fragment paths; otherwise fragments
+    left by an earlier shell save of path are removed."""
+    chunks = iter_template_chunks(template_name, context)
+    if minify:
+        chunks = minify_chunks(chunks)
+    if shell_slides is not None:
+        return write_split_deck(chunks, path, head_injection, shell_slides)
+    written = write_chunks_atomic(chunks, path, head_injection)
+    remove_deck_fragments(path)
+    return written
+
+
+def fragment_dir(path):
+    """Directory holding the slide fragments of the shell deck at path."""
+    return os.path.splitext(path)[0] + FRAGMENT_DIR_SUFFIX
+
+
+def deck_fragment_paths(path):
+    """Slide fragment files of the shell deck at path, in slide order ([] for
+    a single-file deck)."""
+    return sorted(glob.glob(os.path.join(glob.escape(fragment_dir(path)), "slide-*.html")))
+
+
+def remove_deck_fragments(path):
+    """Drop the fragments (and their sidecars) a previous shell save left
+    next to path."""
+    shutil.rmtree(fragment_dir(path), ignore_errors=True)
+
+
+def _split_deck_chunks(chunks, fragments, url_prefix, shell_slides):
+    """Yield the shell document for the rendered deck chunks. Every top-level
+    <section> of <deck-stage> after the first shell_slides is stored in
+    fragments[name] and replaced by an empty placeholder carrying its opening
+    tag's attributes plus data-deck-fragment="<url_prefix><name>"."""
+    pending = ""
+    in_stage = False
+    depth = 0
+    slide = 0
+    current = None  # fragment being collected
+
+    def emit(text):
+        if current is not None:
+            current.append(text)
+            return ""
+        return text
+
+    for chunk in itertools.chain(chunks, [None]):
+        final = chunk is None
+        s = pending + (chunk or "")
+        out = []
+        pos = 0
+        for m in _SPLIT_TAG_RE.finditer(s):
+            out.append(emit(s[pos:m.start()]))
+            pos = m.end()
+            tag, closing, name = m.group(0), bool(m.group(1)), m.group(2).lower()
+            if name == "deck-stage":
+                in_stage = not closing
+                out.append(emit(tag))
+                if closing:
+                    out.append("\n" + _FRAGMENT_LOADER)
+            elif not in_stage:
+                out.append(emit(tag))
+            elif not closing:
+                depth += 1
+                if depth == 1:
+                    slide += 1
+                    if slide > shell_slides:
+                        fragment_name = f"slide-{slide:02d}.html"
+                        current = [tag]
+                        out.append(tag[:-1].rstrip("/ ")
+                                   + f' data-deck-fragment="{url_prefix}{fragment_name}">')
+                        continue
+                out.append(emit(tag))
+            else:
+                depth = max(0, depth - 1)
+                out.append(emit(tag))
+                if depth == 0 and current is not None:
+                    fragments[fragment_name] = "".join(current)
+                    current = None
+                    out.append(tag)
+        rest = s[pos:]
+        # Hold back a tag that may be cut off at the chunk boundary.
+        cut = rest.rfind("<")
+        if final or cut < 0 or ">" in rest[cut:]:
+            cut = len(rest)
+        out.append(emit(rest[:cut]))
+        pending = rest[cut:]
+        text = "".join(out)
+        if text:
+            yield text
+
+
+def write_split_deck(chunks, path, head_injection="", shell_slides=1):
+    """Write the rendered deck chunks as a shell document at path plus one
+    fragment per later slide in fragment_dir(path) (see the module
+    docstring). Fragments are in place before the shell is swapped in;
+    fragments of an earlier, longer deck are removed. Returns the fragment
+    paths written."""
+    directory = fragment_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    fragments = {}
+    url_prefix = os.path.basename(directory) + "/"
+
+    written = []
+
+    def flush():
+        while fragments:
+            name, html = fragments.popitem()
+            _replace_file(os.path.join(directory, name), html.encode("utf-8"))
+            written.append(os.path.join(directory, name))
+
+    def shell():
+        for text in _split_deck_chunks(chunks, fragments, url_prefix, shell_slides):
+            flush()
+            yield text
+        flush()
+
+    write_chunks_atomic(shell(), path, head_injection)
+    for stale in deck_fragment_paths(path):
+        if stale not in written:
+            for p in (stale, stale + ".gz", stale + ".br"):
+                if os.path.exists(p):
+                    os.remove(p)
+    return sorted(written)
+
+
+def _replace_file(path, data):
+    """Atomically replace path with data (bytes), world-readable like the deck."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_compressed_sidecars(path, data=None, brotli_quality=11):
+    """(Re)write path + ".gz" and, with brotli available, path + ".br" from
+    the deck's current bytes (read from path unless data is given). A sidecar
+    that can't be refreshed is removed rather than left stale, since the proxy
+    would otherwise keep serving the old deck. Returns the sidecars written."""
+    if data is None:
+        with open(path, "rb") as f:
+            data = f.read()
+    encoders = [(".gz", lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encoders.append((".br", lambda d: brotli.compress(d, mode=brotli.MODE_TEXT, quality=brotli_quality)))
+    elif os.path.exists(path + ".br"):
+        os.remove(path + ".br")
+
+    written = []
+    for suffix, encode in encoders:
+        try:
+            _replace_file(path + suffix, encode(data))
+            written.append(path + suffix)
+        except Exception as e:
+            print(f"Could not write {suffix} sidecar for {path}: {e}")
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
+    return written
@@ -0,0 +1,180 @@
+"""
+Offsets of the inline editor's markers in saved decks.
+
+Applying an edit used to mean searching the whole deck for
+<!-- EDIT:start:{key} -->, compiling a regex for the region and running a
+second full-document re.sub for the field's "défaut" tag
+(<span ... data-for="{key}">...</span>). An EditIndex records, in one pass
+over the file's bytes, where every field region and every deftag is; it is
+cached per path and trusted only while the file's (inode, mtime, size) are
+unchanged. An edit is then a dict lookup plus a splice of the bytes, and
+apply_edits() derives the index of the file it produces from the old one
+plus a map of the splices (how far each later offset moved), so the file
+just written is indexed without re-scanning it or rewriting every entry.
+
+Callers hold the deck's artifact_lock (storage.artifact_lock) around
+read_indexed() ... remember(), like every other writer of the file.
+"""
+
+import bisect
+import itertools
+import os
+import re
+import threading
+from collections import OrderedDict
+
+_TOKEN_RE = re.compile(
+    rb'<!-- EDIT:(start|end):([\w.\-]+) -->'
+    rb'|<span\b[^>]*\bdata-for="([^"]*)"[^>]*>.*?</span>',
+    re.S,
+)
+_CACHE_SIZE = 256
+_MAX_MAPS = 32
+
+_cache = OrderedDict()
+_cache_guard = threading.Lock()
+
+
+class EditIndex:
+    """Where each field region (the bytes between a key's two markers) and
+    each deftag of a file are. Offsets are stored as found by build() plus
+    one offset map per edit applied since (see apply_edits), so recording an
+    edit never touches the other keys' entries."""
+
+    __slots__ = ("fields", "deftags", "maps")
+
+    def __init__(self, fields, deftags, maps=()):
+        self.fields = fields    # key -> [(start, end), ...] as built
+        self.deftags = deftags  # key -> [(start, end), ...] as built
+        self.maps = maps        # (ends, starts, cumulative deltas) per edit since
+
+    @classmethod
+    def build(cls, data):
+        fields = {}
+        deftags = {}
+        open_fields = {}
+        for m in _TOKEN_RE.finditer(data):
+            kind = m.group(1)
+            if kind is None:
+                deftags.setdefault(m.group(3).decode("utf-8", "replace"), []).append(m.span())
+                continue
+            key = m.group(2).decode("ascii")
+            if kind == b"start":
+                open_fields.setdefault(key, m.end())
+            elif key in open_fields:
+                fields.setdefault(key, []).append((open_fields.pop(key), m.start()))
+        return cls(fields, deftags)
+
+    def _offset(self, offset):
+        for ends, starts, deltas in self.maps:
+            i = bisect.bisect_right(ends, offset)
+            if i < len(starts) and starts[i] < offset:
+                return None  # inside a region replaced since: gone
+            offset += deltas[i]
+        return offset
+
+    def _spans(self, table, key):
+        spans = []
+        for start, end in table.get(key, ()):
+            start, end = self._offset(start), self._offset(end)
+            if start is not None and end is not None:
+                spans.append((start, end))
+        return spans
+
+    def field_spans(self, key):
+        return self._spans(self.fields, key)
+
+    def deftag_spans(self, key):
+        return self._spans(self.deftags, key)
+
+    def __contains__(self, key):
+        return bool(self.field_spans(key))
+
+
+def _stamp(st):
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _cached(path, stamp):
+    with _cache_guard:
+        entry = _cache.get(path)
+        if entry is not None and entry[0] == stamp:
+            _cache.move_to_end(path)
+            return entry[1]
+    return None
+
+
+def _store(path, stamp, index):
+    with _cache_guard:
+        _cache[path] = (stamp, index)
+        _cache.move_to_end(path)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def remember(path, index):
+    """Cache index for path as it is on disk now (right after writing it)."""
+    try:
+        _store(path, _stamp(os.stat(path)), index)
+    except OSError:
+        pass
+
+
+def index_for(path):
+    """The EditIndex of path, read and scanned only when not cached."""
+    index = _cached(path, _stamp(os.stat(path)))
+    if index is None:
+        index = read_indexed(path)[1]
+    return index
+
+
+def read_indexed(path):
+    """(bytes, EditIndex) of path, consistent with each other."""
+    with open(path, "rb") as f:
+        stamp = _stamp(os.fstat(f.fileno()))
+        data = f.read()
+    index = _cached(path, stamp)
+    if index is None:
+        index = EditIndex.build(data)
+        _store(path, stamp, index)
+    return data, index
+
+
+def field_content(data, index, key):
+    """The current content between key's markers (first occurrence), as text."""
+    start, end = index.field_spans(key)[0]
+    return data[start:end].decode("utf-8")
+
+
+def apply_edits(data, index, replacements):
+    """Splice {key: new region bytes} into data and drop those keys' deftags.
+    Returns (new bytes, EditIndex of the new bytes)."""
+    splices = []  # (start, end, replacement)
+    for key, content in replacements.items():
+        splices.extend((start, end, content) for start, end in index.field_spans(key))
+        splices.extend((start, end, b"") for start, end in index.deftag_spans(key))
+    splices.sort(key=lambda s: (s[0], s[1]))
+
+    pieces = []
+    kept = []
+    pos = 0
+    for start, end, content in splices:
+        if start < pos:  # inside a region already replaced (a deftag within a field)
+            continue
+        pieces.append(data[pos:start])
+        pieces.append(content)
+        kept.append((start, end, len(content) - (end - start)))
+        pos = end
+    pieces.append(data[pos:])
+    new_data = b"".join(pieces)
+
+    # New markers/deftags inside the inserted content, or a long chain of
+    # maps: index the new bytes from scratch instead.
+    if len(index.maps) >= _MAX_MAPS or any(_TOKEN_RE.search(content) for content in replacements.values()):
+        return new_data, EditIndex.build(new_data)
+    # kept is sorted and non-overlapping, so the splices ending at or before
+    # an offset are a prefix of it
+    offset_map = ([end for _, end, _ in kept], [start for start, _, _ in kept],
+                  list(itertools.accumulate((d for _, _, d in kept), initial=0)))
+    deftags = {key: spans for key, spans in index.deftags.items() if key not in replacements}
+    return new_data, EditIndex(index.fields, deftags, index.maps + (offset_map,))
@@ -0,0 +1,138 @@
+"""
+Conservative HTML minifier for the saved browser decks.
+
+The rendered decks are full of template indentation, blank lines and
+developer comments. This pass:
+
+  - collapses every whitespace run in text to a single newline (if it had
+    one) or space -- what the browser renders is unchanged;
+  - drops comments, except the <!-- EDIT:start:key --> / <!-- EDIT:end:key -->
+    markers save_file_edit() relies on and IE conditional comments;
+  - leaves everything below byte-exact: tags themselves, <script>, <style>,
+    <pre>, <textarea> and <title> contents, elements carrying a
+    contenteditable attribute, and anything between EDIT markers.
+
+It works on a stream of chunks (the output of deck_writer.iter_template_chunks)
+and holds back only an incomplete tag/comment/text run at each chunk boundary,
+so the result is the same however the document is cut up.
+"""
+
+import re
+
+_TAG_RE = re.compile(r'<(/?)([a-zA-Z][\w:-]*)\b([^>]*)>')
+_WS_RE = re.compile(r'[ \t\r\n\f]+')
+_EDITABLE_RE = re.compile(r'\bcontenteditable\b(?!\s*=\s*["\']?false)', re.I)
+_EDIT_START = "<!-- EDIT:start:"
+_EDIT_END = "<!-- EDIT:end:"
+_RAW_TEXT_TAGS = {'script', 'style', 'pre', 'textarea', 'title'}
+_VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+              'meta', 'param', 'source', 'track', 'wbr'}
+
+
+def _collapse(m):
+    return "\n" if "\n" in m.group(0) else " "
+
+
+class _Minifier:
+    def __init__(self):
+        self.pending = ""
+        self.raw_end = None     # regex for the closing tag of an open raw-text element
+        self.raw_end_len = 0
+        self.keep_tag = None    # open contenteditable element (kept byte-exact)
+        self.keep_depth = 0
+        self.edit_depth = 0     # open EDIT:start markers
+
+    @property
+    def preserving(self):
+        return self.keep_tag is not None or self.edit_depth > 0
+
+    def _track_tag(self, closing, name, attrs):
+        if self.keep_tag is not None:
+            if name == self.keep_tag:
+                self.keep_depth += -1 if closing else 1
+                if self.keep_depth == 0:
+                    self.keep_tag = None
+        elif (not closing and name not in _VOID_TAGS and not attrs.rstrip().endswith("/")
+              and _EDITABLE_RE.search(attrs)):
+            self.keep_tag, self.keep_depth = name, 1
+        if not closing and name in _RAW_TEXT_TAGS:
+            self.raw_end = re.compile(r'</' + name + r'\b', re.I)
+            self.raw_end_len = len(name) + 2
+
+    def feed(self, chunk, final=False):
+        s = self.pending + chunk
+        out = []
+        i, n = 0, len(s)
+        while i < n:
+            if self.raw_end is not None:
+                m = self.raw_end.search(s, i)
+                if m is None:
+                    keep = n if final else max(i, n - self.raw_end_len)
+                    out.append(s[i:keep])
+                    i = keep
+                    break
+                out.append(s[i:m.start()])
+                i = m.start()
+                self.raw_end = None
+                continue
+
+            if s.startswith("<!--", i):
+                j = s.find("-->", i + 4)
+                if j < 0:
+                    if final:
+                        out.append(s[i:])
+                        i = n
+                    break
+                comment = s[i:j + 3]
+                i = j + 3
+                if comment.startswith(_EDIT_START):
+                    self.edit_depth += 1
+                    out.append(comment)
+                elif comment.startswith(_EDIT_END):
+                    self.edit_depth = max(0, self.edit_depth - 1)
+                    out.append(comment)
+                elif self.preserving or comment.startswith("<!--[if") or "<![endif]" in comment:
+                    out.append(comment)
+                continue
+
+            if s[i] == "<":
+                m = _TAG_RE.match(s, i)
+                if m is None:
+                    if not final and s.find(">", i) < 0:
+                        break  # tag cut off at the chunk boundary
+                    out.append("<")  # stray '<' in text
+                    i += 1
+                    continue
+                out.append(m.group(0))
+                self._track_tag(bool(m.group(1)), m.group(2).lower(), m.group(3))
+                i = m.end()
+                continue
+
+            j = s.find("<", i)
+            if j < 0:
+                if not final:
+                    break  # the text run may continue in the next chunk
+                j = n
+            text = s[i:j]
+            out.append(text if self.preserving else _WS_RE.sub(_collapse, text))
+            i = j
+
+        self.pending = s[i:]
+        return "".join(out)
+
+
+def minify_chunks(chunks):
+    """Yield the minified document for an iterable of HTML chunks."""
+    minifier = _Minifier()
+    for chunk in chunks:
+        out = minifier.feed(chunk)
+        if out:
+            yield out
+    out = minifier.feed("", final=True)
+    if out:
+        yield out
+
+
+def minify_html(html):
+    """Minify a whole HTML document (see the module docstring)."""
+    return "".join(minify_chunks([html]))
@@ -0,0 +1,345 @@
+"""
+Jinja2 rendering for the deck templates, alongside the Django engine.
+
+The deck templates stay written in Django template language; there is no
+second copy to keep in sync. The "jinja2" engine (settings.TEMPLATES) loads
+them through DjangoTemplateLoader, which translates the Django source into
+an equivalent Jinja2 template at load time:
+
+  - variables are resolved by _resolve(), which follows Django's lookup
+    order (dict key, then attribute, then list index) and calls callables
+    the way Django does; missing values render as "" (ChainableUndefined);
+  - filters are Django's own filter functions, applied the way
+    FilterExpression does (literal arguments are safe, is_safe filters keep
+    safe input safe), and every {{ }} goes through Django's localize +
+    conditional_escape, so escaping is byte-identical;
+  - {% if %} conditions are parsed with Django's own IfParser and comparisons
+    that raise evaluate to False, as in Django;
+  - for/empty, with, firstof and static are mapped to their Jinja2
+    equivalents; load, cache and comment produce no output. Fragment caching
+    is a Django-engine feature; the Jinja2 path renders those regions every
+    time.
+
+Compiled templates are kept in a FileSystemBytecodeCache
+(settings.JINJA2_BYTECODE_CACHE_DIR), so worker processes skip both the
+translation's compile step and Jinja's own after the first render. Which
+engine renders which deck is chosen per template by
+settings.DECK_TEMPLATE_ENGINES (see deck_writer.deck_engine); run
+`manage.py check_jinja2_parity` before switching a template over.
+"""
+
+import inspect
+import os
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.template.base import Lexer, Parser, TokenType
+from django.template.defaulttags import TemplateIfParser
+from django.templatetags.static import static
+from django.utils.formats import localize
+from django.utils.html import conditional_escape, escape
+from django.utils.safestring import SafeData, mark_safe
+from django.utils.timezone import template_localtime
+from jinja2 import (
+    BaseLoader, ChainableUndefined, Environment, FileSystemBytecodeCache, TemplateNotFound, Undefined,
+)
+
+# Django's forloop attributes -> Jinja2's loop attributes
+_FORLOOP = {"counter": "index", "counter0": "index0", "revcounter": "revindex",
+            "revcounter0": "revindex0", "first": "first", "last": "last"}
+_BUILTIN_CONSTANTS = {"True": "True", "False": "False", "None": "None"}
+_SILENT_TAGS = {"load", "cache", "endcache"}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Django -> Jinja2 source translation
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _literal(value):
+    if isinstance(value, str):
+        text = repr(str(value))
+        # Django marks literal strings safe; only matters if escaping would change them
+        return f"_safe({text})" if escape(value) != value else text
+    return repr(value)
+
+
+def _variable(var):
+    if var.literal is not None:
+        return _literal(var.literal)
+    bits = list(var.lookups)
+    head = bits.pop(0)
+    if head in _BUILTIN_CONSTANTS and not bits:
+        return _BUILTIN_CONSTANTS[head]
+    if head == "forloop":
+        if not bits or bits[0] not in _FORLOOP:
+            raise TemplateSyntaxError(f"Unsupported forloop attribute in Jinja2 port: {var.var}")
+        head = "loop." + _FORLOOP[bits.pop(0)]
+    # A filter rather than a global function: Jinja calls filters directly,
+    # globals through Context.call(), which costs more than the lookup itself
+    return f"({head})|_resolve({', '.join(repr(bit) for bit in bits)})"
+
+
+def _filter_expression(fe):
+    out = _variable(fe.var) if fe.is_var else _literal(fe.var)
+    for func, args in fe.filters:
+        rendered = [_variable(arg) if lookup else _literal(mark_safe(arg)) for lookup, arg in args]
+        out = f"({out})|{func._filter_name}" + (f"({', '.join(rendered)})" if rendered else "")
+    return out
+
+
+def _condition(node):
+    if node.id == "literal":
+        return _filter_expression(node.value)
+    if node.id == "not":
+        return f"(not {_condition(node.first)})"
+    if node.id in ("and", "or"):
+        return f"({_condition(node.first)} {node.id} {_condition(node.second)})"
+    return f"_compare({node.id!r}, {_condition(node.first)}, {_condition(node.second)})"
+
+
+class _Translator:
+    def __init__(self, source, name):
+        engine = engines["django"].engine
+        self.name = name
+        self.tokens = Lexer(source).tokenize()
+        self.parser = Parser([], builtins=engine.template_builtins, libraries=engine.template_libraries)
+
+    def _tag(self, token):
+        bits = token.split_contents()
+        tag = bits[0]
+        parser = self.parser
+        if tag in _SILENT_TAGS:
+            return ""
+        if tag in ("if", "elif"):
+            return f"{{% {tag} {_condition(TemplateIfParser(parser, bits[1:]).parse())} %}}"
+        if tag in ("else", "endif", "endfor", "endwith"):
+            return f"{{% {tag} %}}"
+        if tag == "empty":
+            return "{% else %}"
+        if tag == "for":
+            reverse = bits[-1] == "reversed"
+            in_index = bits.index("in")
+            targets = " ".join(bits[1:in_index]).replace(" ", "").split(",")
+            sequence = _filter_expression(parser.compile_filter(" ".join(bits[in_index + 1:len(bits) - reverse])))
+            return f"{{% for {', '.join(targets)} in _sequence({sequence}, {reverse}) %}}"
+        if tag == "with":
+            pairs = []
+            for bit in bits[1:]:
+                if "=" not in bit:
+                    raise TemplateSyntaxError(f"{self.name}: only {{% with name=value %}} is supported")
+                key, value = bit.split("=", 1)
+                pairs.append(f"{key}={_filter_expression(parser.compile_filter(value))}")
+            return f"{{% with {', '.join(pairs)} %}}"
+        if tag == "firstof" and "as" not in bits:
+            values = ", ".join(_filter_expression(parser.compile_filter(bit)) for bit in bits[1:])
+            return f"{{{{ _firstof({values}) }}}}"
+        if tag == "static" and len(bits) == 2:
+            return f"{{{{ _static({_filter_expression(parser.compile_filter(bits[1]))}) }}}}"
+        raise TemplateSyntaxError(f"{self.name}: {{% {tag} %}} has no Jinja2 translation")
+
+    def translate(self):
+        out = []
+        skipping_comment = False
+        for token in self.tokens:
+            if skipping_comment:
+                skipping_comment = not (token.token_type == TokenType.BLOCK and token.contents == "endcomment")
+                continue
+            if token.token_type == TokenType.TEXT:
+                text = token.contents
+                if "{{" in text or "{%" in text or "{#" in text:
+                    text = "{% raw %}" + text + "{% endraw %}"
+                out.append(text)
+            elif token.token_type == TokenType.VAR:
+                out.append("{{ " + _filter_expression(self.parser.compile_filter(token.contents)) + " }}")
+            elif token.token_type == TokenType.BLOCK:
+                if token.contents.split()[0] == "comment":
+                    skipping_comment = True
+                    continue
+                out.append(self._tag(token))
+        return "".join(out)
+
+
+def translate_django_template(source, name="<template>"):
+    """Jinja2 source equivalent to the Django template source."""
+    return _Translator(source, name).translate()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Runtime helpers (Django semantics inside Jinja2)
+# ─────────────────────────────────────────────────────────────────────────────
+
+_MISSING = ChainableUndefined()
+
+
+def _missing_as_empty(value):
+    return "" if isinstance(value, Undefined) else value
+
+
+def _call(value):
+    """Django calls a callable it finds during a lookup, unless it is marked
+    do_not_call_in_templates; alters_data ones and ones that need arguments
+    resolve to "" / missing instead."""
+    if not callable(value) or isinstance(value, Undefined):
+        return value
+    if getattr(value, "do_not_call_in_templates", False):
+        return value
+    if getattr(value, "alters_data", False):
+        return ""
+    try:
+        return value()
+    except TypeError:
+        try:
+            inspect.signature(value).bind()
+        except (TypeError, ValueError):
+            return _MISSING  # needs arguments: an invalid method call, as in Django
+        raise
+
+
+def _attribute_or_index(current, bit):
+    try:
+        return getattr(current, bit)
+    except (TypeError, AttributeError):
+        if bit in dir(current):
+            raise  # an attribute that exists but raised: Django doesn't hide it either
+        try:
+            return current[int(bit)]
+        except (IndexError, ValueError, KeyError, TypeError):
+            return _MISSING
+
+
+def _resolve(current, *bits):
+    """Variable._resolve_lookup: each bit is tried as a dict key, then an
+    attribute, then a list index, and a callable result is called. (Missing
+    values are ChainableUndefined, which every lookup maps to itself.)"""
+    if callable(current):
+        current = _call(current)
+    for bit in bits:
+        try:
+            current = current[bit]
+        except (TypeError, AttributeError, KeyError, ValueError, IndexError):
+            current = _attribute_or_index(current, bit)
+        if callable(current):
+            current = _call(current)
+    return current
+
+
+def _render_value(value):
+    """Jinja2 finalize hook: what Django's render_value_in_context does."""
+    if isinstance(value, Undefined):
+        return ""
+    value = localize(template_localtime(value))
+    if not issubclass(type(value), str):
+        value = str(value)
+    return conditional_escape(value)
+
+
+def _compare(op, left, right):
+    left = None if isinstance(left, Undefined) else left
+    right = None if isinstance(right, Undefined) else right
+    try:
+        if op == "==":
+            return left == right
+        if op == "!=":
+            return left != right
+        if op == ">":
+            return left > right
+        if op == ">=":
+            return left >= right
+        if op == "<":
+            return left < right
+        if op == "<=":
+            return left <= right
+        if op == "in":
+            return left in right
+        if op == "not in":
+            return left not in right
+        if op == "is":
+            return left is right
+        if op == "is not":
+            return left is not right
+    except Exception:
+        return False
+    raise TemplateSyntaxError(f"Unknown operator in if tag: {op}")
+
+
+def _sequence(values, reverse=False):
+    if values is None or isinstance(values, Undefined):
+        return []
+    if not hasattr(values, "__len__"):
+        values = list(values)
+    return reversed(values) if reverse else values
+
+
+def _firstof(*values):
+    for value in values:
+        if value:
+            return value
+    return ""
+
+
+def _django_filter(func):
+    """Wrap a Django filter so it behaves as in FilterExpression.resolve()."""
+    def apply(value, *args):
+        value = _missing_as_empty(value)
+        args = [_missing_as_empty(arg) for arg in args]
+        if getattr(func, "needs_autoescape", False):
+            result = func(value, *args, autoescape=True)
+        else:
+            result = func(value, *args)
+        if getattr(func, "is_safe", False) and isinstance(value, SafeData):
+            result = mark_safe(result)
+        return result
+    return apply
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Loader + environment
+# ─────────────────────────────────────────────────────────────────────────────
+
+class DjangoTemplateLoader(BaseLoader):
+    """Load Django templates from `searchpath`, translated to Jinja2."""
+
+    def __init__(self, searchpath):
+        self.searchpath = [str(p) for p in searchpath]
+
+    def get_source(self, environment, template):
+        for directory in self.searchpath:
+            filename = os.path.join(directory, template)
+            if os.path.isfile(filename):
+                break
+        else:
+            raise TemplateNotFound(template)
+        mtime = os.path.getmtime(filename)
+        with open(filename, encoding="utf-8") as f:
+            source = translate_django_template(f.read(), template)
+        return source, filename, lambda: os.path.isfile(filename) and os.path.getmtime(filename) == mtime
+
+
+def environment(**options):
+    """Environment factory for the Jinja2 backend (TEMPLATES OPTIONS
+    'environment': 'blog.jinja2_env.environment')."""
+    loader = options.pop("loader", None)
+    searchpath = getattr(loader, "searchpath", None) or [settings.BASE_DIR / "templates"]
+    cache_dir = getattr(settings, "JINJA2_BYTECODE_CACHE_DIR", None)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        options.setdefault("bytecode_cache", FileSystemBytecodeCache(str(cache_dir)))
+    options.update(
+        loader=DjangoTemplateLoader(searchpath),
+        autoescape=False,           # escaping happens in finalize, Django-style
+        finalize=_render_value,
+        undefined=ChainableUndefined,
+        keep_trailing_newline=True,
+    )
+    env = Environment(**options)
+
+    engine = engines["django"].engine
+    for library in engine.template_builtins:
+        for name, func in library.filters.items():
+            env.filters[name] = _django_filter(func)
+    env.globals.update(
+        _compare=_compare, _sequence=_sequence, _firstof=_firstof, _safe=mark_safe, _static=static,
+    )
+    env.filters["_resolve"] = _resolve
+    return env
+
@@ -0,0 +1,92 @@
+"""
+Shared HTTP client for the in-house LLM (Ollama-compatible /api/generate).
+
+The market-analysis and vision calls used to open a fresh urllib connection
+per prompt, so every call -- every page of a multi-page invoice scan --
+paid its own TCP + TLS handshake. This module keeps one requests.Session per
+process whose HTTPAdapter holds keep-alive connections to the LLM host:
+
+  - LLM_API_BASE_URL: where /api/generate lives;
+  - LLM_CONNECT_TIMEOUT / LLM_READ_TIMEOUT: seconds to connect / to wait
+    for the response (callers may pass their own read timeout);
+  - LLM_POOL_MAXSIZE: connections kept (and, at most, open) per host --
+    further concurrent calls wait for a free one;
+  - LLM_CONNECT_RETRIES: retries of a connection that could not be opened
+    (a prompt that reached the model is never re-sent).
+
+Settings fall back to the defaults below when Django isn't configured, so
+blog/pdf_extractor.py can use the client as a standalone script too.
+"""
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULTS = {
+    "LLM_API_BASE_URL": "https://gpt.caansoft.com/gpt",
+    "LLM_CONNECT_TIMEOUT": 10,
+    "LLM_READ_TIMEOUT": 280,
+    "LLM_POOL_MAXSIZE": 8,
+    "LLM_CONNECT_RETRIES": 2,
+}
+
+_session = None
+_session_pid = None
+_session_guard = threading.Lock()
+
+
+def _setting(name):
+    try:
+        from django.conf import settings
+        if settings.configured:
+            return getattr(settings, name, DEFAULTS[name])
+    except ImportError:
+        pass
+    return DEFAULTS[name]
+
+
+def generate_url():
+    return _setting("LLM_API_BASE_URL").rstrip("/") + "/api/generate"
+
+
+def session():
+    """The process-wide pooled session (a new one after a fork, so worker
+    processes never share the parent's sockets)."""
+    global _session, _session_pid
+    with _session_guard:
+        if _session is None or _session_pid != os.getpid():
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=_setting("LLM_POOL_MAXSIZE"),
+                pool_block=True,
+                max_retries=Retry(total=None, connect=_setting("LLM_CONNECT_RETRIES"), read=False,
+                                  status=0, other=0, backoff_factor=0.5, allowed_methods=None),
+            )
+            new_session = requests.Session()
+            new_session.headers["Content-Type"] = "application/json"
+            new_session.mount("https://", adapter)
+            new_session.mount("http://", adapter)
+            _session, _session_pid = new_session, os.getpid()
+        return _session
+
+
+def post(payload, timeout=None, url=None):
+    """POST payload (a dict, sent as JSON) to /api/generate (or url) and
+    return the requests.Response. Raises requests.exceptions.RequestException
+    on network errors (requests.exceptions.Timeout on timeouts)."""
+    return session().post(
+        url or generate_url(), json=payload,
+        timeout=(_setting("LLM_CONNECT_TIMEOUT"), timeout or _setting("LLM_READ_TIMEOUT")),
+    )
+
+
+def generate(payload, timeout=None):
+    """post() and return the decoded JSON body. Raises
+    requests.exceptions.RequestException (HTTP errors included) or
+    ValueError (a body that isn't JSON)."""
+    response = post(payload, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
@@ -0,0 +1,140 @@
+"""
+Named locks shared by every worker thread and process on this host.
+
+named_lock(name) is a per-name threading lock inside the process plus an
+flock on <RENDER_CACHE_LOCK_DIR>/<shard>/<name>.lock across worker processes.
+The render cache serializes identical renders with it; storage.claim() guards
+each artifact path while it is being written.
+
+That is one lock file per payload and per artifact path ever locked, so they
+are spread over 256 shard directories and prune_lock_files() (run by the
+retention job) deletes the ones unused for a while. Deleting a lock file
+another process has opened but not locked yet would split the lock in two
+(it locks the unlinked inode, a newcomer a fresh file), so a lock file is
+only unlinked while flocked, and named_lock() re-opens the path when the
+inode it locked is no longer the one there.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: in-process locking only
+    fcntl = None
+
+LOCK_SUFFIX = ".lock"
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def lock_dir():
+    return getattr(settings, "RENDER_CACHE_LOCK_DIR", None) or os.path.join(str(settings.BASE_DIR), ".render_locks")
+
+
+def lock_path(name):
+    shard = hashlib.sha256(name.encode("utf-8")).hexdigest()[:2]
+    return os.path.join(lock_dir(), shard, name + LOCK_SUFFIX)
+
+
+def _is_current(lock_file, path):
+    """True while lock_file is still the file at path (not pruned meanwhile)."""
+    try:
+        return os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _flock(path, blocking):
+    """Open and flock the lock file at path. Returns the open file, or None
+    when blocking is False and someone else holds it."""
+    while True:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lock_file = open(path, "w")  # truncating bumps the mtime prune_lock_files() ages by
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        if _is_current(lock_file, path):
+            return lock_file
+        lock_file.close()  # pruned between open() and flock(): lock the new file
+
+
+@contextmanager
+def named_lock(name, blocking=True):
+    """Hold the lock called name (a file-name-safe string). Yields True once
+    held; with blocking=False it yields False straight away when someone else
+    holds it, and the caller must not touch what it guards."""
+    with _locks_guard:
+        entry = _locks.setdefault(name, [threading.Lock(), 0])
+        entry[1] += 1
+    lock_file = None
+    acquired = False
+    try:
+        acquired = entry[0].acquire(blocking)
+        if acquired and fcntl is not None:
+            lock_file = _flock(lock_path(name), blocking)
+            if lock_file is None:
+                entry[0].release()
+                acquired = False
+        try:
+            yield acquired
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+            if acquired:
+                entry[0].release()
+    finally:
+        with _locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _locks.pop(name, None)
+
+
+def prune_lock_files(max_age, dry_run=False, log=print):
+    """Delete the lock files not used for max_age seconds and not held now.
+    Returns how many were (or, with dry_run, would be) deleted."""
+    if fcntl is None or not os.path.isdir(lock_dir()):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for shard in os.scandir(lock_dir()):
+        if not shard.is_dir(follow_symlinks=False):
+            continue
+        for entry in os.scandir(shard.path):
+            if not entry.name.endswith(LOCK_SUFFIX):
+                continue
+            try:
+                if entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                    continue
+                lock_file = open(entry.path, "a")  # "a": don't bump the mtime
+            except OSError:
+                continue
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()  # held right now
+                continue
+            try:
+                if _is_current(lock_file, entry.path):
+                    log(f"{'would remove' if dry_run else 'remove'} {entry.path} (unused lock file)")
+                    if not dry_run:
+                        os.remove(entry.path)
+                    removed += 1
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+        if not dry_run:
+            try:
+                os.rmdir(shard.path)  # only succeeds once the shard is empty
+            except OSError:
+                pass
+    return removed
@@ -0,0 +1,79 @@
+"""
+Size/time benchmark of the PDF post-processing pass.
+
+generate_pdf used to rewrite every PDF WeasyPrint produced with PyPDF2
+(read it, extract each page's text for the blank-page check, copy the kept
+pages, write). blog/pdf_pipeline.postprocess_pdf() does the same job in one
+PyMuPDF pass that also merges duplicate streams and deflates. This command
+runs both passes over the given PDFs and prints the best time and output
+size of each:
+
+    python manage.py benchmark_pdf_postprocess clients/*/comparatif/*.pdf
+    python manage.py benchmark_pdf_postprocess deck.pdf --repeat 10
+"""
+
+import io
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.pdf_pipeline import postprocess_pdf
+
+
+def _pypdf2_pass(pdf_bytes, pdf_path):
+    """The PyPDF2 pass generate_pdf ran before postprocess_pdf (text and
+    XObject checks, page copy, single write)."""
+    from PyPDF2 import PdfReader, PdfWriter
+
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    writer = PdfWriter()
+    for page in reader.pages:
+        blank = len(page.extract_text().strip()) <= 20
+        if blank and "/Resources" in page and "/XObject" in page["/Resources"]:
+            blank = len(page["/Resources"]["/XObject"].get_object()) == 0
+        if not blank:
+            writer.add_page(page)
+    with open(pdf_path, "wb") as f:
+        writer.write(f)
+
+
+class Command(BaseCommand):
+    help = "Compare the PyMuPDF post-processing pass with the former PyPDF2 rewrite on existing PDFs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("pdfs", nargs="+", help="PDF files to post-process (left untouched).")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per pass; the best time is reported.")
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1")
+        totals = {"input": 0, "pypdf2": 0, "pymupdf": 0}
+        times = {"pypdf2": 0.0, "pymupdf": 0.0}
+        with tempfile.TemporaryDirectory() as tmp:
+            for path in options["pdfs"]:
+                with open(path, "rb") as f:
+                    data = f.read()
+                row = {}
+                for name, run in (("pypdf2", lambda out: _pypdf2_pass(data, out)),
+                                  ("pymupdf", lambda out: postprocess_pdf(data, out, drop_blank_pages=True))):
+                    out = os.path.join(tmp, name + ".pdf")
+                    best = None
+                    for _ in range(options["repeat"]):
+                        start = time.perf_counter()
+                        run(out)
+                        elapsed = time.perf_counter() - start
+                        best = elapsed if best is None else min(best, elapsed)
+                    row[name] = (best, os.path.getsize(out))
+                    times[name] += best
+                    totals[name] += row[name][1]
+                totals["input"] += len(data)
+                self.stdout.write(
+                    f"{os.path.basename(path)}: {len(data) / 1024:.0f} KB in | "
+                    f"PyPDF2 {row['pypdf2'][0] * 1000:.0f} ms, {row['pypdf2'][1] / 1024:.0f} KB | "
+                    f"PyMuPDF {row['pymupdf'][0] * 1000:.0f} ms, {row['pymupdf'][1] / 1024:.0f} KB")
+        self.stdout.write(
+            f"Total: PyPDF2 {times['pypdf2'] * 1000:.0f} ms / {totals['pypdf2'] / 1024:.0f} KB, "
+            f"PyMuPDF {times['pymupdf'] * 1000:.0f} ms / {totals['pymupdf'] / 1024:.0f} KB "
+            f"({totals['input'] / 1024:.0f} KB in)")
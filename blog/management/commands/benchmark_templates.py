@@ -0,0 +1,283 @@
+"""
+Render-time benchmark and per-tag profiler for the deck templates.
+
+Builds synthetic CRM payloads with a growing number of providers, turns them
+into template contexts with the same builders the endpoints use, and renders
+volt.html, volt_Electricity.html, volt-electricity.html and volt-gas.html
+repeatedly. Charts are replaced by a 1x1 placeholder and no LLM is called, so
+only template rendering is measured.
+
+For each template/provider count it prints the best and mean render time and
+the output size. With --profile, every Node.render_annotated() call is also
+timed and the report lists the nodes (template:line and source) and the tag
+kinds with the most self time -- time spent in the node itself, not in its
+children -- which is where restructuring or precomputing pays off.
+
+    python manage.py benchmark_templates
+    python manage.py benchmark_templates --providers 4,32,128 --repeat 10 --profile
+    python manage.py benchmark_templates volt-gas.html --profile --top 25
+"""
+
+import time
+from collections import defaultdict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.core.management.base import BaseCommand, CommandError
+from django.template import base as template_base
+from django.template.loader import get_template
+from django.test import RequestFactory
+
+TEMPLATES = ["volt.html", "volt_Electricity.html", "volt-electricity.html", "volt-gas.html"]
+
+# 1x1 transparent PNG standing in for every matplotlib chart
+_PLACEHOLDER_CHART = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNk"
+    "YAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+_PARTNERS = ["EDF", "ENGIE", "TotalEnergies", "Ekwateur", "Alpiq", "Iberdrola", "Vattenfall", "Ohm"]
+
+
+def _provider(i, gas):
+    current = i == 0
+    cost = 48000 + (i * 1373) % 9000
+    provider = {
+        "id": i + 1,
+        "typeFournisseur": "CURRENT" if current else "REGULAR",
+        "partnerName": _PARTNERS[i % len(_PARTNERS)],
+        "newPartnerName": f"{_PARTNERS[i % len(_PARTNERS)]} {i}",
+        "partnerPhoto": f"https://example.invalid/logos/{i % len(_PARTNERS)}.png",
+        "newPartnerLogoName": f"logo-{i % len(_PARTNERS)}.png",
+        "offerType": "FIXE",
+        "duration": 12 * (1 + i % 3),
+        "coutHTVA": cost,
+        "coutTTC": round(cost * 1.2, 2),
+        "budgetEnergetique": round(cost * 0.7, 2),
+        "fourniture": round(cost * 0.55, 2),
+        "distribution": round(cost * 0.2, 2),
+        "turpe": round(cost * 0.2, 2),
+        "taxes": round(cost * 0.1, 2),
+        "cta": 312.5,
+        "tva": round(cost * 0.2, 2),
+        "partCee": 4.1,
+        "partCeeByCA": 210.0,
+        "abonnementAnnual": 540.0,
+        "economiePercent": -3.5,
+    }
+    if gas:
+        provider.update({"prixMolecule": 38.2 + i % 7, "ticgn": 16.37, "rate": 41.0 + i % 5})
+    else:
+        provider.update({
+            "baseRate": 0.142, "fullHourRate": 0.158, "offPeakHourRate": 0.121,
+            "hphRate": 0.181, "hchRate": 0.131, "hpeRate": 0.149, "hceRate": 0.102, "pteRate": 0.221,
+            "capaBase": 1.2, "capaHp": 1.4, "capaHc": 0.9, "capaHph": 2.1, "capaHch": 1.1,
+            "capaHpe": 0.8, "capaHce": 0.5, "capaPointe": 2.6, "typeCapa": "INCLUS",
+        })
+    return provider
+
+
+def _payload(template_name, providers):
+    """A CRM-shaped payload the endpoint builders accept without errors."""
+    gas = template_name in ("volt.html", "volt-gas.html")
+    months = [{"month": f"2025-{m:02d}", "consumption": 900 + 37 * m} for m in range(1, 13)]
+    comparatif = {
+        "createdOn": 1760000000000,
+        "energyType": "GAS" if gas else "ELECTRICITY",
+        "volumeAnnual": 185000,
+        "ratioHTVA": 12.4,
+        "differenceHTVA": 6100,
+        "currentSupplierName": "EDF",
+        "currentContractExpiryDate": 1798671600000,  # epoch ms, like the CRM sends
+        "contractStartDate": "01/01/2027",
+        "sales": {"name": "Martin", "firstName": "Alex", "email": "alex.martin@example.invalid",
+                  "mobilePhone": "+33 6 00 00 00 00"},
+        "comparatifRates": [_provider(i, gas) for i in range(providers)],
+        "enedisDataPastYear": {"months": months},
+    }
+    if gas:
+        comparatif.update({"pce": "GI000000", "gasProfile": "P012", "routingRate": "T2"})
+    else:
+        comparatif.update({"pdl": "14000000000000", "segmentation": "C4", "puissance": 120,
+                           "hph": 40000, "hch": 30000, "hpe": 60000, "hce": 55000})
+    return {
+        "clientId": 1,
+        "clientSociety": "ACME SAS",
+        "clientTradeName": "ACME",
+        "clientFirstName": "Jean",
+        "clientLastName": "Dupont",
+        "clientEmail": "jean.dupont@example.invalid",
+        "clientPhoneNumber": "+33 1 00 00 00 00",
+        "clientBusinessAddress": "1 rue de la Paix, 75002 Paris",
+        "clientSiret": "00000000000000",
+        # precomputed texts keep the electricity deck from calling the LLM
+        "precomputedAnalyse": "Analyse de marché.",
+        "precomputedRecommandation": "Recommandation.",
+        "precomputedProfil": "Profil de consommation.",
+        "precomputedExposition": "Exposition.",
+        "precomputedStrategie": "Stratégie.",
+        "comparatifClientHistoryPdfDto": comparatif,
+    }
+
+
+def synthetic_context(template_name, providers, request):
+    from blog import views  # heavy imports (WeasyPrint, matplotlib): only when benchmarking
+
+    data = _payload(template_name, providers)
+    comparatif = data["comparatifClientHistoryPdfDto"]
+    chart = _PLACEHOLDER_CHART
+    if template_name == "volt.html":
+        dto = views.build_comparatif_dto(comparatif, request, data)
+        presentation = views.build_presentation_data(data, chart, dto, request)
+    elif template_name == "volt_Electricity.html":
+        dto = views.build_comparatif_dto_Electricity(comparatif, request, data)
+        presentation = views.build_presentation_data_Electricity(data, chart, chart, dto, request)
+    elif template_name == "volt-electricity.html":
+        dto = views.build_comparatif_dto_Electricity(comparatif, request, data)
+        presentation = views.build_presentation_data_energy_offer(data, chart, chart, chart, dto, request)
+    else:
+        dto = views.build_comparatif_dto_Gas(comparatif, request, data)
+        presentation = views.build_presentation_data_gas(data, chart, chart, chart, dto, request)
+    return {"data": presentation}
+
+
+class _NodeProfiler:
+    """Times every Node.render_annotated() call while installed, keeping
+    inclusive and self (exclusive) time per node and per tag kind."""
+
+    def __init__(self):
+        self.nodes = defaultdict(lambda: [0, 0.0, 0.0, ""])   # key -> [calls, self, total, source]
+        self.tags = defaultdict(lambda: [0, 0.0, 0.0])
+        self._stack = []
+        self._original = None
+
+    @staticmethod
+    def _describe(node):
+        token = getattr(node, "token", None)
+        origin = getattr(node, "origin", None)
+        where = f"{getattr(origin, 'template_name', None) or '?'}:{getattr(token, 'lineno', '?')}"
+        if token is None:
+            return where, type(node).__name__, type(node).__name__
+        if isinstance(node, template_base.VariableNode):
+            filters = [f.__name__ for f, _ in node.filter_expression.filters]
+            kind = "{{ var|" + "|".join(filters) + " }}" if filters else "{{ var }}"
+            source = "{{ " + token.contents + " }}"
+        elif isinstance(node, template_base.TextNode):
+            kind, source = "text", "text"
+        else:
+            kind = "{% " + token.contents.split()[0] + " %}"
+            source = "{% " + token.contents + " %}"
+        return where, kind, source
+
+    def __enter__(self):
+        self._original = template_base.Node.render_annotated
+        original, profiler = self._original, self
+
+        def render_annotated(node, context):
+            profiler._stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                return original(node, context)
+            finally:
+                elapsed = time.perf_counter() - started
+                children = profiler._stack.pop()
+                if profiler._stack:
+                    profiler._stack[-1] += elapsed
+                where, kind, source = profiler._describe(node)
+                stats = profiler.nodes[(where, source)]
+                stats[0] += 1
+                stats[1] += elapsed - children
+                stats[2] += elapsed
+                stats[3] = kind
+                tag = profiler.tags[kind]
+                tag[0] += 1
+                tag[1] += elapsed - children
+                tag[2] += elapsed
+
+        template_base.Node.render_annotated = render_annotated
+        return self
+
+    def __exit__(self, *exc):
+        template_base.Node.render_annotated = self._original
+
+
+class Command(BaseCommand):
+    help = "Benchmark deck template rendering with growing provider counts; optionally profile per tag."
+
+    def add_arguments(self, parser):
+        parser.add_argument("templates", nargs="*", default=TEMPLATES,
+                            help="Templates to benchmark (default: all four decks).")
+        parser.add_argument("--providers", default="2,8,32,128",
+                            help="Comma-separated provider counts (default: 2,8,32,128).")
+        parser.add_argument("--repeat", type=int, default=5, help="Renders per measurement.")
+        parser.add_argument("--profile", action="store_true",
+                            help="Also time every template node and report the hottest ones.")
+        parser.add_argument("--top", type=int, default=15, help="Rows in the profile tables.")
+        parser.add_argument("--fragment-cache", action="store_true",
+                            help="Keep the deck_fragments cache warm instead of clearing it per render.")
+
+    def handle(self, *args, **options):
+        templates = options["templates"] or TEMPLATES
+        unknown = [t for t in templates if t not in TEMPLATES]
+        if unknown:
+            raise CommandError(f"Unknown template(s): {', '.join(unknown)}")
+        try:
+            counts = [int(c) for c in options["providers"].split(",") if c.strip()]
+        except ValueError:
+            raise CommandError("--providers must be a comma-separated list of integers")
+        try:
+            fragments = None if options["fragment_cache"] else caches["deck_fragments"]
+        except InvalidCacheBackendError:
+            fragments = None
+
+        request = RequestFactory().post("/", HTTP_HOST="localhost")
+        repeat = max(1, options["repeat"])
+        self.stdout.write(f"{'template':<24}{'providers':>10}{'best ms':>10}{'mean ms':>10}{'KB':>9}")
+
+        for template_name in templates:
+            template = get_template(template_name)
+            profiler = _NodeProfiler() if options["profile"] else None
+            for count in counts:
+                try:
+                    timings, html = self._measure(template, template_name, count, request, repeat,
+                                                  fragments, profiler)
+                except Exception as e:  # a payload shape the builders/template can't handle
+                    self.stdout.write(f"{template_name:<24}{count:>10}  error: {type(e).__name__}: {e}")
+                    continue
+                self.stdout.write(
+                    f"{template_name:<24}{count:>10}{min(timings) * 1000:>10.1f}"
+                    f"{sum(timings) / len(timings) * 1000:>10.1f}{len(html.encode('utf-8')) / 1024:>9.1f}"
+                )
+            if profiler is not None:
+                self._report(template_name, profiler, options["top"], counts)
+
+    @staticmethod
+    def _measure(template, template_name, count, request, repeat, fragments, profiler):
+        context = synthetic_context(template_name, count, request)
+        timings = []
+        for _ in range(repeat):
+            if fragments is not None:
+                fragments.clear()
+            started = time.perf_counter()
+            html = template.render(context)
+            timings.append(time.perf_counter() - started)
+        if profiler is not None:
+            if fragments is not None:
+                fragments.clear()
+            with profiler:
+                template.render(context)
+        return timings, html
+
+    def _report(self, template_name, profiler, top, counts):
+        self.stdout.write(f"\n{template_name}: hottest nodes by self time "
+                          f"(one profiled render per provider count: {', '.join(map(str, counts))})")
+        self.stdout.write(f"{'self ms':>9}{'total ms':>10}{'calls':>8}  location / source")
+        rows = sorted(profiler.nodes.items(), key=lambda kv: kv[1][1], reverse=True)[:top]
+        for (where, source), (calls, own, total, _) in rows:
+            self.stdout.write(f"{own * 1000:>9.2f}{total * 1000:>10.2f}{calls:>8}  {where}  {source[:90]}")
+
+        self.stdout.write(f"\n{template_name}: self time by tag kind")
+        self.stdout.write(f"{'self ms':>9}{'total ms':>10}{'calls':>8}  tag")
+        for kind, (calls, own, total) in sorted(profiler.tags.items(), key=lambda kv: kv[1][1],
+                                                reverse=True)[:top]:
+            self.stdout.write(f"{own * 1000:>9.2f}{total * 1000:>10.2f}{calls:>8}  {kind}")
+        self.stdout.write("")
@@ -0,0 +1,134 @@
+"""
+Build the responsive variants of the browser decks' static photos.
+
+For every photo in DECK_PHOTOS this writes, under static/deck/img/,
+
+    <stem>.<sha256[:12]>.<width>.<jpg|png>   at each of WIDTHS narrower than the
+    <stem>.<sha256[:12]>.<width>.webp        original, plus the original width
+
+and records them in static/deck/img/manifest.json, which
+blog/responsive_images.py reads when a deck is rendered. Photos without
+real transparency are re-encoded as JPEG (the gas slide photos are opaque
+PNGs of 350-570 KB). Existing variant files are never rewritten, so decks
+saved earlier keep their URLs; re-run after replacing a photo.
+
+The output is a build artifact, not checked in (static/deck/img/ is in
+.gitignore): run this on every deploy, after migrate and before
+collectstatic. Until it has run, the decks render with their plain src=.
+
+    python manage.py build_deck_images
+    python manage.py build_deck_images --dry-run
+"""
+
+import hashlib
+import io
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from blog.responsive_images import MANIFEST_NAME, VARIANT_DIR
+
+DECK_PHOTOS = [
+    "image/hero-turbines.jpg",
+    "image/team-meeting.jpg",
+    "image/gas-slide1-right-photo.png",
+    "image/gas-slide2-right-photo.png",
+]
+WIDTHS = (320, 480, 640)
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+
+def _is_opaque(image):
+    if image.mode in ("RGBA", "LA"):
+        return image.getchannel("A").getextrema()[0] == 255
+    if image.mode == "P":
+        return "transparency" not in image.info
+    return True
+
+
+def _encode(image, fmt):
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        image.convert("RGB").save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    elif fmt == "WEBP":
+        image.save(buf, "WEBP", quality=WEBP_QUALITY, method=6)
+    else:
+        image.save(buf, "PNG", optimize=True)
+    return buf.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Write resized JPEG/PNG + WebP variants of the deck photos and their manifest."
+
+    def add_arguments(self, parser):
+        parser.add_argument("photos", nargs="*", default=DECK_PHOTOS,
+                            help="Paths under static/ (default: the browser deck photos).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report the variants without writing anything.")
+
+    def handle(self, *args, **options):
+        static_dir = os.path.join(settings.BASE_DIR, "static")
+        out_dir = os.path.join(static_dir, VARIANT_DIR)
+        self.dry_run = options["dry_run"]
+
+        manifest_file = os.path.join(out_dir, MANIFEST_NAME)
+        manifest = {}
+        if os.path.exists(manifest_file):
+            with open(manifest_file, encoding="utf-8") as f:
+                manifest = json.load(f)
+
+        for photo in options["photos"] or DECK_PHOTOS:
+            source = os.path.join(static_dir, photo)
+            if not os.path.isfile(source):
+                raise CommandError(f"Photo not found: {source}")
+            with open(source, "rb") as f:
+                raw = f.read()
+            digest = hashlib.sha256(raw).hexdigest()[:12]
+            stem = os.path.splitext(os.path.basename(photo))[0]
+
+            with Image.open(io.BytesIO(raw)) as image:
+                image.load()
+                width, height = image.size
+                fallback = "JPEG" if _is_opaque(image) else "PNG"
+                if fallback == "JPEG" and image.mode != "RGB":
+                    image = image.convert("RGB")
+                widths = [w for w in WIDTHS if w < width] + [width]
+
+                entry = {"width": width, "height": height, "variants": [], "webp": []}
+                total = {"variants": 0, "webp": 0}
+                for w in widths:
+                    resized = image if w == width else image.resize(
+                        (w, max(1, round(height * w / width))), Image.LANCZOS)
+                    for key, fmt, ext in (("variants", fallback, "jpg" if fallback == "JPEG" else "png"),
+                                          ("webp", "WEBP", "webp")):
+                        name = f"{stem}.{digest}.{w}.{ext}"
+                        total[key] += self._write(os.path.join(out_dir, name), lambda: _encode(resized, fmt))
+                        entry[key].append([w, name])
+            manifest[photo] = entry
+            self.stdout.write(
+                f"{photo}: {len(raw)} bytes -> widths {widths}, "
+                f"{total['variants']} bytes {fallback.lower()} / {total['webp']} bytes webp"
+                + (" (dry run)" if self.dry_run else ""))
+
+        if not self.dry_run:
+            os.makedirs(out_dir, exist_ok=True)
+            with open(manifest_file + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+                f.write("\n")
+            os.replace(manifest_file + ".tmp", manifest_file)
+
+    def _write(self, target, encode):
+        """Write encode()'s bytes to target unless it already exists; return its size."""
+        if os.path.exists(target):
+            return os.path.getsize(target)
+        data = encode()
+        if not self.dry_run:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(target + ".tmp", target)
+        return len(data)
@@ -0,0 +1,97 @@
+"""
+Output-parity and speed check between the Django and Jinja2 engines.
+
+Renders each deck template through both engines (blog/jinja2_env.py
+translates the Django source for Jinja2) with the benchmark's synthetic
+contexts at several provider counts, and fails if any output differs by a
+single byte. Also prints best-of-N render times for both engines, so the
+gain of switching a template in settings.DECK_TEMPLATE_ENGINES is visible.
+
+    python manage.py check_jinja2_parity
+    python manage.py check_jinja2_parity volt-electricity.html --providers 8,128 --repeat 10
+"""
+
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import get_template
+from django.test import RequestFactory
+
+from .benchmark_templates import TEMPLATES, synthetic_context
+
+
+def _best_of(render, repeat, before=None):
+    best = None
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        output = render()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return output, best
+
+
+def _first_difference(a, b):
+    for i, (x, y) in enumerate(zip(a, b)):
+        if x != y:
+            return i
+    return min(len(a), len(b))
+
+
+class Command(BaseCommand):
+    help = "Check that the Jinja2 engine renders the deck templates byte-identically to Django."
+
+    def add_arguments(self, parser):
+        parser.add_argument("templates", nargs="*", default=TEMPLATES,
+                            help="Templates to check (default: all four decks).")
+        parser.add_argument("--providers", default="2,8,32,128",
+                            help="Comma-separated provider counts (default: 2,8,32,128).")
+        parser.add_argument("--repeat", type=int, default=3, help="Renders per engine for the timings.")
+
+    def handle(self, *args, **options):
+        templates = options["templates"] or TEMPLATES
+        try:
+            counts = [int(c) for c in options["providers"].split(",") if c.strip()]
+        except ValueError:
+            raise CommandError("--providers must be a comma-separated list of integers")
+        try:
+            fragments = caches["deck_fragments"]
+        except InvalidCacheBackendError:
+            fragments = None
+        clear = fragments.clear if fragments is not None else None
+
+        request = RequestFactory().post("/", HTTP_HOST="localhost")
+        repeat = max(1, options["repeat"])
+        failures = []
+        self.stdout.write(f"{'template':<24}{'providers':>10}{'django ms':>11}{'jinja2 ms':>11}{'speedup':>9}  parity")
+
+        for template_name in templates:
+            django_template = get_template(template_name, using="django")
+            jinja_template = get_template(template_name, using="jinja2")
+            for count in counts:
+                try:
+                    context = synthetic_context(template_name, count, request)
+                    expected, django_time = _best_of(lambda: django_template.render(context), repeat, clear)
+                except Exception as e:  # the Django render itself fails for this payload
+                    self.stdout.write(f"{template_name:<24}{count:>10}  skipped: {type(e).__name__}: {e}")
+                    continue
+                actual, jinja_time = _best_of(
+                    lambda: "".join(jinja_template.template.generate(context)), repeat)
+                same = actual == expected
+                self.stdout.write(
+                    f"{template_name:<24}{count:>10}{django_time * 1000:>11.1f}{jinja_time * 1000:>11.1f}"
+                    f"{django_time / jinja_time:>8.1f}x  {'identical' if same else 'DIFFERENT'}"
+                )
+                if not same:
+                    at = _first_difference(expected, actual)
+                    failures.append(template_name)
+                    self.stdout.write(f"    first difference at offset {at}:\n"
+                                      f"    django: {expected[max(0, at - 60):at + 60]!r}\n"
+                                      f"    jinja2: {actual[max(0, at - 60):at + 60]!r}")
+
+        if failures:
+            raise CommandError(f"Jinja2 output differs for: {', '.join(sorted(set(failures)))}")
+        self.stdout.write("All checked renders are byte-identical.")
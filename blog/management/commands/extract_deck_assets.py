@@ -0,0 +1,122 @@
+"""
+Move the bulky static parts of the browser deck templates into fingerprinted
+files under static/deck/.
+
+Every saved Energy_Offer_*.html deck used to carry its own copy of ~180 KB of
+CSS and JavaScript (plus any data:image/...;base64 URIs). This command cuts
+each inline <style>/<script> block that contains no template syntax and is at
+least --min-size bytes long (and every base64 data URI) out of the template,
+writes it to static/deck/deck.<sha256[:12]>.<ext> and references it by URL
+through data.static_base_url. Identical blocks in different templates share
+one file, browsers cache them across decks, and the decks shrink accordingly.
+
+Fingerprinted files are never rewritten or deleted here: decks saved earlier
+keep pointing at the exact assets they were generated with.
+
+    python manage.py extract_deck_assets                 # both browser decks
+    python manage.py extract_deck_assets volt-gas.html --dry-run
+"""
+
+import base64
+import binascii
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_TEMPLATES = ["volt-electricity.html", "volt-gas.html"]
+ASSET_DIR = "deck"
+STATIC_PREFIX = "{{ data.static_base_url }}" + ASSET_DIR + "/"
+
+_BLOCK_RE = re.compile(r'<!--.*?-->|<(style|script)\b([^>]*)>(.*?)</\1\s*>', re.S | re.I)
+_DATA_URI_RE = re.compile(r'data:image/([a-z0-9.+-]+);base64,([A-Za-z0-9+/=\s]+)', re.I)
+_JS_TYPES = {'', 'text/javascript', 'application/javascript', 'module'}
+_IMAGE_EXTENSIONS = {'jpeg': 'jpg', 'svg+xml': 'svg', 'x-icon': 'ico'}
+
+
+def _has_template_syntax(text):
+    return '{{' in text or '{%' in text or '{#' in text
+
+
+def _script_type(attrs):
+    m = re.search(r'\btype\s*=\s*["\']?([^"\'\s>]+)', attrs, re.I)
+    return m.group(1).lower() if m else ''
+
+
+class Command(BaseCommand):
+    help = "Extract inline CSS/JS blocks and base64 images from deck templates into hashed static files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("templates", nargs="*", default=DEFAULT_TEMPLATES,
+                            help="Template names under templates/ (default: the browser decks).")
+        parser.add_argument("--min-size", type=int, default=1024,
+                            help="Only extract <style>/<script> blocks at least this many bytes long.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report what would be extracted without writing anything.")
+
+    def handle(self, *args, **options):
+        template_dir = os.path.join(settings.BASE_DIR, "templates")
+        asset_dir = os.path.join(settings.BASE_DIR, "static", ASSET_DIR)
+        self.dry_run = options["dry_run"]
+        self.min_size = options["min_size"]
+        self.asset_dir = asset_dir
+
+        for name in options["templates"] or DEFAULT_TEMPLATES:
+            path = os.path.join(template_dir, name)
+            if not os.path.isfile(path):
+                raise CommandError(f"Template not found: {path}")
+            with open(path, encoding="utf-8", newline="") as f:
+                source = f.read()
+
+            self.extracted = 0
+            result = _BLOCK_RE.sub(self._extract_block, source)
+            result = _DATA_URI_RE.sub(self._extract_data_uri, result)
+
+            saved = len(source.encode("utf-8")) - len(result.encode("utf-8"))
+            self.stdout.write(f"{name}: {self.extracted} asset(s), {saved} bytes moved out"
+                              + (" (dry run)" if self.dry_run else ""))
+            if self.extracted and not self.dry_run:
+                tmp = path + ".tmp"
+                with open(tmp, "w", encoding="utf-8", newline="") as f:
+                    f.write(result)
+                os.replace(tmp, path)
+
+    # ── helpers ──────────────────────────────────────────────────────────────
+
+    def _write_asset(self, data, extension):
+        """Write data (bytes) to static/deck/deck.<hash>.<ext> unless that
+        fingerprint already exists; return its URL as a template expression."""
+        filename = f"deck.{hashlib.sha256(data).hexdigest()[:12]}.{extension}"
+        target = os.path.join(self.asset_dir, filename)
+        if not self.dry_run and not os.path.exists(target):
+            os.makedirs(self.asset_dir, exist_ok=True)
+            with open(target + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(target + ".tmp", target)
+        self.extracted += 1
+        return STATIC_PREFIX + filename
+
+    def _extract_block(self, m):
+        tag = (m.group(1) or "").lower()
+        if not tag:
+            return m.group(0)  # HTML comment: leave commented-out markup alone
+        attrs, body = m.group(2), m.group(3)
+        if len(body.encode("utf-8")) < self.min_size or _has_template_syntax(body):
+            return m.group(0)
+        if tag == "script":
+            if re.search(r'\bsrc\s*=', attrs, re.I) or _script_type(attrs) not in _JS_TYPES:
+                return m.group(0)
+            url = self._write_asset(body.strip().encode("utf-8") + b"\n", "js")
+            return f'<script{attrs} src="{url}"></script>'
+        url = self._write_asset(body.strip().encode("utf-8") + b"\n", "css")
+        return f'<link rel="stylesheet"{attrs} href="{url}">'
+
+    def _extract_data_uri(self, m):
+        subtype = m.group(1).lower()
+        try:
+            data = base64.b64decode(re.sub(r'\s+', '', m.group(2)), validate=True)
+        except (binascii.Error, ValueError):
+            return m.group(0)
+        return self._write_asset(data, _IMAGE_EXTENSIONS.get(subtype, subtype))
@@ -0,0 +1,49 @@
+"""
+Apply the retention policy to generated artifacts (see blog/retention.py).
+
+Keeps the newest --keep decks of each client/comparatif series and removes
+older ones with their sidecars, slide fragments and previews; removes stale
+temp files, expired or orphaned previews and unreferenced blobs. Defaults
+come from settings.ARTIFACT_RETENTION. Meant for cron:
+
+    python manage.py prune_artifacts --dry-run
+    python manage.py prune_artifacts --keep 5 --io-rate 50
+    15 3 * * *  cd /srv/pdf_api && python manage.py prune_artifacts
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.retention import artifact_roots, prune_artifacts, retention_policy
+
+
+class Command(BaseCommand):
+    help = "Delete old, orphaned and temporary generated artifacts according to the retention policy."
+
+    def add_arguments(self, parser):
+        parser.add_argument("roots", nargs="*",
+                            help="Artifact roots to prune (default: every ARTIFACT_LOCATIONS root and MEDIA_ROOT).")
+        parser.add_argument("--keep", type=int, help="Newest artifacts kept per series.")
+        parser.add_argument("--tmp-age", type=int, dest="tmp_age_seconds",
+                            help="Seconds before a temp file or unreferenced blob counts as abandoned.")
+        parser.add_argument("--preview-days", type=int, help="Days before a preview image expires.")
+        parser.add_argument("--io-rate", type=int,
+                            help="Maximum filesystem operations per second (0 = unlimited).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report what would be removed without deleting anything.")
+
+    def handle(self, *args, **options):
+        overrides = {k: options[k] for k in ("keep", "tmp_age_seconds", "preview_days", "io_rate")}
+        if any(v is not None and v < 0 for v in overrides.values()) or overrides["keep"] == 0:
+            raise CommandError("--keep must be at least 1 and the other limits may not be negative")
+        policy = retention_policy(**overrides)
+        roots = options["roots"] or artifact_roots()
+        verbose = options["verbosity"] > 1 or options["dry_run"]
+        self.stdout.write(
+            f"Pruning {', '.join(roots)}: keep {policy['keep']} per series, temp files after "
+            f"{policy['tmp_age_seconds']} s, previews after {policy['preview_days']} days, "
+            f"{policy['io_rate'] or 'unlimited'} ops/s" + (" (dry run)" if options["dry_run"] else ""))
+        stats = prune_artifacts(roots=roots, dry_run=options["dry_run"],
+                                log=self.stdout.write if verbose else (lambda msg: None), **overrides)
+        self.stdout.write(
+            f"{'Would remove' if options['dry_run'] else 'Removed'} {stats['files']} files and "
+            f"{stats['dirs']} directories, {stats['bytes'] / 1e6:.1f} MB freed")
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_delete_pdfdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeneratedArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=64)),
+                ('comparatif_id', models.CharField(blank=True, max_length=64)),
+                ('energy_type', models.CharField(blank=True, max_length=32)),
+                ('kind', models.CharField(choices=[('pdf', 'Comparatif PDF'), ('html', 'HTML deck'), ('offer_pdf', 'Energy offer PDF')], max_length=16)),
+                ('root', models.CharField(max_length=255)),
+                ('path', models.CharField(help_text='Relative to root, forward slashes.', max_length=500)),
+                ('size', models.BigIntegerField(default=0)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('template', models.CharField(blank=True, max_length=100)),
+                ('template_version', models.CharField(blank=True, max_length=64)),
+                ('timings', models.JSONField(blank=True, default=dict, help_text='Stage -> milliseconds.')),
+                ('payload_key', models.CharField(blank=True, max_length=80)),
+                ('result', models.JSONField(blank=True, default=dict, help_text='What the endpoint returned for payload_key.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['client_id', 'comparatif_id', 'energy_type', '-created_at'], name='generated_artifact_latest'), models.Index(fields=['sha256'], name='generated_artifact_sha256'), models.Index(fields=['payload_key'], name='generated_artifact_payload')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='generatedartifact',
+            constraint=models.UniqueConstraint(fields=('root', 'path'), name='generated_artifact_location'),
+        ),
+    ]
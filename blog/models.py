@@ -1,3 +1,133 @@
+import os
+
+from django.db import models
+
+
+class GeneratedArtifactQuerySet(models.QuerySet):
+    def for_client(self, client_id):
+        return self.filter(client_id=str(client_id))
+
+    def for_comparatif(self, client_id, comparatif_id, energy_type=None, kind=None):
+        qs = self.filter(client_id=str(client_id), comparatif_id=str(comparatif_id))
+        if energy_type:
+            qs = qs.filter(energy_type=energy_type)
+        if kind:
+            qs = qs.filter(kind=kind)
+        return qs
+
+    def latest_for(self, client_id, comparatif_id, energy_type=None, kind=None):
+        """Newest artifact of a client/comparatif (optionally one energy type /
+        kind), or None."""
+        return self.for_comparatif(client_id, comparatif_id, energy_type, kind).order_by("-created_at").first()
+
+    def with_hash(self, sha256):
+        return self.filter(sha256=sha256)
+
+    def at_path(self, path):
+        """The row for an absolute artifact path, or None."""
+        root, relative = GeneratedArtifact.split_path(path)
+        return self.filter(root=root, path=relative).first()
+
+
+class GeneratedArtifact(models.Model):
+    """
+    One generated deck (PDF or HTML) on an artifact root, recorded when it is
+    written (blog/storage.py decides the root). Lets the API answer "does this
+    client/comparatif have a deck, which one is newest, which template version
+    produced it" with an indexed query instead of listing upload directories;
+    render_cache also finds earlier results here when its cache entry is gone.
+    """
+
+    KIND_PDF = "pdf"
+    KIND_HTML = "html"
+    KIND_OFFER_PDF = "offer_pdf"
+    KIND_CHOICES = [
+        (KIND_PDF, "Comparatif PDF"),
+        (KIND_HTML, "HTML deck"),
+        (KIND_OFFER_PDF, "Energy offer PDF"),
+    ]
+
+    client_id = models.CharField(max_length=64)
+    comparatif_id = models.CharField(max_length=64, blank=True)
+    energy_type = models.CharField(max_length=32, blank=True)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    root = models.CharField(max_length=255)
+    path = models.CharField(max_length=500, help_text="Relative to root, forward slashes.")
+    size = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    template = models.CharField(max_length=100, blank=True)
+    template_version = models.CharField(max_length=64, blank=True)
+    timings = models.JSONField(blank=True, default=dict, help_text="Stage -> milliseconds.")
+    payload_key = models.CharField(max_length=80, blank=True)
+    result = models.JSONField(blank=True, default=dict, help_text="What the endpoint returned for payload_key.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = GeneratedArtifactQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["root", "path"], name="generated_artifact_location"),
+        ]
+        indexes = [
+            models.Index(fields=["client_id", "comparatif_id", "energy_type", "-created_at"],
+                         name="generated_artifact_latest"),
+            models.Index(fields=["sha256"], name="generated_artifact_sha256"),
+            models.Index(fields=["payload_key"], name="generated_artifact_payload"),
+        ]
+
+    def __str__(self):
+        return self.path
+
+    @property
+    def absolute_path(self):
+        return os.path.join(self.root, *self.path.split("/"))
+
+    @staticmethod
+    def split_path(path):
+        """(storage root, path relative to it) for an artifact path."""
+        from .storage import storage_for_path
+
+        path = os.path.abspath(path)
+        storage = storage_for_path(path)
+        if storage is None:
+            return os.path.dirname(path), os.path.basename(path)
+        return storage.root, storage.relative(path)
+
+    @classmethod
+    def record(cls, path, kind, data, comparatif=None, template="", timings=None, sha256=None):
+        """Create or refresh the row for the artifact just written at path.
+        data/comparatif are the request payload and its comparatif DTO; sha256
+        is the digest storage.publish() already computed, if any. Never
+        raises: the index must not fail a generation."""
+        from .render_cache import template_version
+        from .storage import cached_digest
+
+        try:
+            comparatif = comparatif or {}
+            root, relative = cls.split_path(path)
+            artifact, _ = cls.objects.update_or_create(
+                root=root, path=relative,
+                defaults={
+                    "client_id": str(data.get("clientId") or ""),
+                    "comparatif_id": str(comparatif.get("id") or ""),
+                    "energy_type": str(comparatif.get("energyType") or ""),
+                    "kind": kind,
+                    "size": os.path.getsize(path),
+                    "sha256": sha256 or cached_digest(path),
+                    "template": template,
+                    "template_version": template_version(template) if template else "",
+                    "timings": {k: round(v, 1) for k, v in (timings or {}).items()},
+                    "payload_key": "",
+                    "result": {},
+                },
+            )
+            return artifact
+        except Exception as e:
+            print(f"Could not index artifact {path}: {e}")
+            return None
+
+
 #
 #
 # import re, io, base64
@@ -55,6 +55,11 @@ import requests
 from pdf2image import convert_from_path
 from PIL import Image
 
+try:
+    from blog import llm_client
+except ImportError:  # run as a plain script, outside the project
+    llm_client = None
+
 # ---- Config -----------------------------------------------------------
 
 API_URL = "https://gpt.caansoft.com/gpt/api/generate"
@@ -194,6 +199,21 @@ def image_to_base64(pil_image):
 
 # ---- Model call & parsing -----------------------------------------------------
 
+_session = None
+
+
+def _post(payload, timeout):
+    """POST to the model over a kept-alive connection: the project's pooled
+    llm_client (and its LLM_API_BASE_URL) when importable, else one Session
+    to API_URL for this script's run."""
+    global _session
+    if llm_client is not None:
+        return llm_client.post(payload, timeout=timeout)
+    if _session is None:
+        _session = requests.Session()
+    return _session.post(API_URL, json=payload, timeout=timeout)
+
+
 def query_vision_model(image_b64, prompt, model=MODEL, num_ctx=DEFAULT_NUM_CTX):
     payload = {
         "model": model,
@@ -202,7 +222,7 @@ def query_vision_model(image_b64, prompt, model=MODEL, num_ctx=DEFAULT_NUM_CTX):
         "stream": False,
         "options": {"num_ctx": num_ctx},
     }
-    response = requests.post(API_URL, json=payload, timeout=REQUEST_TIMEOUT_SECONDS)
+    response = _post(payload, REQUEST_TIMEOUT_SECONDS)
     if not response.ok:
         raise requests.exceptions.HTTPError(
             f"{response.status_code} error from server. Response body:\n{response.text}"
@@ -511,7 +531,7 @@ def call_text_llm(prompt, model=MODEL, num_ctx=8192, timeout=REQUEST_TIMEOUT_SEC
         "options": {"num_ctx": num_ctx},
     }
     try:
-        response = requests.post(API_URL, json=payload, timeout=timeout)
+        response = _post(payload, timeout)
         if not response.ok:
             print(f"Text LLM call failed: {response.status_code} {response.text}")
             return None
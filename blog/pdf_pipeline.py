@@ -0,0 +1,274 @@
+"""
+PDF post-processing for the generated comparatif decks.
+
+WeasyPrint hands us the raw PDF bytes; everything that used to happen in a
+second PyPDF2 read/rewrite pass (dropping the overflow/blank pages) now
+happens in a single PyMuPDF pass that also garbage-collects unused objects,
+merges identical streams (the Volt logo and icons repeated on every slide
+end up stored once), deflates content/image/font streams and packs the
+remaining objects into object streams -- then writes the file exactly once.
+
+render_pdf() can also lay a deck out in parallel: the slides are independent
+fixed-size pages, so the rendered HTML is split into one document per
+top-level <body> child, each laid out by WeasyPrint in its own render worker,
+and the resulting pages are merged back in order by postprocess_pdf().
+
+Every deck also gets small JPEG previews of its first page(s)/slide(s) in a
+previews/ folder next to it, so the CRM can list decks without downloading
+them: PDF pages are rasterized directly, browser decks have their first
+<section>s laid out by WeasyPrint (on a render worker, off the request path)
+and rasterized the same way.
+"""
+
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .deck_html import split_deck_sections, split_html_slides
+from .render_jobs import RenderJobError, run_job, worker_count
+
+# Operators whose presence means a page actually draws something (mirrors the
+# old PyPDF2 heuristic in generate_pdf).
+_DRAWING_COMMANDS = ['re', 'f', 'S', 'rg', 'RG', 'cm', 'Do', 'Tm', 'Tj']
+
+
+def _is_blank_page(page):
+    """Port of generate_pdf's four-step blank-page heuristic to PyMuPDF:
+    meaningful text, any image/form XObject, a substantial content stream,
+    or actual drawing operators all mean the page is kept. When the page
+    can't be inspected, fall back to its height (very short pages are the
+    WeasyPrint overflow blanks)."""
+    try:
+        # Method 1: Check for text content
+        if len(page.get_text().strip()) > 20:
+            return False
+
+        # Method 2: Check for images/XObjects
+        if page.get_images(full=True) or page.get_xobjects():
+            return False
+
+        # Method 3: Check content stream size
+        content = page.read_contents() or b""
+        if len(content.strip()) > 50 and len(content) > 200:
+            return False
+
+        # Method 4: Check for graphics/drawing operations
+        content_data = content.decode('latin-1', errors='ignore')
+        command_count = sum(content_data.count(cmd) for cmd in _DRAWING_COMMANDS)
+        if command_count > 2:
+            return False
+
+        return True
+    except Exception as e:
+        print(f"Error checking page {page.number + 1}: {e}")
+        try:
+            return page.rect.height < 100  # Very small page = likely blank
+        except Exception:
+            return False
+
+
+def postprocess_pdf(pdf_bytes, pdf_path, remove_pages=None, drop_blank_pages=False):
+    """Write pdf_bytes to pdf_path in one PyMuPDF pass.
+
+    pdf_bytes: the PDF as bytes, or a list of PDF byte strings (per-slide
+        parts from render_pdf(parallel=True)) merged in order first.
+
+    remove_pages: 0-based page indices to drop unconditionally (the
+        electricity deck's odd overflow pages). For a list of parts they
+        index the pages of each part, not of the merged document: a slide
+        laid out alone may not come out as the same number of pages as in
+        one serial render, and global indices would then land on the next
+        slides' content.
+    drop_blank_pages: also drop pages _is_blank_page() flags as blank.
+
+    Returns the number of pages written."""
+    import fitz  # PyMuPDF -- same lazy import as _render_file_to_images
+
+    remove_pages = set(remove_pages or ())
+    if isinstance(pdf_bytes, (list, tuple)):
+        doc = fitz.open()
+        removed = set()
+        for part in pdf_bytes:
+            with fitz.open(stream=part, filetype="pdf") as part_doc:
+                removed.update(len(doc) + i for i in range(len(part_doc)) if i in remove_pages)
+                doc.insert_pdf(part_doc)
+    else:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        removed = remove_pages
+    try:
+        total = len(doc)
+        keep = []
+        for i in range(total):
+            if i in removed:
+                continue
+            if drop_blank_pages and _is_blank_page(doc[i]):
+                print(f"✗ Removing blank page {i + 1}")
+                continue
+            keep.append(i)
+
+        if len(keep) != total:
+            doc.select(keep)
+
+        # Saved beside the target and renamed over it: pdf_path may be a hard
+        # link into the artifact blob store, which must never be written in place.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(pdf_path) or ".", prefix=".tmp-", suffix=".pdf")
+        os.close(fd)
+        try:
+            doc.save(
+                tmp_path,
+                garbage=4,           # drop unused objects + merge duplicate streams (repeated images)
+                clean=True,
+                deflate=True,
+                deflate_images=True,
+                deflate_fonts=True,
+                use_objstms=1,
+            )
+            os.replace(tmp_path, pdf_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        print(f"Final PDF: {len(keep)} pages (removed {total - len(keep)} pages), "
+              f"{os.path.getsize(pdf_path)} bytes")
+        return len(keep)
+    finally:
+        doc.close()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Rendering (serial or split across worker processes)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _write_pdf(html_content, page_css, zoom):
+    """One WeasyPrint layout pass; same options generate_pdf always used."""
+    from weasyprint import HTML, CSS
+
+    return HTML(string=html_content).write_pdf(
+        stylesheets=[CSS(string=page_css)],
+        zoom=zoom,
+        optimize_images=True,
+        presentational_hints=True,
+        font_config=None
+    )
+
+
+def render_pdf(html_content, page_css, zoom=0.8, parallel=False, min_slides=4):
+    """Lay html_content out with WeasyPrint in a supervised render worker
+    (blog/render_jobs.py: timeout, RSS limit, recycling).
+
+    Serial mode returns the PDF bytes. With parallel=True and at least
+    min_slides top-level slides, each slide is rendered as its own document
+    on a render worker (at most worker_count() at a time) and the per-slide
+    PDFs are returned as a list (in slide order) for postprocess_pdf() to
+    merge -- latency then tends toward the slowest slide instead of the sum
+    of all of them. When any slide fails (timeout, memory, crash, error) the
+    slides not started yet are cancelled and the whole deck is rendered
+    serially instead, with its own timeout."""
+    if parallel:
+        parts = split_html_slides(html_content)
+        if parts and len(parts[1]) >= min_slides:
+            prefix, slides, suffix = parts
+            executor = ThreadPoolExecutor(max_workers=min(len(slides), worker_count()))
+            try:
+                futures = [
+                    executor.submit(run_job, "pdf", _write_pdf, prefix + slide + suffix, page_css, zoom)
+                    for slide in slides
+                ]
+                return [f.result() for f in futures]
+            except RenderJobError as e:
+                print(f"Parallel PDF render failed, rendering serially: {e}")
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+    return run_job("pdf", _write_pdf, html_content, page_css, zoom)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Preview thumbnails
+# ─────────────────────────────────────────────────────────────────────────────
+
+PREVIEW_DIRNAME = "previews"
+
+# Browser decks are authored at 1123 x 794 px (deck-stage DESIGN_W/H_DEFAULT);
+# without the deck-stage runtime, stack the slides one per page at that size.
+_DECK_PREVIEW_CSS = """
+@page { size: 1123px 794px; margin: 0; }
+deck-stage { display: block; }
+deck-stage > section { display: block; width: 1123px; height: 794px; box-sizing: border-box;
+                       page-break-after: always; }
+"""
+
+
+def preview_paths(artifact_path, count):
+    """Deterministic preview locations for an artifact:
+    <dir>/previews/<stem>-1.jpg ... <stem>-<count>.jpg."""
+    directory, name = os.path.split(artifact_path)
+    stem = os.path.splitext(name)[0]
+    return [os.path.join(directory, PREVIEW_DIRNAME, f"{stem}-{i}.jpg") for i in range(1, count + 1)]
+
+
+def write_pdf_previews(pdf, artifact_path, count=1, width=480):
+    """Rasterize the first `count` pages of pdf (a path or bytes) to
+    `width`-px-wide JPEGs at preview_paths(artifact_path, count). Each file
+    is written to a temp name and renamed into place. Returns the paths
+    written (fewer than count when the PDF is shorter)."""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(pdf) if isinstance(pdf, str) else fitz.open(stream=pdf, filetype="pdf")
+    try:
+        written = []
+        for i, target in enumerate(preview_paths(artifact_path, min(count, len(doc)))):
+            page = doc[i]
+            zoom = width / page.rect.width
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".tmp-", suffix=".jpg")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    img.save(f, format="JPEG", quality=80, optimize=True)
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, target)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            written.append(target)
+        return written
+    finally:
+        doc.close()
+
+
+def write_html_previews(artifact_path, count=1, width=480):
+    """Preview the first `count` <section>s of the browser deck saved at
+    artifact_path: lay them out with WeasyPrint and rasterize like a PDF.
+    Returns the paths written."""
+    with open(artifact_path, encoding="utf-8") as f:
+        html_content = f.read()
+    parts = split_deck_sections(html_content)
+    if not parts or not parts[1]:
+        return []
+    prefix, sections, suffix = parts
+    pdf_bytes = _write_pdf(prefix + "".join(sections[:count]) + suffix, _DECK_PREVIEW_CSS, 1)
+    return write_pdf_previews(pdf_bytes, artifact_path, count, width)
+
+
+# Single background thread that hands HTML-deck previews to the render
+# workers, so saving a deck never waits on the preview layout pass.
+_preview_queue = ThreadPoolExecutor(max_workers=1, thread_name_prefix="deck-previews")
+
+
+def _run_html_previews(artifact_path, count, width, on_done=None):
+    try:
+        written = run_job("preview", write_html_previews, artifact_path, count, width)
+        if on_done:
+            on_done(written)
+    except Exception as e:
+        print(f"HTML deck preview failed for {artifact_path}: {e}")
+
+
+def schedule_html_previews(artifact_path, count=1, width=480, on_done=None):
+    """Queue write_html_previews() for a saved deck; on_done, if given, is
+    called with the paths written. Returns the preview paths the job will
+    produce (they appear once it finishes)."""
+    _preview_queue.submit(_run_html_previews, artifact_path, count, width, on_done)
+    return preview_paths(artifact_path, count)
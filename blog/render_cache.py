@@ -0,0 +1,202 @@
+"""
+Result cache for the deck-generation endpoints.
+
+The CRM regularly posts the exact same comparatif more than once (double
+clicks, retries after a gateway timeout, re-opening a deck). Each result is
+keyed by a canonical hash of the request payload, the endpoint, the request
+host (it decides the media root/URL) and the version of the template that
+renders it. A hit whose artifact is still on disk with the sha256 it was
+rendered with is returned straight away (a file regenerated or edited under
+the same name since is not the cached result any more);
+concurrent identical requests wait for the one in-flight render instead of
+starting their own. Results are also stored on their GeneratedArtifact row,
+so a restart or cache eviction doesn't cost a re-render within the timeout.
+"""
+
+import hashlib
+import json
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.utils import timezone
+
+from .locks import named_lock
+from .storage import cached_digest
+
+_INCLUDE_RE = re.compile(r"""{%\s*(?:include|extends)\s+["']([^"']+)["']""")
+# Besides the template itself, a deck's output depends on the static deck
+# assets (fingerprinted CSS/JS, image variants and their manifest) and on
+# the code that builds its context and writes it.
+_DECK_STATIC_DIR = ("static", "deck")
+_RENDER_MODULES = ("views.py", "deck_writer.py", "deck_html.py", "html_minify.py", "jinja2_env.py",
+                   "pdf_pipeline.py", "responsive_images.py")
+_template_versions = {}
+
+
+def _cache():
+    try:
+        return caches[getattr(settings, "RENDER_CACHE_ALIAS", "render_results")]
+    except InvalidCacheBackendError:
+        return caches["default"]
+
+
+def _template_files(template_name, found):
+    """Append the template's path and those of the templates it includes or
+    extends (recursively) to found."""
+    path = os.path.join(settings.BASE_DIR, "templates", template_name)
+    if path in found:
+        return
+    found.append(path)
+    try:
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+    except OSError:
+        return
+    for name in _INCLUDE_RE.findall(source):
+        _template_files(name, found)
+
+
+def _version_files(template_name):
+    files = []
+    _template_files(template_name, files)
+    static_dir = os.path.join(settings.BASE_DIR, *_DECK_STATIC_DIR)
+    for directory, dirnames, filenames in os.walk(static_dir):
+        dirnames.sort()
+        files.append(directory)  # its mtime changes when assets are added or removed
+        files.extend(os.path.join(directory, name) for name in sorted(filenames))
+    here = os.path.dirname(os.path.abspath(__file__))
+    files.extend(os.path.join(here, name) for name in _RENDER_MODULES)
+    return files
+
+
+def _stamp(files):
+    stamp = []
+    for path in files:
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def template_version(template_name):
+    """Content hash of a template, the templates it includes, the static
+    deck assets and the rendering code (re-hashed only when one of those
+    files is replaced or its mtime/size changes), or
+    settings.DECK_TEMPLATE_VERSION when a deploy pins one."""
+    pinned = getattr(settings, "DECK_TEMPLATE_VERSION", None)
+    if pinned:
+        return str(pinned)
+    cached = _template_versions.get(template_name)
+    if cached and _stamp(cached[0]) == cached[1]:
+        return cached[2]
+    files = _version_files(template_name)
+    stamp = _stamp(files)
+    if stamp[0] is None:
+        return "missing"
+    h = hashlib.sha256()
+    for path, file_stamp in zip(files, stamp):
+        if file_stamp is None or os.path.isdir(path):
+            continue
+        h.update(os.path.relpath(path, settings.BASE_DIR).encode("utf-8") + b"\0")
+        with open(path, "rb") as f:
+            h.update(f.read())
+    digest = h.hexdigest()[:16]
+    _template_versions[template_name] = (files, stamp, digest)
+    return digest
+
+
+def payload_key(kind, template_name, host, data):
+    """Canonical key: sorted-key compact JSON, so key order/whitespace in the
+    posted payload don't matter."""
+    canonical = json.dumps(
+        {"kind": kind, "template": template_name, "version": template_version(template_name),
+         "host": host, "data": data},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+    )
+    return "render:" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _timeout():
+    return getattr(settings, "RENDER_CACHE_TIMEOUT", 24 * 60 * 60)
+
+
+def _indexed(key):
+    """Result recorded on the artifact index for key, if still fresh."""
+    from .models import GeneratedArtifact
+
+    try:
+        artifact = (GeneratedArtifact.objects
+                    .filter(payload_key=key, updated_at__gte=timezone.now() - timedelta(seconds=_timeout()))
+                    .order_by("-updated_at").first())
+    except Exception as e:
+        print(f"Artifact index lookup failed: {e}")
+        return None
+    return artifact.result if artifact is not None and artifact.result else None
+
+
+def _index_result(key, result):
+    from .models import GeneratedArtifact
+
+    try:
+        root, relative = GeneratedArtifact.split_path(result["path"])
+        GeneratedArtifact.objects.filter(root=root, path=relative).update(payload_key=key, result=result)
+    except Exception as e:
+        print(f"Could not index render result: {e}")
+
+
+def _still_current(result):
+    """The artifact a result points at is still the one that was rendered:
+    same path, same sha256."""
+    try:
+        return cached_digest(result["path"]) == result["sha256"]
+    except (KeyError, OSError):
+        return False
+
+
+def _lookup(key):
+    hit = _cache().get(key)
+    from_index = hit is None
+    if from_index:
+        hit = _indexed(key)
+    if hit and _still_current(hit):
+        if from_index:
+            _cache().set(key, hit, _timeout())
+        return hit
+    return None
+
+
+def _single_flight(key):
+    """Serialize renders of the same key across threads and worker processes."""
+    return named_lock(key.split(":", 1)[1])
+
+
+def get_or_render(key, render):
+    """Return (result, cached). render() must return a dict with at least
+    "path" (the artifact on disk), "url" and "name"; it only runs when no
+    live cached result exists and no identical render is already in flight.
+    The result is stored with the artifact's "sha256" added."""
+    if not getattr(settings, "RENDER_CACHE_ENABLED", True):
+        return render(), False
+
+    hit = _lookup(key)
+    if hit:
+        return hit, True
+
+    with _single_flight(key):
+        hit = _lookup(key)  # the render we were waiting on may have just finished
+        if hit:
+            return hit, True
+        result = render()
+        try:
+            result = dict(result, sha256=cached_digest(result["path"]))
+        except OSError as e:
+            print(f"Could not hash render result: {e}")
+        _cache().set(key, result, _timeout())
+        _index_result(key, result)
+        return result, False
@@ -0,0 +1,189 @@
+"""
+Supervised worker processes for the heavy rendering stages.
+
+WeasyPrint, matplotlib and PyMuPDF all grow process memory over time, and a
+pathological payload (hundreds of comparatifRates, a giant invoice) can pin a
+worker for minutes. run_job() executes one stage -- PDF layout, chart
+drawing, invoice rasterization -- in a pooled child process and:
+
+  - enforces a per-stage wall-clock timeout, killing the child when it
+    expires (a thread can't be interrupted; a process can);
+  - watches the child's RSS while it works and kills it above the hard
+    limit;
+  - recycles a child after RENDER_WORKER_MAX_JOBS jobs or once its RSS
+    after a job exceeds RENDER_WORKER_RECYCLE_RSS_MB;
+  - reports every failure as a RenderJobError carrying the stage and a
+    machine-readable code, which the endpoints turn into structured JSON.
+
+With RENDER_JOBS_ENABLED off, run_job() simply calls the function inline.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+
+from django.conf import settings
+
+_DEFAULT_TIMEOUTS = {"pdf": 300, "preview": 120, "chart": 60, "invoice": 120}
+
+_pool_lock = threading.Lock()
+_idle_workers = []
+_slots = None
+
+
+class RenderJobError(Exception):
+    """A render stage that timed out, ran out of memory, crashed or raised.
+    code is one of "timeout", "memory", "crashed", "failed"."""
+
+    def __init__(self, stage, code, message):
+        super().__init__(f"{stage} job {code}: {message}")
+        self.stage = stage
+        self.code = code
+        self.message = message
+
+    @property
+    def http_status(self):
+        return 504 if self.code == "timeout" else 503 if self.code in ("memory", "crashed") else 500
+
+    def as_dict(self):
+        return {"status": "error", "stage": self.stage, "code": self.code, "message": self.message}
+
+
+def _rss_bytes(pid="self"):
+    """Current resident set size from /proc, or None where it isn't available."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _worker_main(conn):
+    """Child loop: receive (func, args, kwargs), send back ((status, payload), rss)."""
+    os.environ["RENDER_WORKER"] = "1"  # apps.serves_requests(): no warmup/scheduler here
+    if os.environ.get("DJANGO_SETTINGS_MODULE"):
+        import django
+        django.setup()
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            break
+        if msg is None:
+            break
+        func, args, kwargs = msg
+        try:
+            result = ("ok", func(*args, **kwargs))
+        except Exception as e:
+            result = ("error", f"{type(e).__name__}: {e}")
+        try:
+            conn.send((result, _rss_bytes()))
+        except Exception as e:  # unpicklable result
+            conn.send((("error", f"could not return result: {e}"), _rss_bytes()))
+
+
+class _Worker:
+    def __init__(self):
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def retire(self):
+        try:
+            self.conn.send(None)
+            self.process.join(2)
+        except Exception:
+            pass
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def worker_count():
+    """How many render jobs run at once (RENDER_WORKERS, default: CPU count)."""
+    return _setting("RENDER_WORKERS", None) or os.cpu_count() or 2
+
+
+def _get_slots():
+    global _slots
+    with _pool_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(worker_count())
+        return _slots
+
+
+def _checkout():
+    with _pool_lock:
+        while _idle_workers:
+            worker = _idle_workers.pop()
+            if worker.process.is_alive():
+                return worker
+            worker.kill()
+    return _Worker()
+
+
+def _checkin(worker, rss):
+    max_jobs = _setting("RENDER_WORKER_MAX_JOBS", 50)
+    recycle_rss = _setting("RENDER_WORKER_RECYCLE_RSS_MB", 768) * 1024 * 1024
+    if worker.jobs >= max_jobs or (rss is not None and rss > recycle_rss):
+        print(f"Recycling render worker {worker.process.pid} after {worker.jobs} jobs "
+              f"(rss={rss and rss // (1024 * 1024)} MB)")
+        worker.retire()
+        return
+    with _pool_lock:
+        _idle_workers.append(worker)
+
+
+def run_job(stage, func, *args, timeout=None, **kwargs):
+    """Run func(*args, **kwargs) in a supervised worker and return its result.
+    func and its arguments/result must be picklable (module-level function).
+    Raises RenderJobError on timeout, memory limit, crash or exception."""
+    if not _setting("RENDER_JOBS_ENABLED", True):
+        return func(*args, **kwargs)
+
+    if timeout is None:
+        timeout = _setting("RENDER_JOB_TIMEOUTS", {}).get(stage, _DEFAULT_TIMEOUTS.get(stage, 120))
+    hard_rss = _setting("RENDER_WORKER_MAX_RSS_MB", 2048) * 1024 * 1024
+
+    with _get_slots():
+        worker = _checkout()
+        started = time.monotonic()
+        try:
+            worker.conn.send((func, args, kwargs))
+            while not worker.conn.poll(0.5):
+                rss = _rss_bytes(worker.process.pid)
+                if rss is not None and rss > hard_rss:
+                    worker.kill()
+                    raise RenderJobError(stage, "memory",
+                                         f"worker exceeded {hard_rss // (1024 * 1024)} MB RSS")
+                if time.monotonic() - started > timeout:
+                    worker.kill()
+                    raise RenderJobError(stage, "timeout", f"exceeded {timeout}s")
+                if not worker.process.is_alive():
+                    break
+            (status, payload), rss = worker.conn.recv()
+        except RenderJobError:
+            raise
+        except (EOFError, OSError) as e:
+            worker.kill()
+            raise RenderJobError(stage, "crashed",
+                                 f"worker exited (code {worker.process.exitcode}): {e or 'no result'}")
+
+        worker.jobs += 1
+        _checkin(worker, rss)
+
+    if status == "error":
+        raise RenderJobError(stage, "failed", payload)
+    return payload
@@ -0,0 +1,70 @@
+"""
+Responsive variants of the static photos shown in the browser decks.
+
+`manage.py build_deck_images` (run at deploy time; the output is not
+checked in) writes resized JPEG/PNG and WebP copies of each photo to
+static/deck/img/ (fingerprinted by the source file's hash, so they are never
+rewritten) and records them in static/deck/img/manifest.json.
+image_variants() turns a manifest entry into the attributes the deck
+templates put on <image-slot>/<img>:
+
+    srcset       fallback-format candidates ("url 320w, url 480w, ...")
+    srcset_webp  the same widths as WebP
+    sizes        the slot's rendered width, as passed by the caller
+    width/height intrinsic size of the original, for layout before load
+
+Nothing here touches Pillow at request time; a photo missing from the
+manifest (or a manifest that was never built) just yields {} and the deck
+falls back to its plain src=.
+"""
+
+import json
+import os
+
+from django.conf import settings
+
+VARIANT_DIR = "deck/img"
+MANIFEST_NAME = "manifest.json"
+
+_manifest = {"mtime": None, "entries": {}}
+
+
+def manifest_path():
+    return os.path.join(settings.BASE_DIR, "static", VARIANT_DIR, MANIFEST_NAME)
+
+
+def load_manifest():
+    """Manifest entries keyed by static path, re-read when the file changes."""
+    path = manifest_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    if _manifest["mtime"] != mtime:
+        try:
+            with open(path, encoding="utf-8") as f:
+                _manifest["entries"] = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read deck image manifest {path}: {e}")
+            _manifest["entries"] = {}
+        _manifest["mtime"] = mtime
+    return _manifest["entries"]
+
+
+def _srcset(variants, url_for):
+    return ", ".join(f"{url_for(VARIANT_DIR + '/' + name)} {width}w" for width, name in variants)
+
+
+def image_variants(static_path, url_for, sizes):
+    """srcset / srcset_webp / sizes / width / height for static/<static_path>,
+    with variant URLs built by url_for(static_relative_path)."""
+    entry = load_manifest().get(static_path)
+    if not entry:
+        return {}
+    return {
+        "srcset": _srcset(entry["variants"], url_for),
+        "srcset_webp": _srcset(entry["webp"], url_for),
+        "sizes": sizes,
+        "width": entry["width"],
+        "height": entry["height"],
+    }
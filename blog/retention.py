@@ -0,0 +1,371 @@
+"""
+Retention for generated artifacts.
+
+Nothing else ever deletes a deck: every regeneration on a new day adds a
+Comparatif_<society>_<energy>_<date>.pdf / Energy_Offer_..._<date>.html next
+to the previous ones, with its .gz/.br sidecars, slide fragments and
+previews. prune_artifacts() walks the clients/ tree (and the blob store) of
+every artifact root and removes
+
+  - all but the `keep` newest artifacts of each series -- same comparatif,
+    same directory, same name once the date (YYYY-MM-DD or YYYYMMDD) and
+    _vN version are stripped, newest by that date and version rather than by
+    mtime (a deduplicated file shares its blob's) -- together with their
+    sidecars, <stem>.slides/ fragments and previews/<stem>-N.jpg. The
+    comparatif comes from the artifact's GeneratedArtifact row, or from a
+    clients/<id>/comparatif/<comparatif id>/ directory; an artifact with
+    neither (an energy_offer/ deck generated before the index) is kept, as
+    its series can't be told apart from other comparatifs';
+  - .tmp-* / *.tmp files older than tmp_age seconds (left behind by a
+    crashed save_file_edit, deck write or preview);
+  - previews older than preview_days, or whose artifact is gone, and
+    sidecars / fragment directories whose deck is gone;
+  - blobs no artifact links to any more (storage.BLOB_DIRNAME, nlink == 1);
+  - named_lock() files (one per payload and artifact path locked) unused for
+    tmp_age seconds (locks.prune_lock_files).
+
+Index rows (GeneratedArtifact) of the decks it removes are deleted with them.
+Each artifact is removed under its artifact_lock, so a deck being saved or
+regenerated is skipped rather than deleted mid-write.
+
+Every directory listing, stat and delete goes through a throttle
+(io_rate operations per second) so a run during business hours doesn't
+compete with renders for the disk. dry_run reports without deleting,
+including the blobs that the reported removals would leave unreferenced.
+
+Run it from cron (`manage.py prune_artifacts`) or let the app schedule it:
+settings.ARTIFACT_RETENTION_INTERVAL > 0 starts start_retention_scheduler()
+in BlogConfig.ready() of the web server processes (not in management
+commands or render workers); a named lock keeps it to one run per host.
+"""
+
+import os
+import re
+import shutil
+import stat
+import threading
+import time
+
+from django.conf import settings
+
+from .deck_writer import FRAGMENT_DIR_SUFFIX
+from .locks import named_lock, prune_lock_files
+from .pdf_pipeline import PREVIEW_DIRNAME
+from .storage import BLOB_DIRNAME, artifact_lock
+
+ARTIFACT_EXTENSIONS = (".pdf", ".html")
+_SIDECAR_SUFFIXES = (".gz", ".br")
+# _YYYY-MM-DD (decks) or _YYYYMMDD (generate_simple_pdf), then claim()'s _vN
+_DATE_RE = re.compile(r"_(?P<date>\d{4}-\d{2}-\d{2}|\d{8})(?:_v(?P<version>\d+))?(?=\.[^.]+$)")
+_PREVIEW_RE = re.compile(r"^(?P<stem>.+)-\d+\.jpg$")
+
+DEFAULT_POLICY = {"keep": 3, "tmp_age_seconds": 3600, "preview_days": 30, "io_rate": 200}
+
+
+def retention_policy(**overrides):
+    """settings.ARTIFACT_RETENTION over DEFAULT_POLICY, then overrides (None
+    values ignored)."""
+    policy = dict(DEFAULT_POLICY)
+    policy.update(getattr(settings, "ARTIFACT_RETENTION", {}))
+    policy.update({k: v for k, v in overrides.items() if v is not None})
+    return policy
+
+
+def artifact_roots():
+    """Every directory artifacts are written under (storage locations)."""
+    roots = [root for root, _ in getattr(settings, "ARTIFACT_LOCATIONS", {}).values()]
+    roots.append(getattr(settings, "MEDIA_ROOT", "") or "")
+    seen = []
+    for root in filter(None, roots):
+        root = os.path.abspath(str(root))
+        if root not in seen:
+            seen.append(root)
+    return seen
+
+
+class _Throttle:
+    """At most `rate` filesystem operations per second (0 = unlimited)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = time.monotonic()
+
+    def __call__(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self.next_at:
+            time.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + self.interval
+
+
+class _Pruner:
+    def __init__(self, keep, tmp_age_seconds, preview_days, io_rate, dry_run, log):
+        self.keep = max(1, int(keep))
+        self.tmp_age = tmp_age_seconds
+        self.preview_age = preview_days * 86400
+        self.dry_run = dry_run
+        self.log = log
+        self.throttle = _Throttle(io_rate)
+        self.now = time.time()
+        self.stats = {"files": 0, "dirs": 0, "bytes": 0}
+        self.removed = set()  # so a dry run doesn't count a file twice
+        self.unlinked = {}  # (st_dev, st_ino) -> names removed, for prune_blobs
+        self.removed_artifacts = []
+        self.root = None
+
+    # ── filesystem access (throttled) ────────────────────────────────────────
+
+    def _scan(self, directory):
+        self.throttle()
+        try:
+            with os.scandir(directory) as it:
+                return list(it)
+        except OSError:
+            return []
+
+    def _stat(self, entry):
+        self.throttle()
+        try:
+            return entry.stat(follow_symlinks=False)
+        except OSError:
+            return None
+
+    def _remove(self, path, reason, st=None, links=None):
+        if path in self.removed:
+            return
+        if st is None:
+            self.throttle()
+            try:
+                st = os.lstat(path)
+            except OSError:
+                return
+        # A hard-linked name frees nothing until its blob goes too
+        freed = st.st_size if (st.st_nlink if links is None else links) <= 1 else 0
+        self.log(f"{'would remove' if self.dry_run else 'remove'} {path} ({reason})")
+        if not self.dry_run:
+            self.throttle()
+            try:
+                os.remove(path)
+            except OSError as e:
+                self.log(f"could not remove {path}: {e}")
+                return
+        self.removed.add(path)
+        key = (st.st_dev, st.st_ino)
+        self.unlinked[key] = self.unlinked.get(key, 0) + 1
+        self.stats["files"] += 1
+        self.stats["bytes"] += freed
+
+    def _remove_tree(self, path, reason):
+        if path in self.removed:
+            return
+        self.removed.add(path)
+        self.log(f"{'would remove' if self.dry_run else 'remove'} {path}/ ({reason})")
+        if not self.dry_run:
+            for entry in self._scan(path):
+                if entry.is_file(follow_symlinks=False):
+                    self._remove(entry.path, reason)
+            self.throttle()
+            shutil.rmtree(path, ignore_errors=True)
+        self.stats["dirs"] += 1
+
+    # ── policies ─────────────────────────────────────────────────────────────
+
+    def _age(self, st):
+        # ctime, not mtime: with ARTIFACT_DEDUPE a freshly generated file is a
+        # hard link to an older blob and keeps its mtime, but linking a name
+        # (or the last one going away) updates the inode's ctime
+        return self.now - st.st_ctime
+
+    def _is_tmp(self, name):
+        return name.startswith(".tmp-") or name.endswith(".tmp")
+
+    def _remove_artifact(self, path, st, reason):
+        if self.dry_run:
+            self._remove_artifact_files(path, st, reason)
+            return
+        with artifact_lock(path, blocking=False) as acquired:
+            if not acquired:
+                self.log(f"skip {path} (being written)")
+                return
+            self._remove_artifact_files(path, st, reason)
+
+    def _remove_artifact_files(self, path, st, reason):
+        self._remove(path, reason, st)
+        self.removed_artifacts.append(path)
+        for suffix in _SIDECAR_SUFFIXES:
+            if os.path.exists(path + suffix):
+                self._remove(path + suffix, reason)
+        stem = os.path.splitext(path)[0]
+        if os.path.isdir(stem + FRAGMENT_DIR_SUFFIX):
+            self._remove_tree(stem + FRAGMENT_DIR_SUFFIX, reason)
+        preview_dir = os.path.join(os.path.dirname(path), PREVIEW_DIRNAME)
+        prefix = os.path.basename(stem) + "-"
+        for entry in self._scan(preview_dir) if os.path.isdir(preview_dir) else []:
+            if entry.name.startswith(prefix) and _PREVIEW_RE.match(entry.name):
+                self._remove(entry.path, reason)
+
+    def prune_directory(self, directory):
+        entries = self._scan(directory)
+        names = {e.name for e in entries}
+        series = {}
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry)
+                continue
+            st = self._stat(entry)
+            if st is None or not stat.S_ISREG(st.st_mode):
+                continue
+            if self._is_tmp(name):
+                if self._age(st) > self.tmp_age:
+                    self._remove(entry.path, "stale temp file", st)
+            elif name.endswith(_SIDECAR_SUFFIXES):
+                if os.path.splitext(name)[0] not in names:
+                    self._remove(entry.path, "deck gone", st)
+            elif name.lower().endswith(ARTIFACT_EXTENSIONS):
+                m = _DATE_RE.search(name)
+                generated = (m.group("date").replace("-", ""), int(m.group("version") or 1)) if m else ("", 0)
+                series.setdefault(_DATE_RE.sub("", name), []).append((generated, entry.path, st))
+
+        if series:
+            comparatifs = self._comparatifs(directory, [path for items in series.values() for _, path, _ in items])
+            by_comparatif = {}
+            for name, items in series.items():
+                for item in items:
+                    comparatif = comparatifs.get(item[1])
+                    if comparatif:
+                        by_comparatif.setdefault((comparatif, name), []).append(item)
+            series = by_comparatif
+
+        for items in series.values():
+            items.sort(key=lambda item: (item[0], item[1]), reverse=True)
+            for _, path, st in items[self.keep:]:
+                self._remove_artifact(path, st, f"older than the {self.keep} newest")
+
+        for entry in subdirs:
+            name = entry.name
+            if name == PREVIEW_DIRNAME:
+                self.prune_previews(entry.path, names)
+            elif name.endswith(FRAGMENT_DIR_SUFFIX):
+                if name[:-len(FRAGMENT_DIR_SUFFIX)] + ".html" not in names:
+                    self._remove_tree(entry.path, "deck gone")
+                else:
+                    self.prune_tmp(entry.path)
+            else:
+                self.prune_directory(entry.path)
+
+    def _comparatifs(self, directory, paths):
+        """{path: comparatif id} for the artifacts at paths: from their index
+        rows, else from a comparatif/<id>/ directory."""
+        from .models import GeneratedArtifact
+
+        parent, name = os.path.split(directory)
+        fallback = name if os.path.basename(parent) == "comparatif" else ""
+        comparatifs = {path: fallback for path in paths}
+        if self.root is None:
+            return comparatifs
+        relative = {os.path.relpath(path, self.root).replace(os.sep, "/"): path for path in paths}
+        try:
+            rows = GeneratedArtifact.objects.filter(root=self.root, path__in=list(relative))
+            for path, comparatif in rows.values_list("path", "comparatif_id"):
+                comparatifs[relative[path]] = comparatif or fallback
+        except Exception as e:
+            print(f"Could not read the artifact index: {e}")
+        return comparatifs
+
+    def prune_tmp(self, directory):
+        for entry in self._scan(directory):
+            if self._is_tmp(entry.name):
+                st = self._stat(entry)
+                if st is not None and self._age(st) > self.tmp_age:
+                    self._remove(entry.path, "stale temp file", st)
+
+    def prune_previews(self, directory, artifact_dir_names):
+        stems = {os.path.splitext(n)[0] for n in artifact_dir_names if n.lower().endswith(ARTIFACT_EXTENSIONS)}
+        for entry in self._scan(directory):
+            st = self._stat(entry)
+            if st is None or not stat.S_ISREG(st.st_mode):
+                continue
+            m = _PREVIEW_RE.match(entry.name)
+            if self._is_tmp(entry.name):
+                if self._age(st) > self.tmp_age:
+                    self._remove(entry.path, "stale temp file", st)
+            elif m and m.group("stem") not in stems:
+                self._remove(entry.path, "artifact gone", st)
+            elif self._age(st) > self.preview_age:
+                self._remove(entry.path, "preview expired", st)
+
+    def prune_blobs(self, blob_root):
+        for shard in self._scan(blob_root):
+            if not shard.is_dir(follow_symlinks=False):
+                continue
+            for entry in self._scan(shard.path):
+                st = self._stat(entry)
+                if st is None:
+                    continue
+                # nlink 1: no artifact name points at this blob any more. A dry run
+                # hasn't removed its names, so it discounts the ones it would have.
+                # The age check leaves a blob alone while its first name is being
+                # linked; unlinking just now updated the ctime, hence "or unlinked".
+                unlinked = self.unlinked.get((st.st_dev, st.st_ino), 0)
+                links = st.st_nlink - unlinked if self.dry_run else st.st_nlink
+                if links <= 1 and (unlinked or self._age(st) > self.tmp_age):
+                    self._remove(entry.path, "unreferenced blob", st, links)
+
+
+def _unindex(root, paths):
+    from .models import GeneratedArtifact
+
+    relative = [os.path.relpath(path, root).replace(os.sep, "/") for path in paths]
+    try:
+        GeneratedArtifact.objects.filter(root=root, path__in=relative).delete()
+    except Exception as e:
+        print(f"Could not unindex pruned artifacts: {e}")
+
+
+def prune_artifacts(roots=None, keep=None, tmp_age_seconds=None, preview_days=None, io_rate=None,
+                    dry_run=False, log=print):
+    """Apply the retention policy (see the module docstring) under each root
+    (default: artifact_roots()). Returns {"files", "dirs", "bytes"} removed
+    (or that would be, with dry_run)."""
+    policy = retention_policy(keep=keep, tmp_age_seconds=tmp_age_seconds,
+                              preview_days=preview_days, io_rate=io_rate)
+    pruner = _Pruner(dry_run=dry_run, log=log, **policy)
+    for root in roots or artifact_roots():
+        root = os.path.abspath(root)
+        pruner.root = root
+        clients = os.path.join(root, "clients")
+        if os.path.isdir(clients):
+            pruner.prune_directory(clients)
+        if pruner.removed_artifacts and not dry_run:
+            _unindex(root, pruner.removed_artifacts)
+        pruner.removed_artifacts = []
+        blobs = os.path.join(root, BLOB_DIRNAME)
+        if os.path.isdir(blobs):
+            pruner.prune_blobs(blobs)
+    pruner.stats["files"] += prune_lock_files(policy["tmp_age_seconds"], dry_run=dry_run, log=log)
+    return pruner.stats
+
+
+def _run_scheduled(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            with named_lock("retention", blocking=False) as acquired:
+                if not acquired:
+                    continue  # another process on this host is already pruning
+                stats = prune_artifacts(log=lambda msg: None)
+                print(f"Artifact retention: removed {stats['files']} files, {stats['dirs']} dirs, "
+                      f"{stats['bytes']} bytes")
+        except Exception as e:
+            print(f"Artifact retention run failed: {e}")
+
+
+def start_retention_scheduler(interval):
+    """Run prune_artifacts() every `interval` seconds on a daemon thread."""
+    thread = threading.Thread(target=_run_scheduled, args=(interval,), name="artifact-retention", daemon=True)
+    thread.start()
+    return thread
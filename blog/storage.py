@@ -0,0 +1,357 @@
+"""
+Where generated artifacts (PDF decks, HTML decks and everything written next
+to them) are stored, and the URLs they are served from.
+
+Every generator used to repeat the same host -> media root/URL branching and
+write straight into that directory. artifact_storage(request) now picks the
+location for the request's host (settings.ARTIFACT_LOCATIONS, falling back to
+MEDIA_ROOT/MEDIA_URL) and returns a storage object:
+
+    storage = artifact_storage(request)
+    path = storage.path("clients", client_id, "comparatif", filename)   # local file to write
+    ... write path (and sidecars/previews beside it) ...
+    storage.publish(path)
+    url = storage.url(request, "clients", client_id, "comparatif", filename)
+
+LocalArtifactStorage (ARTIFACT_STORAGE = "local") serves the files from this
+host's disk. S3ArtifactStorage
+(ARTIFACT_STORAGE = "s3") keeps the same local tree as a working copy -- the
+PDF post-processing, previews, render cache and inline editor all keep
+working on files -- and uploads whatever is published to an S3-compatible
+bucket (AWS, MinIO, or a local moto/MinIO stand-in via endpoint_url) from a
+background thread, so request threads never wait on the bucket. Each
+publish() is queued as one unit and the thread sends everything queued so
+far in one batch, `upload_concurrency` files at a time. url() doesn't wait
+either: it returns the ARTIFACT_S3["public_url"] URL once the artifact and
+its sidecars are uploaded, and until then the URL of the local working copy
+(served like LocalArtifactStorage's), so a URL handed out early never 404s.
+
+Every artifact is written to a unique temp file beside it and renamed into
+place, so readers only ever see a complete previous or new version.
+Generators write an artifact and everything beside it (deck, sidecars,
+previews) under claim(*parts), which holds the target's lock
+(blog/locks.py) for the whole sequence. Identical requests already coalesce in render_cache; when a
+different generation is writing the same name (same client, society and
+day), claim() hands out <stem>_v2<ext>, _v3, ... instead, or with
+ARTIFACT_CONCURRENT_WRITES = "wait" waits its turn and replaces it.
+
+With ARTIFACT_DEDUPE on, publishing also moves each file into a
+content-addressed blob store, <root>/.blobs/<sha256[:2]>/<sha256>, and leaves
+the readable name as a hard link to its blob: regenerating an identical deck,
+PDF, sidecar or preview costs a hash and a link instead of a second copy on
+disk. Every writer replaces artifacts by rename, never in place, so editing
+or regenerating one name can't change another name that shares its blob.
+Blobs no name links to any more (st_nlink == 1) are garbage; where hard links
+aren't possible the plain file is simply kept. Interning never touches a
+blob's mtime, which every name linked to it shares; linking a name does
+update the inode's ctime, which retention uses as "last generated at".
+"""
+
+import hashlib
+import mimetypes
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .locks import named_lock
+
+try:
+    import boto3
+except ImportError:  # optional: only needed for ARTIFACT_STORAGE = "s3"
+    boto3 = None
+
+_SIDECAR_SUFFIXES = (".gz", ".br")
+BLOB_DIRNAME = ".blobs"
+MAX_VERSIONS = 20
+MAX_CACHED_DIGESTS = 4096
+_digests = {}
+_storages = {}
+_storages_guard = threading.Lock()
+
+
+def artifact_lock(path, blocking=True):
+    """The write lock of the artifact at path (see claim())."""
+    digest = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:32]
+    return named_lock("artifact-" + digest, blocking)
+
+
+def _with_sidecars(paths):
+    files = []
+    for path in paths:
+        files.append(path)
+        files.extend(path + s for s in _SIDECAR_SUFFIXES if os.path.exists(path + s))
+    return files
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def remember_digest(path, digest, stamp=None):
+    """Record digest (file_digest's hex form) as the content of path as it
+    is now, for a caller that just wrote or hashed those bytes itself."""
+    if len(_digests) >= MAX_CACHED_DIGESTS:
+        _digests.clear()
+    _digests[os.path.abspath(path)] = (stamp or _stamp(path), digest)
+
+
+def cached_digest(path):
+    """file_digest(path), re-hashed only when the file was replaced or
+    changed since it was last hashed here or interned (inode, mtime or size
+    differ). Raises OSError when path is missing."""
+    stamp = _stamp(path)
+    cached = _digests.get(os.path.abspath(path))
+    if cached and cached[0] == stamp:
+        return cached[1]
+    digest = file_digest(path)
+    remember_digest(path, digest, stamp)
+    return digest
+
+
+class LocalArtifactStorage:
+    """Artifacts live under root on this host and are served from base_url."""
+
+    def __init__(self, root, base_url, dedupe=False):
+        self.root = os.path.abspath(str(root))
+        self.base_url = base_url
+        self.dedupe = dedupe
+
+    def path(self, *parts):
+        """Local filesystem path for parts (joined under root); its directory
+        is created."""
+        path = os.path.join(self.root, *[str(p) for p in parts])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def relative(self, path):
+        """path relative to root, with forward slashes."""
+        return os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, "/")
+
+    def contains(self, path):
+        path = os.path.abspath(path)
+        return path == self.root or path.startswith(self.root + os.sep)
+
+    def url(self, request, *parts):
+        """Public URL of the artifact at parts."""
+        return request.build_absolute_uri(os.path.join(self.base_url, *[str(p) for p in parts]))
+
+    @contextmanager
+    def claim(self, *parts):
+        """Hold the write lock of the artifact at parts for the block and
+        yield the local path to write: parts' own path, or a free versioned
+        one while another generation holds it (see the module docstring)."""
+        path = self.path(*parts)
+        if getattr(settings, "ARTIFACT_CONCURRENT_WRITES", "version") == "version":
+            stem, ext = os.path.splitext(path)
+            for n in range(1, MAX_VERSIONS + 1):
+                candidate = path if n == 1 else f"{stem}_v{n}{ext}"
+                with artifact_lock(candidate, blocking=False) as acquired:
+                    if acquired:
+                        yield candidate
+                        return
+        with artifact_lock(path):
+            yield path
+
+    def publish(self, *paths):
+        """Make files written under root (and their .gz/.br sidecars) available
+        at their URL. Local files already are; with dedupe on they are moved
+        into the blob store (see the module docstring). Returns {path: sha256}
+        for the files hashed on the way (dedupe), so callers such as
+        GeneratedArtifact.record() needn't hash them again."""
+        digests = {}
+        if self.dedupe:
+            for path in _with_sidecars(paths):
+                blob = self.intern(path)
+                if blob:
+                    digests[path] = os.path.basename(blob)
+        return digests
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, BLOB_DIRNAME, digest[:2], digest)
+
+    def intern(self, path):
+        """Store path's content as a blob and make path a hard link to it.
+        Returns the blob path, or None when the file was left as it is."""
+        try:
+            digest = cached_digest(path)
+            blob = self.blob_path(digest)
+            if os.path.exists(blob) and os.path.samefile(path, blob):
+                return blob
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            try:
+                os.link(path, blob)  # first copy of this content becomes the blob
+                return blob
+            except FileExistsError:
+                pass
+            # Identical content is already stored: swap the name over to it
+            tmp_path = os.path.join(os.path.dirname(path), f".tmp-{uuid.uuid4().hex}")
+            os.link(blob, tmp_path)
+            try:
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.lexists(tmp_path):
+                    os.remove(tmp_path)
+            remember_digest(path, digest)
+            return blob
+        except OSError as e:  # no hard links here (or the file vanished): keep the plain file
+            print(f"Could not dedupe {path}: {e}")
+            return None
+
+    def flush(self, *paths, timeout=None):
+        """Wait until paths (everything published so far when none are given)
+        are stored. Returns True if none of them is left pending."""
+        return True
+
+
+class S3ArtifactStorage(LocalArtifactStorage):
+    """Local working copy under root, uploaded in the background to an
+    S3-compatible bucket under key prefix + path relative to root."""
+
+    def __init__(self, root, base_url, bucket, prefix="", public_url="", endpoint_url=None,
+                 region_name=None, batch_size=32, upload_concurrency=8, client=None, dedupe=False):
+        super().__init__(root, base_url, dedupe)
+        if client is None:
+            if boto3 is None:
+                raise ImproperlyConfigured('ARTIFACT_STORAGE = "s3" requires the boto3 package')
+            client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region_name)
+        if not bucket:
+            raise ImproperlyConfigured('ARTIFACT_STORAGE = "s3" requires ARTIFACT_S3["bucket"]')
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.public_url = public_url.rstrip("/")
+        self.batch_size = batch_size
+        self._uploads = ThreadPoolExecutor(max_workers=upload_concurrency, thread_name_prefix="artifact-upload")
+        self._queue = queue.Queue()
+        self._pending = Counter()  # path -> uploads queued and not finished
+        self._idle = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="artifact-upload", daemon=True)
+        self._thread.start()
+
+    def key(self, path):
+        return self.prefix + self.relative(path)
+
+    def url(self, request, *parts):
+        """Bucket URL of the artifact at parts, or its local URL while its
+        upload is still pending (see the module docstring)."""
+        path = os.path.join(self.root, *[str(p) for p in parts])
+        if not self.public_url or not self.flush(*_with_sidecars([path]), timeout=0):
+            return super().url(request, *parts)
+        relative = "/".join(str(p).replace(os.sep, "/").strip("/") for p in parts)
+        return f"{self.public_url}/{quote(self.prefix + relative)}"
+
+    def publish(self, *paths):
+        digests = super().publish(*paths)
+        files = _with_sidecars(paths)
+        if not files:
+            return digests
+        with self._idle:
+            self._pending.update(files)
+        self._queue.put(files)
+        return digests
+
+    def flush(self, *paths, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while any(self._pending[p] for p in paths) if paths else self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _upload(self, path):
+        extra = {"ContentType": mimetypes.guess_type(path[:-3] if path.endswith(_SIDECAR_SUFFIXES) else path)[0]
+                 or "application/octet-stream"}
+        if path.endswith(".gz"):
+            extra["ContentEncoding"] = "gzip"
+        elif path.endswith(".br"):
+            extra["ContentEncoding"] = "br"
+        self.client.upload_file(path, self.bucket, self.key(path), ExtraArgs=extra)
+
+    def _upload_if_present(self, path):
+        try:
+            if os.path.exists(path):
+                self._upload(path)
+        except Exception as e:
+            print(f"Artifact upload failed for {path}: {e}")
+
+    def _run(self):
+        while True:
+            batch = list(self._queue.get())
+            while len(batch) < self.batch_size:
+                try:
+                    batch.extend(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # The same file published twice before its upload is only sent once
+            list(self._uploads.map(self._upload_if_present, dict.fromkeys(batch)))
+            with self._idle:
+                self._pending.subtract(batch)
+                self._pending += Counter()  # drop the paths that reached zero
+                self._idle.notify_all()
+
+
+def _location(host):
+    locations = getattr(settings, "ARTIFACT_LOCATIONS", {})
+    if host in locations:
+        return locations[host]
+    return getattr(settings, "MEDIA_ROOT", ""), getattr(settings, "MEDIA_URL", "/media/")
+
+
+def _build_storage(root, base_url):
+    if not root:
+        # An empty root would be the working directory: the project itself
+        raise ImproperlyConfigured("MEDIA_ROOT (or the ARTIFACT_LOCATIONS root) is not set")
+    backend = getattr(settings, "ARTIFACT_STORAGE", "local")
+    dedupe = getattr(settings, "ARTIFACT_DEDUPE", False)
+    if backend == "local":
+        return LocalArtifactStorage(root, base_url, dedupe=dedupe)
+    if backend == "s3":
+        options = dict(getattr(settings, "ARTIFACT_S3", {}))
+        return S3ArtifactStorage(root, base_url, dedupe=dedupe, **options)
+    raise ImproperlyConfigured(f"Unknown ARTIFACT_STORAGE {backend!r} (expected 'local' or 's3')")
+
+
+def _storage(root, base_url):
+    with _storages_guard:
+        key = (str(root), base_url)
+        if key not in _storages:
+            _storages[key] = _build_storage(root, base_url)
+        return _storages[key]
+
+
+def artifact_storage(request):
+    """Storage for the artifacts generated for this request's host."""
+    return _storage(*_location(request.get_host().split(":")[0]))
+
+
+def storage_for_path(path):
+    """Storage whose root contains path (e.g. a deck being edited), or None."""
+    candidates = list(getattr(settings, "ARTIFACT_LOCATIONS", {}).values())
+    candidates.append(_location(None))
+    for root, base_url in candidates:
+        if not root:
+            continue
+        storage = _storage(root, base_url)
+        if storage.contains(path):
+            return storage
+    return None
@@ -0,0 +1,43 @@
+"""
+Load and compile the deck templates at process start.
+
+The deck templates are large (the browser decks are 150-170 KB of markup),
+so parsing them is the bulk of the first render after a deploy. With the
+explicit cached loader in settings.TEMPLATES a template is parsed once per
+process; warm_templates() does that parse up front, with the engine that
+renders each deck (settings.DECK_TEMPLATE_ENGINES), so that
+
+  - no request pays for it (workers forked after the app is loaded inherit
+    the parsed templates; Jinja2 also fills its bytecode cache), and
+  - a template that does not compile stops the process from starting
+    instead of failing the first deck generated from it.
+
+BlogConfig.ready() calls it when settings.DECK_TEMPLATE_WARMUP is on, in
+processes that serve requests only (apps.serves_requests(): not in
+management commands or render workers).
+"""
+
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+
+DECK_TEMPLATES = ["volt.html", "volt_Electricity.html", "volt-electricity.html", "volt-gas.html"]
+
+
+def warm_templates(template_names=None):
+    """Compile each deck template into its engine's template cache. Returns
+    {template_name: milliseconds}; raises ImproperlyConfigured for a template
+    that is missing or does not compile."""
+    from .deck_writer import deck_engine
+
+    timings = {}
+    for name in template_names or DECK_TEMPLATES:
+        engine = deck_engine(name)
+        start = time.perf_counter()
+        try:
+            engines[engine].get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError) as e:
+            raise ImproperlyConfigured(f"Deck template {name} ({engine} engine) does not compile: {e}") from e
+        timings[name] = (time.perf_counter() - start) * 1000
+    return timings
@@ -1,3 +1,1383 @@
-from django.test import TestCase
-
-# Create your tests here.
+"""
+Tests for the deck rendering pipeline.
+
+The deck templates are rendered with the synthetic CRM payloads of
+benchmark_templates (the contexts check_jinja2_parity and the benchmarks
+use), so every test runs against the real templates.
+"""
+
+import gzip
+import io
+import json
+import os
+import random
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack, redirect_stdout
+from html.parser import HTMLParser
+from types import SimpleNamespace
+from unittest import mock
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import requests
+from PIL import Image
+from django.template import engines
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from .apps import serves_requests
+from .deck_html import split_deck_sections, split_html_slides
+from .deck_writer import (
+    _FRAGMENT_LOADER, CHUNK_SIZE, EDIT_BROTLI_QUALITY, deck_fragment_paths, fragment_dir, iter_template_chunks,
+    stream_template_to_file, write_compressed_sidecars, write_split_deck,
+)
+from .html_minify import minify_chunks
+from .jinja2_env import translate_django_template
+from .pdf_pipeline import postprocess_pdf, preview_paths, render_pdf, write_html_previews, write_pdf_previews
+from .render_cache import get_or_render, template_version
+from .render_jobs import RenderJobError, run_job
+from .retention import prune_artifacts
+from . import edit_index, llm_client, locks, render_jobs
+from .locks import lock_dir, lock_path, named_lock, prune_lock_files
+from .models import GeneratedArtifact
+from .storage import (
+    MAX_VERSIONS, LocalArtifactStorage, S3ArtifactStorage, artifact_lock, cached_digest, file_digest,
+)
+from .views import (
+    _deck_version, _preview_urls, _resolve_edit_path, _save_file_edits, save_file_edit, save_file_edit_batch,
+    volt_consulting_presentation,
+)
+from .management.commands.benchmark_templates import TEMPLATES, synthetic_context
+
+PDF_DECKS = ["volt.html", "volt_Electricity.html"]
+BROWSER_DECKS = ["volt-electricity.html", "volt-gas.html"]
+
+_lock_dir = None
+
+
+def setUpModule():
+    # named_lock() files go to a scratch directory, not the project's .render_locks
+    global _lock_dir
+    _lock_dir = tempfile.TemporaryDirectory()
+    _lock_dir.settings = override_settings(RENDER_CACHE_LOCK_DIR=_lock_dir.name)
+    _lock_dir.settings.enable()
+
+
+def tearDownModule():
+    _lock_dir.settings.disable()
+    _lock_dir.cleanup()
+
+
+def _context(template_name, providers):
+    request = RequestFactory().post("/", HTTP_HOST="localhost")
+    with redirect_stdout(io.StringIO()):  # the context builders print progress
+        return synthetic_context(template_name, providers, request)
+
+
+def _render_django(template_name, context):
+    return engines["django"].get_template(template_name).render(context)
+
+
+def _render_jinja2(template_name, context):
+    return "".join(engines["jinja2"].get_template(template_name).template.generate(context))
+
+
+class Jinja2ParityTests(SimpleTestCase):
+    """The Jinja2 port (blog/jinja2_env.py) must render every deck exactly as
+    the Django engine does."""
+
+    def assertSameOutput(self, template_name, context):
+        expected = _render_django(template_name, context)
+        actual = _render_jinja2(template_name, context)
+        if actual != expected:
+            at = next((i for i, (x, y) in enumerate(zip(expected, actual)) if x != y),
+                      min(len(expected), len(actual)))
+            self.fail(f"{template_name}: outputs differ at offset {at}:\n"
+                      f"django: {expected[max(0, at - 80):at + 80]!r}\n"
+                      f"jinja2: {actual[max(0, at - 80):at + 80]!r}")
+
+    def test_decks_render_identically(self):
+        for template_name in TEMPLATES:
+            for providers in (2, 32):
+                with self.subTest(template=template_name, providers=providers):
+                    self.assertSameOutput(template_name, _context(template_name, providers))
+
+    def test_callables_in_the_context_are_called_like_django(self):
+        # data.<key> is now an attribute holding a zero-argument callable:
+        # Django's lookup falls back from item to attribute and calls it
+        for template_name in TEMPLATES:
+            with self.subTest(template=template_name):
+                context = _context(template_name, 8)
+                context["data"] = SimpleNamespace(**{
+                    key: (lambda value=value: value) for key, value in context["data"].items()
+                })
+                self.assertSameOutput(template_name, context)
+
+    def test_lookup_rules(self):
+        class Deck:
+            def title(self):
+                return "<Offre>"
+
+            def price(self, vat):
+                return vat
+
+            def delete(self):
+                raise AssertionError("alters_data callables must not be called")
+            delete.alters_data = True
+
+        class Formatter:
+            do_not_call_in_templates = True
+            label = "kept"
+
+            def __call__(self):
+                raise AssertionError("do_not_call_in_templates objects must not be called")
+
+        source = (
+            "{{ deck.title }}|{{ deck.price }}|{{ deck.delete }}|{{ fmt.label }}|{{ rows.1 }}|{{ map.1 }}"
+            "|{% for key, value in map.items %}{{ key }}={{ value }};{% endfor %}"
+            "|{% if deck.missing %}yes{% else %}no{% endif %}|{{ deck.title|lower }}|{{ get_name }}"
+        )
+        context = {"deck": Deck(), "fmt": Formatter(), "rows": ["a", "b"], "map": {"1": "one", "2": "two"},
+                   "get_name": lambda: "ACME & Co"}
+        jinja_template = engines["jinja2"].env.from_string(translate_django_template(source))
+        self.assertEqual(jinja_template.render(context), engines["django"].from_string(source).render(context))
+
+
+class _TopLevelChildren(HTMLParser):
+    """Independent count of the top-level elements inside the first `parent`
+    element that hold any text or image (page-break filler doesn't count).
+    Closing tags close back to their matching open tag, as a browser does."""
+
+    VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+            "source", "track", "wbr"}
+
+    def __init__(self, parent):
+        super().__init__(convert_charrefs=True)
+        self.parent = parent
+        self.inside = False
+        self.open_tags = []
+        self.children = []
+
+    def handle_starttag(self, tag, attrs):
+        if not self.inside:
+            self.inside = tag == self.parent and not self.children
+            return
+        if not self.open_tags:
+            self.children.append(False)
+        if tag == "img":
+            self.children[-1] = True
+        if tag not in self.VOID:
+            self.open_tags.append(tag)
+
+    def handle_endtag(self, tag):
+        if not self.inside:
+            return
+        if not self.open_tags:
+            self.inside = tag != self.parent
+        elif tag in self.open_tags:
+            del self.open_tags[len(self.open_tags) - 1 - self.open_tags[::-1].index(tag):]
+
+    def handle_data(self, data):
+        if self.inside and self.open_tags and data.strip():
+            self.children[-1] = True
+
+    @classmethod
+    def count(cls, html, parent):
+        parser = cls(parent)
+        parser.feed(html)
+        parser.close()
+        return sum(parser.children)
+
+
+class DeckHtmlSplitTests(SimpleTestCase):
+    """blog/deck_html.py cuts rendered decks into slides with a tag scanner;
+    check it against a real HTML parser on the real templates."""
+
+    def assertSplitsIntoChildren(self, html, parts, parent):
+        self.assertIsNotNone(parts)
+        prefix, slides, suffix = parts
+        self.assertEqual(prefix + "".join(slides) + suffix, html)
+        self.assertEqual(len(slides), _TopLevelChildren.count(html, parent))
+        wrap_open, wrap_close = f"<{parent}>", f"</{parent}>"
+        for i, slide in enumerate(slides):
+            with self.subTest(slide=i):
+                self.assertEqual(_TopLevelChildren.count(wrap_open + slide + wrap_close, parent), 1)
+
+    def test_pdf_decks_split_into_body_children(self):
+        for template_name in PDF_DECKS:
+            for providers in (2, 32):
+                with self.subTest(template=template_name, providers=providers):
+                    html = _render_django(template_name, _context(template_name, providers))
+                    self.assertSplitsIntoChildren(html, split_html_slides(html), "body")
+
+    def test_browser_decks_split_into_sections(self):
+        for template_name in BROWSER_DECKS:
+            with self.subTest(template=template_name):
+                html = _render_django(template_name, _context(template_name, 8))
+                self.assertSplitsIntoChildren(html, split_deck_sections(html), "deck-stage")
+
+
+class _EditableElements(HTMLParser):
+    """Independent list of the outer HTML of every element carrying a
+    (non-false) contenteditable attribute, outermost ones only."""
+
+    def __init__(self, html):
+        super().__init__(convert_charrefs=True)
+        self.html = html
+        self.line_starts = [0] + [i + 1 for i, c in enumerate(html) if c == "\n"]
+        self.open_tag = None
+        self.depth = 0
+        self.start = 0
+        self.elements = []
+
+    def position(self):
+        line, col = self.getpos()
+        return self.line_starts[line - 1] + col
+
+    def handle_starttag(self, tag, attrs):
+        if self.open_tag is not None:
+            self.depth += tag == self.open_tag
+            return
+        editable = dict(attrs).get("contenteditable", "false")
+        if "contenteditable" in dict(attrs) and (editable or "").lower() != "false" and tag not in _TopLevelChildren.VOID:
+            self.open_tag, self.depth, self.start = tag, 1, self.position()
+
+    def handle_endtag(self, tag):
+        if tag != self.open_tag:
+            return
+        self.depth -= 1
+        if self.depth == 0:
+            end = self.html.index(">", self.position()) + 1
+            self.elements.append(self.html[self.start:end])
+            self.open_tag = None
+
+    @classmethod
+    def find(cls, html):
+        parser = cls(html)
+        parser.feed(html)
+        parser.close()
+        return parser.elements
+
+
+class HtmlMinifyTests(SimpleTestCase):
+    """The minifier may only touch whitespace and comments outside what the
+    inline editor reads back: EDIT regions and contenteditable elements."""
+
+    EDIT_RE = re.compile(r"<!-- EDIT:start:([\w.\-]+) -->.*?<!-- EDIT:end:\1 -->", re.S)
+    # the decks' own editable elements all sit inside EDIT regions
+    UNMARKED_EDITABLE = ('<div contenteditable data-edit-key="note">\n  Tarif   <b>fixe</b>\n'
+                         '  <div>  <!-- note -->\n\n  2 ans </div>\n</div>')
+
+    def test_editable_content_is_kept_byte_exact(self):
+        for template_name in BROWSER_DECKS:
+            html = _render_django(template_name, _context(template_name, 8))
+            html = html.replace("</body>", self.UNMARKED_EDITABLE + "</body>", 1)
+            regions = [m.group(0) for m in self.EDIT_RE.finditer(html)]
+            editables = _EditableElements.find(html)
+            self.assertTrue(regions)
+            self.assertIn(self.UNMARKED_EDITABLE, editables)
+            chunkings = {
+                "whole": [html],
+                "streamed": [chunk.replace("</body>", self.UNMARKED_EDITABLE + "</body>", 1)
+                             for chunk in iter_template_chunks(template_name, _context(template_name, 8))],
+                "7-char": [html[i:i + 7] for i in range(0, len(html), 7)],
+            }
+            for chunking, chunks in chunkings.items():
+                with self.subTest(template=template_name, chunks=chunking):
+                    self.assertEqual("".join(chunks), html)
+                    minified = "".join(minify_chunks(chunks))
+                    self.assertLess(len(minified), len(html))
+                    self.assertEqual([m.group(0) for m in self.EDIT_RE.finditer(minified)], regions)
+                    self.assertEqual(_EditableElements.find(minified), editables)
+
+
+class DeckWriterTests(SimpleTestCase):
+    def test_chunks_join_into_the_rendered_deck(self):
+        for template_name in TEMPLATES:
+            for providers in (2, 128):
+                with self.subTest(template=template_name, providers=providers):
+                    context = _context(template_name, providers)
+                    chunks = list(iter_template_chunks(template_name, context))
+                    self.assertEqual("".join(chunks), _render_django(template_name, context))
+                    # the provider loops stream row by row instead of as one chunk
+                    self.assertLess(max(map(len, chunks)), 2 * CHUNK_SIZE)
+
+    def test_a_shell_deck_and_its_fragments_rebuild_the_deck(self):
+        html = _render_django("volt-electricity.html", _context("volt-electricity.html", 8))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "deck.html")
+
+            def rebuilt(shell_slides, chunks):
+                fragments = write_split_deck(chunks, path, shell_slides=shell_slides)
+                self.assertEqual(fragments, deck_fragment_paths(path))
+                with open(path, encoding="utf-8") as f:
+                    shell = f.read()
+                self.assertEqual(shell.count("data-deck-fragment="), len(fragments))
+
+                def fragment(m):
+                    with open(os.path.join(fragment_dir(path), m.group(1)), encoding="utf-8") as f:
+                        return f.read()
+
+                shell = shell.replace("</deck-stage>\n" + _FRAGMENT_LOADER, "</deck-stage>")
+                return fragments, re.sub(r'<section\b[^>]*? data-deck-fragment="deck\.slides/(slide-\d+\.html)"></section>',
+                                         fragment, shell)
+
+            fragments, deck = rebuilt(1, [html[i:i + 7] for i in range(0, len(html), 7)])
+            self.assertEqual(deck, html)
+            self.assertGreater(len(fragments), 2)
+
+            # fewer slides split out: the fragments of the earlier save go
+            shorter, deck = rebuilt(3, iter_template_chunks("volt-electricity.html",
+                                                            _context("volt-electricity.html", 8)))
+            self.assertEqual(deck, html)
+            self.assertEqual(shorter, fragments[2:])
+
+            # a single-file save removes them all
+            stream_template_to_file("volt-electricity.html", _context("volt-electricity.html", 8), path)
+            self.assertEqual(deck_fragment_paths(path), [])
+            self.assertFalse(os.path.exists(fragment_dir(path)))
+
+
+class CompressedSidecarTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "deck.html")
+        self.data = _render_django("volt-gas.html", _context("volt-gas.html", 2)).encode("utf-8")
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+
+    def test_sidecars_decompress_to_the_deck(self):
+        written = write_compressed_sidecars(self.path)
+        with open(self.path + ".gz", "rb") as f:
+            self.assertEqual(gzip.decompress(f.read()), self.data)
+        if brotli is None:
+            self.assertEqual(written, [self.path + ".gz"])
+            return
+        self.assertEqual(written, [self.path + ".gz", self.path + ".br"])
+        with open(self.path + ".br", "rb") as f:
+            self.assertEqual(brotli.decompress(f.read()), self.data)
+
+    def test_edit_saves_compress_faster(self):
+        if brotli is None:
+            self.skipTest("brotli is not installed")
+        with mock.patch("blog.deck_writer.brotli.compress", wraps=brotli.compress) as compress:
+            write_compressed_sidecars(self.path, self.data, brotli_quality=EDIT_BROTLI_QUALITY)
+        self.assertEqual(compress.call_args.kwargs["quality"], EDIT_BROTLI_QUALITY)
+        with open(self.path + ".br", "rb") as f:
+            self.assertEqual(brotli.decompress(f.read()), self.data)
+
+    def test_a_sidecar_that_cannot_be_refreshed_is_removed(self):
+        write_compressed_sidecars(self.path)
+        with mock.patch("blog.deck_writer.gzip.compress", side_effect=MemoryError):
+            written = write_compressed_sidecars(self.path, b"<html>edited</html>")
+        self.assertNotIn(self.path + ".gz", written)
+        self.assertFalse(os.path.exists(self.path + ".gz"))
+
+    def test_a_stale_brotli_sidecar_is_removed_without_brotli(self):
+        with open(self.path + ".br", "wb") as f:
+            f.write(b"stale")
+        with mock.patch("blog.deck_writer.brotli", None):
+            self.assertEqual(write_compressed_sidecars(self.path), [self.path + ".gz"])
+        self.assertFalse(os.path.exists(self.path + ".br"))
+
+
+@override_settings(RENDER_CACHE_ALIAS="render-cache-tests", CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "render-cache-tests": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                           "LOCATION": "render-cache-tests"},
+})
+class RenderCacheTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, relative, data):
+        path = os.path.join(self.tmp.name, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)  # new inode, as every artifact writer does
+        return path
+
+    def test_hit_is_rejected_once_the_artifact_was_replaced(self):
+        path = self.write("deck.pdf", b"first render")
+        renders = []
+
+        def render():
+            renders.append(path)
+            return {"path": path, "url": "/media/deck.pdf", "name": "deck.pdf"}
+
+        result, cached = get_or_render("render:replaced", render)
+        self.assertFalse(cached)
+        self.assertEqual(get_or_render("render:replaced", render), (result, True))
+
+        self.write("deck.pdf", b"another generation under the same name")
+        result, cached = get_or_render("render:replaced", render)
+        self.assertFalse(cached)
+        self.assertEqual(len(renders), 2)
+
+    def test_template_version_covers_includes_and_static_assets(self):
+        self.write("templates/deck.html", b"{% include 'part.html' %}")
+        self.write("templates/part.html", b"v1")
+        self.write("static/deck/deck.css", b"a{}")
+        with override_settings(BASE_DIR=self.tmp.name, DECK_TEMPLATE_VERSION=None):
+            versions = [template_version("deck.html")]
+            self.write("templates/part.html", b"v2")
+            versions.append(template_version("deck.html"))
+            self.write("static/deck/deck.css", b"a{color:red}")
+            versions.append(template_version("deck.html"))
+            self.write("static/deck/img/manifest.json", b"{}")
+            versions.append(template_version("deck.html"))
+            self.assertEqual(template_version("deck.html"), versions[-1])
+            self.assertEqual(template_version("missing.html"), "missing")
+        self.assertEqual(len(set(versions)), 4)
+
+
+@override_settings(RENDER_JOBS_ENABLED=False, RENDER_WORKERS=2)
+class ParallelPdfRenderTests(SimpleTestCase):
+    HTML = "<html><body>" + "".join(f"<div>slide {i}</div>" for i in range(6)) + "</body></html>"
+
+    def test_slides_render_at_most_worker_count_at_a_time(self):
+        running, peak, guard = [0], [0], threading.Lock()
+
+        def write_pdf(html, page_css, zoom):
+            with guard:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with guard:
+                running[0] -= 1
+            return html.encode()
+
+        with mock.patch("blog.pdf_pipeline._write_pdf", write_pdf):
+            parts = render_pdf(self.HTML, "", parallel=True)
+        self.assertEqual(len(parts), 6)
+        self.assertIn(b"slide 5", parts[5])
+        self.assertEqual(peak[0], 2)
+
+    def test_a_failed_slide_falls_back_to_the_serial_render(self):
+        def write_pdf(html, page_css, zoom):
+            if "slide 3" in html and "slide 4" not in html:
+                raise RenderJobError("pdf", "timeout", "exceeded 300s")
+            return html.encode()
+
+        with mock.patch("blog.pdf_pipeline._write_pdf", write_pdf), redirect_stdout(io.StringIO()):
+            pdf = render_pdf(self.HTML, "", parallel=True)
+        self.assertEqual(pdf, self.HTML.encode())
+
+
+def _pdf(*pages, color=None):
+    """PDF bytes with one page per entry: a text slide, or None for a blank
+    page. color (r, g, b floats) fills the whole of every text page."""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page(width=595, height=300)
+        if text is not None:
+            if color:
+                page.draw_rect(page.rect, color=color, fill=color)
+            page.insert_text((40, 60), text, fontsize=14)
+    try:
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+def _page_texts(path):
+    import fitz  # PyMuPDF
+
+    with fitz.open(path) as doc:
+        return [page.get_text().strip() for page in doc]
+
+
+class PostprocessPdfTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "deck.pdf")
+
+    def postprocess(self, pdf, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            return postprocess_pdf(pdf, self.path, **kwargs)
+
+    def slide(self, n):
+        return f"Slide {n}: offre fournisseur comparée"
+
+    def test_removed_and_blank_pages_are_dropped(self):
+        pdf = _pdf(self.slide(1), self.slide(2), None, self.slide(3), self.slide(4))
+        self.assertEqual(self.postprocess(pdf, remove_pages=[1], drop_blank_pages=True), 3)
+        self.assertEqual(_page_texts(self.path), [self.slide(1), self.slide(3), self.slide(4)])
+
+        # blank pages stay unless asked for
+        self.assertEqual(self.postprocess(pdf), 5)
+        self.assertEqual(len(_page_texts(self.path)), 5)
+
+    def test_removed_pages_index_each_part(self):
+        parts = [_pdf(self.slide(1), None), _pdf(self.slide(2)), _pdf(self.slide(3), None)]
+        self.assertEqual(self.postprocess(parts, remove_pages=[1]), 3)
+        self.assertEqual(_page_texts(self.path), [self.slide(1), self.slide(2), self.slide(3)])
+
+    def test_an_artifact_hard_link_is_replaced_not_written_through(self):
+        blob = self.path + ".blob"
+        with open(blob, "wb") as f:
+            f.write(b"%PDF- stored blob")
+        os.link(blob, self.path)
+        self.postprocess(_pdf(self.slide(1)))
+        with open(blob, "rb") as f:
+            self.assertEqual(f.read(), b"%PDF- stored blob")
+        self.assertEqual(_page_texts(self.path), [self.slide(1)])
+
+
+class DeckPreviewTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def assertRedThumbnail(self, path, width=480):
+        with Image.open(path) as img:
+            self.assertEqual(img.format, "JPEG")
+            self.assertEqual(img.width, width)
+            self.assertAlmostEqual(img.height, width * 300 / 595, delta=1)
+            r, g, b = img.convert("RGB").getpixel((img.width - 10, img.height - 10))
+            self.assertGreater(r, 200)
+            self.assertLess(max(g, b), 60)
+
+    def test_pdf_previews_are_thumbnails_of_the_first_pages(self):
+        artifact = os.path.join(self.dir, "Comparatif_ACME.pdf")
+        pdf = _pdf("Slide 1", "Slide 2", "Slide 3", color=(1, 0, 0))
+        written = write_pdf_previews(pdf, artifact, count=2)
+        self.assertEqual(written, [os.path.join(self.dir, "previews", "Comparatif_ACME-1.jpg"),
+                                   os.path.join(self.dir, "previews", "Comparatif_ACME-2.jpg")])
+        for path in written:
+            self.assertRedThumbnail(path)
+
+        # a shorter PDF gets fewer previews
+        self.assertEqual(len(write_pdf_previews(pdf, artifact, count=5, width=200)), 3)
+        self.assertRedThumbnail(written[0], width=200)
+
+    def test_html_previews_lay_out_only_the_first_sections(self):
+        artifact = os.path.join(self.dir, "deck.html")
+        with open(artifact, "w", encoding="utf-8") as f:
+            f.write("<html><head></head><body><deck-stage>"
+                    + "".join(f"<section><h1>Slide {i}</h1></section>" for i in range(1, 4))
+                    + "</deck-stage></body></html>")
+        laid_out = []
+
+        def write_pdf(html, page_css, zoom):
+            laid_out.append((html, page_css))
+            return _pdf("Slide 1", "Slide 2", color=(1, 0, 0))
+
+        with mock.patch("blog.pdf_pipeline._write_pdf", write_pdf):
+            written = write_html_previews(artifact, count=2)
+        self.assertEqual(written, preview_paths(artifact, 2))
+        (html, page_css), = laid_out
+        self.assertIn("Slide 2", html)
+        self.assertNotIn("Slide 3", html)
+        self.assertIn("deck-stage > section", page_css)
+        for path in written:
+            self.assertRedThumbnail(path)
+
+    @override_settings(DECK_PREVIEW_COUNT=2)
+    def test_only_written_previews_are_listed(self):
+        artifact = os.path.join(self.dir, "deck.html")
+        url = "https://crm.example/media/comparatif/12/deck.html"
+        self.assertEqual(_preview_urls(url, artifact), [])
+        write_pdf_previews(_pdf("Slide 1"), artifact, count=1)
+        self.assertEqual(_preview_urls(url, artifact), ["https://crm.example/media/comparatif/12/previews/deck-1.jpg"])
+
+
+@override_settings(RENDER_JOBS_ENABLED=True, RENDER_JOB_TIMEOUTS={"chart": 0.5}, RENDER_WORKER_MAX_JOBS=50,
+                   RENDER_WORKER_RECYCLE_RSS_MB=768, RENDER_WORKER_MAX_RSS_MB=2048)
+class RenderJobTests(SimpleTestCase):
+    """Real spawned workers running builtins (the test module itself isn't
+    importable in a worker)."""
+
+    def setUp(self):
+        self.addCleanup(self.retire_idle_workers)
+
+    def retire_idle_workers(self):
+        while render_jobs._idle_workers:
+            render_jobs._idle_workers.pop().retire()
+
+    def requires_rss(self):
+        if render_jobs._rss_bytes() is None:
+            self.skipTest("no /proc RSS on this platform")
+
+    def test_a_job_over_its_stage_timeout_is_killed(self):
+        started = time.monotonic()
+        with self.assertRaises(RenderJobError) as raised:
+            run_job("chart", time.sleep, 30)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual((raised.exception.code, raised.exception.http_status), ("timeout", 504))
+        self.assertEqual(render_jobs._idle_workers, [])  # killed, not returned to the pool
+        self.assertIsInstance(run_job("chart", os.getpid), int)
+
+    def test_a_timed_out_render_is_a_504(self):
+        def chart_job(stage, func, *args, **kwargs):
+            return run_job(stage, time.sleep, 30)
+
+        request = RequestFactory().post("/", json.dumps({}), content_type="application/json", HTTP_HOST="localhost")
+        with override_settings(RENDER_CACHE_ENABLED=False), mock.patch("blog.views.run_job", chart_job):
+            with redirect_stdout(io.StringIO()):
+                response = volt_consulting_presentation(request)
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(json.loads(response.content)["code"], "timeout")
+
+    def test_failures_keep_the_worker_crashes_replace_it(self):
+        pid = run_job("chart", os.getpid)
+        with self.assertRaises(RenderJobError) as raised:
+            run_job("chart", exec, "1 / 0")
+        self.assertEqual((raised.exception.code, raised.exception.http_status), ("failed", 500))
+        self.assertEqual(run_job("chart", os.getpid), pid)
+
+        with self.assertRaises(RenderJobError) as raised:
+            run_job("chart", exec, "import os; os._exit(3)")
+        self.assertEqual((raised.exception.code, raised.exception.http_status), ("crashed", 503))
+        self.assertNotEqual(run_job("chart", os.getpid), pid)
+
+    @override_settings(RENDER_WORKER_MAX_JOBS=2)
+    def test_a_worker_is_recycled_after_max_jobs(self):
+        with redirect_stdout(io.StringIO()):
+            pids = [run_job("chart", os.getpid) for _ in range(3)]
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[1], pids[2])
+
+    @override_settings(RENDER_WORKER_RECYCLE_RSS_MB=1)
+    def test_a_worker_over_the_recycle_rss_is_replaced(self):
+        self.requires_rss()
+        with redirect_stdout(io.StringIO()) as out:
+            pids = [run_job("chart", os.getpid) for _ in range(2)]
+        self.assertNotEqual(pids[0], pids[1])
+        self.assertIn("Recycling render worker %d" % pids[0], out.getvalue())
+
+    @override_settings(RENDER_WORKER_MAX_RSS_MB=300)
+    def test_a_worker_over_the_hard_rss_limit_is_killed(self):
+        self.requires_rss()
+        started = time.monotonic()
+        with self.assertRaises(RenderJobError) as raised:
+            run_job("chart", exec, "import time; data = b'x' * (400 << 20); time.sleep(30)", timeout=20)
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertEqual((raised.exception.code, raised.exception.http_status), ("memory", 503))
+        self.assertEqual(render_jobs._idle_workers, [])
+
+
+class ServesRequestsTests(SimpleTestCase):
+    """The template warmup and background threads started from
+    BlogConfig.ready() are only for processes that serve requests."""
+
+    def assertServes(self, argv, expected, **environ):
+        with mock.patch.object(sys, "argv", argv), mock.patch.dict(os.environ, environ):
+            if "RUN_MAIN" not in environ:
+                os.environ.pop("RUN_MAIN", None)
+            if "RENDER_WORKER" not in environ:
+                os.environ.pop("RENDER_WORKER", None)
+            self.assertIs(serves_requests(), expected)
+
+    def test_web_servers(self):
+        self.assertServes(["/srv/venv/bin/gunicorn", "api.wsgi"], True)
+        self.assertServes(["manage.py", "runserver"], True, RUN_MAIN="true")
+        self.assertServes(["manage.py", "runserver", "--noreload"], True)
+
+    def test_commands_and_render_workers(self):
+        self.assertServes(["manage.py", "migrate"], False)
+        self.assertServes(["manage.py", "runserver"], False)  # the autoreloader's parent
+        self.assertServes(["/usr/lib/python3/site-packages/django/__main__.py", "shell"], False)
+        self.assertServes(["/srv/venv/bin/gunicorn", "api.wsgi"], False, RENDER_WORKER="1")
+
+
+class ArtifactClaimTests(SimpleTestCase):
+    PARTS = ("clients", "7", "Comparatif_ACME_2026-01-05.pdf")
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.storage = LocalArtifactStorage(tmp.name, "/media/")
+        self.path = self.storage.path(*self.PARTS)
+
+    def version(self, n):
+        stem, ext = os.path.splitext(self.path)
+        return self.path if n == 1 else f"{stem}_v{n}{ext}"
+
+    def claim_in_thread(self, claimed, release):
+        """Start a thread holding a claim until release is set; its path is
+        appended to claimed."""
+        def hold():
+            with self.storage.claim(*self.PARTS) as path:
+                claimed.append(path)
+                release.wait(5)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(release.set)
+        return thread
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def test_concurrent_claims_get_their_own_versions(self):
+        claimed, release = [], threading.Event()
+        threads = [self.claim_in_thread(claimed, release) for _ in range(3)]
+        self.assertTrue(self.wait_for(lambda: len(claimed) == 3))
+        self.assertEqual(sorted(claimed), sorted(self.version(n) for n in (1, 2, 3)))
+        with self.storage.claim(*self.PARTS) as path:
+            self.assertEqual(path, self.version(4))
+
+        # once released, the name itself is handed out again
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        with self.storage.claim(*self.PARTS) as path:
+            self.assertEqual(path, self.path)
+
+    def test_past_the_version_limit_a_claim_waits_for_the_name(self):
+        self.assertEqual(MAX_VERSIONS, 20)
+        with ExitStack() as held:
+            for n in range(1, MAX_VERSIONS + 1):
+                self.assertTrue(held.enter_context(artifact_lock(self.version(n), blocking=False)))
+            claimed, release = [], threading.Event()
+            self.claim_in_thread(claimed, release)
+            time.sleep(0.2)
+            self.assertEqual(claimed, [])  # no _v21
+        self.assertTrue(self.wait_for(lambda: claimed))
+        self.assertEqual(claimed, [self.path])
+
+    @override_settings(ARTIFACT_CONCURRENT_WRITES="wait")
+    def test_wait_mode_replaces_the_name_in_turn(self):
+        claimed, release = [], threading.Event()
+        with self.storage.claim(*self.PARTS) as path:
+            self.assertEqual(path, self.path)
+            self.claim_in_thread(claimed, release)
+            time.sleep(0.2)
+            self.assertEqual(claimed, [])
+        self.assertTrue(self.wait_for(lambda: claimed))
+        self.assertEqual(claimed, [self.path])
+
+
+class ArtifactDedupeTests(SimpleTestCase):
+    def test_interning_identical_content_leaves_other_names_untouched(self):
+        with tempfile.TemporaryDirectory() as root:
+            storage = LocalArtifactStorage(root, "/media/", dedupe=True)
+            first = storage.path("clients", "7", "Comparatif_2026-01-05.pdf")
+            with open(first, "wb") as f:
+                f.write(b"%PDF same deck")
+            os.utime(first, (1_000_000, 1_000_000))
+            storage.publish(first)
+
+            second = storage.path("clients", "7", "Comparatif_2026-02-05.pdf")
+            with open(second, "wb") as f:
+                f.write(b"%PDF same deck")
+            storage.publish(second)
+
+            self.assertTrue(os.path.samefile(first, second))
+            self.assertEqual(os.stat(first).st_mtime, 1_000_000)
+
+    def test_publish_hands_back_the_digest_it_computed(self):
+        with tempfile.TemporaryDirectory() as root:
+            storage = LocalArtifactStorage(root, "/media/", dedupe=True)
+            path = storage.path("clients", "7", "Comparatif_2026-01-05.pdf")
+            with open(path, "wb") as f:
+                f.write(b"%PDF deck")
+            with mock.patch("blog.storage.file_digest", wraps=file_digest) as digest:
+                digests = storage.publish(path)
+                self.assertEqual(cached_digest(path), digests[path])
+            self.assertEqual(digests[path], file_digest(path))
+            self.assertEqual(digest.call_count, 1)
+
+    def test_editing_a_file_outside_the_artifact_roots_leaves_it_alone(self):
+        with tempfile.TemporaryDirectory() as root:
+            template = os.path.join(root, "templates", "volt-gas.html")
+            os.makedirs(os.path.dirname(template))
+            with open(template, "w", encoding="utf-8") as f:
+                f.write("<html><body><!-- EDIT:start:title -->old<!-- EDIT:end:title --></body></html>")
+            with override_settings(MEDIA_ROOT=os.path.join(root, "media"), ARTIFACT_LOCATIONS={},
+                                   ARTIFACT_DEDUPE=True):
+                error, _ = _save_file_edits(template, {"title": "<p>new</p>"})
+            self.assertIsNone(error)
+            self.assertEqual(os.stat(template).st_nlink, 1)
+            self.assertEqual(os.listdir(os.path.dirname(template)), ["volt-gas.html"])
+            self.assertFalse(os.path.exists(os.path.join(root, "media")))
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.storage = LocalArtifactStorage(self.root, "/media/", dedupe=True)
+
+    def deck(self, name, data, mtime, directory=("comparatif", "12"), comparatif=None):
+        path = self.storage.path("clients", "7", *directory, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        os.utime(path, (mtime, mtime))
+        self.storage.publish(path)
+        if comparatif is not None:
+            GeneratedArtifact.objects.create(client_id="7", comparatif_id=comparatif, kind=GeneratedArtifact.KIND_HTML,
+                                             root=self.root, path=self.storage.relative(path))
+        return path
+
+    def prune(self, dry_run):
+        removed = []
+        stats = prune_artifacts(roots=[self.root], keep=1, io_rate=0, dry_run=dry_run,
+                                log=lambda msg: removed.append(msg))
+        return stats, sorted(msg.split(" (")[0].split()[-1] for msg in removed)
+
+    def test_series_keep_the_newest_by_file_name_date(self):
+        # the newest deck is an identical regeneration: a hard link to the
+        # blob of the oldest one, so it carries the oldest mtime
+        older = self.deck("Comparatif_ACME_2026-01-05.pdf", b"%PDF v1", 1_000)
+        middle = self.deck("Comparatif_ACME_2026-02-05.pdf", b"%PDF v2", 2_000)
+        newest = self.deck("Comparatif_ACME_2026-03-05.pdf", b"%PDF v1", 3_000)
+        self.assertEqual(os.stat(newest).st_mtime, 1_000)
+        self.prune(dry_run=False)
+        self.assertFalse(os.path.exists(older))
+        self.assertFalse(os.path.exists(middle))
+        self.assertTrue(os.path.exists(newest))
+
+    def test_dry_run_reports_the_blobs_a_real_run_removes(self):
+        self.deck("Comparatif_ACME_2026-01-05.pdf", b"%PDF v1", 1_000)
+        self.deck("Comparatif_ACME_2026-02-05.pdf", b"%PDF v2", 2_000)
+        dry_stats, would_remove = self.prune(dry_run=True)
+        stats, removed = self.prune(dry_run=False)
+        self.assertEqual(would_remove, removed)
+        self.assertEqual(dry_stats, stats)
+        self.assertTrue(any("/.blobs/" in path for path in removed))
+
+    def test_energy_offer_series_are_kept_per_comparatif(self):
+        offers = ("energy_offer",)
+        kept = [self.deck(f"Energy_Offer_ACME_elec_2026-0{n}-01.html", b"<html>%d</html>" % n, n,
+                          directory=offers, comparatif=str(n)) for n in range(1, 5)]
+        older = self.deck("Energy_Offer_ACME_elec_2026-05-01.html", b"<html>old</html>", 5,
+                          directory=offers, comparatif="4")
+        newer = self.deck("Energy_Offer_ACME_elec_2026-06-01.html", b"<html>new</html>", 6,
+                          directory=offers, comparatif="4")
+        unindexed = self.deck("Energy_Offer_ACME_elec_2025-01-01.html", b"<html>legacy</html>", 0,
+                              directory=offers)
+        self.prune(dry_run=False)
+        for path in kept[:3] + [newer, unindexed]:
+            self.assertTrue(os.path.exists(path), path)
+        self.assertFalse(os.path.exists(kept[3]))
+        self.assertFalse(os.path.exists(older))
+        self.assertFalse(GeneratedArtifact.objects.filter(path__endswith="2026-04-01.html").exists())
+
+    def test_compact_dates_are_ordered_too(self):
+        older = self.deck("Energy_Offer_ACME_20260105.pdf", b"%PDF v1", 1_000)
+        newer = self.deck("Energy_Offer_ACME_20260205.pdf", b"%PDF v2", 500)
+        self.prune(dry_run=False)
+        self.assertFalse(os.path.exists(older))
+        self.assertTrue(os.path.exists(newer))
+
+    def test_an_artifact_being_written_is_skipped(self):
+        older = self.deck("Comparatif_ACME_2026-01-05.pdf", b"%PDF v1", 1_000)
+        self.deck("Comparatif_ACME_2026-02-05.pdf", b"%PDF v2", 2_000)
+        with artifact_lock(older):
+            _, removed = self.prune(dry_run=False)
+        self.assertTrue(os.path.exists(older))
+        self.assertIn(older, removed)  # logged as skipped
+        self.prune(dry_run=False)
+        self.assertFalse(os.path.exists(older))
+
+
+class LockFileTests(SimpleTestCase):
+    def test_lock_files_are_sharded(self):
+        with named_lock("abc"):
+            path = lock_path("abc")
+            self.assertTrue(os.path.exists(path))
+        self.assertEqual(os.path.dirname(os.path.dirname(path)), lock_dir())
+
+    def test_unused_lock_files_are_pruned_and_held_ones_kept(self):
+        with named_lock("old"), named_lock("held"):
+            pass
+        with named_lock("recent"):
+            pass
+        for name in ("old", "held"):
+            os.utime(lock_path(name), (1_000, 1_000))
+        with named_lock("held"):
+            self.assertEqual(prune_lock_files(3600, dry_run=True, log=lambda msg: None), 1)
+            self.assertTrue(os.path.exists(lock_path("old")))
+            self.assertEqual(prune_lock_files(3600, log=lambda msg: None), 1)
+        self.assertFalse(os.path.exists(lock_path("old")))
+        self.assertTrue(os.path.exists(lock_path("held")))
+        self.assertTrue(os.path.exists(lock_path("recent")))
+
+    def test_a_lock_file_pruned_while_waited_for_is_not_split(self):
+        # the waiter stands for another process: it has opened the lock file
+        # and blocks in flock() when the file is unlinked under it
+        path = lock_path("busy")
+        held, release = threading.Event(), threading.Event()
+
+        def other_process():
+            lock_file = locks._flock(path, blocking=True)
+            held.set()
+            release.wait(5)
+            lock_file.close()
+
+        with named_lock("busy"):
+            waiter = threading.Thread(target=other_process)
+            waiter.start()
+            time.sleep(0.1)
+            os.remove(path)
+        self.assertTrue(held.wait(5))
+        with named_lock("busy", blocking=False) as acquired:
+            self.assertFalse(acquired)
+        release.set()
+        waiter.join(5)
+
+
+class _S3Stub:
+    """Stands in for the boto3 client: records upload_file() calls, each one
+    held until `release` is set, and how many ran at once."""
+
+    def __init__(self):
+        self.uploads = {}
+        self.release = threading.Event()
+        self.release.set()
+        self.active = self.peak = 0
+        self.guard = threading.Lock()
+
+    def upload_file(self, filename, bucket, key, ExtraArgs=None):
+        with self.guard:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        self.release.wait(5)
+        with open(filename, "rb") as f:
+            self.uploads[(bucket, key)] = (f.read(), ExtraArgs)
+        with self.guard:
+            self.active -= 1
+
+
+class S3ArtifactStorageTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.client = _S3Stub()
+        self.storage = S3ArtifactStorage(tmp.name, "/media/", bucket="decks", prefix="volt/",
+                                         public_url="https://cdn.example.com/", client=self.client)
+
+    def write(self, *parts, data=b"%PDF-1.7"):
+        path = self.storage.path(*parts)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_publish_uploads_the_file_and_its_sidecars_in_the_background(self):
+        path = self.write("clients", "7", "deck.html", data=b"<html></html>")
+        self.write("clients", "7", "deck.html.gz", data=b"gzip bytes")
+        self.storage.publish(path)
+        self.assertTrue(self.storage.flush(timeout=5))
+
+        body, extra = self.client.uploads[("decks", "volt/clients/7/deck.html")]
+        self.assertEqual(body, b"<html></html>")
+        self.assertEqual(extra, {"ContentType": "text/html"})
+        body, extra = self.client.uploads[("decks", "volt/clients/7/deck.html.gz")]
+        self.assertEqual(body, b"gzip bytes")
+        self.assertEqual(extra, {"ContentType": "text/html", "ContentEncoding": "gzip"})
+
+    def test_flush_reports_uploads_still_pending(self):
+        self.client.release.clear()
+        path = self.write("deck.pdf")
+        self.storage.publish(path)
+        self.assertFalse(self.storage.flush(timeout=0.05))
+        self.assertFalse(self.storage.flush(path, timeout=0.05))
+        self.assertTrue(self.storage.flush(self.storage.path("other.pdf"), timeout=0.05))
+        self.client.release.set()
+        self.assertTrue(self.storage.flush(timeout=5))
+        self.assertIn(("decks", "volt/deck.pdf"), self.client.uploads)
+
+    def test_url_is_the_local_copy_until_the_artifact_is_uploaded(self):
+        request = RequestFactory().get("/", HTTP_HOST="localhost")
+        self.client.release.clear()
+        self.storage.publish(self.write("clients", "7", "deck 1.pdf"))
+        started = time.monotonic()
+        url = self.storage.url(request, "clients", "7", "deck 1.pdf")
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(url, "http://localhost/media/clients/7/deck%201.pdf")
+        self.client.release.set()
+        self.assertTrue(self.storage.flush(timeout=5))
+        url = self.storage.url(request, "clients", "7", "deck 1.pdf")
+        self.assertEqual(url, "https://cdn.example.com/volt/clients/7/deck%201.pdf")
+
+    def test_a_publish_is_uploaded_in_parallel(self):
+        self.client.release.clear()
+        paths = [self.write("clients", "7", f"slide-{n}.html") for n in range(4)]
+        self.storage.publish(*paths)
+        time.sleep(0.2)
+        self.assertEqual(self.client.peak, 4)
+        self.client.release.set()
+        self.assertTrue(self.storage.flush(timeout=5))
+        self.assertEqual(len(self.client.uploads), 4)
+
+
+class DeckVersionTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings = override_settings(MEDIA_ROOT=tmp.name, ARTIFACT_LOCATIONS={})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.version = '"%s"' % ("0" * 24)
+        self.path = os.path.join(tmp.name, "deck.html")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("<html><head><script>window.__VOLT_DECK_VERSION__ = %s;</script></head><body>"
+                    "<!-- EDIT:start:title -->old<!-- EDIT:end:title --></body></html>" % json.dumps(self.version))
+
+    def read(self):
+        with open(self.path, encoding="utf-8") as f:
+            return f.read()
+
+    def test_the_version_is_the_one_embedded_in_the_page(self):
+        self.assertEqual(_deck_version(self.path), self.version)
+
+    def test_a_generated_deck_is_not_saved_without_if_match(self):
+        error, version = _save_file_edits(self.path, {"title": "<p>new</p>"})
+        self.assertEqual(error[1], 428)
+        self.assertEqual(version, self.version)
+        self.assertIn(">old<", self.read())
+
+    def test_a_save_embeds_the_new_version_and_refuses_the_old_one(self):
+        error, version = _save_file_edits(self.path, {"title": "<p>new</p>"}, self.version)
+        self.assertIsNone(error)
+        self.assertNotEqual(version, self.version)
+        self.assertIn(json.dumps(version), self.read())
+        self.assertEqual(_deck_version(self.path), version)
+
+        error, current = _save_file_edits(self.path, {"title": "<p>newer</p>"}, self.version)
+        self.assertEqual(error[1], 409)
+        self.assertEqual(current, version)
+
+    def legacy_deck(self, *parts):
+        path = os.path.join(os.path.dirname(self.path), *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("<html><head></head><body><!-- EDIT:start:title -->old<!-- EDIT:end:title --></body></html>")
+        return path
+
+    def test_a_deck_without_an_embedded_version_is_saved_without_if_match(self):
+        path = self.legacy_deck("clients", "7", "energy_offer", "Energy_Offer_ACME_elec_2026-01-05.html")
+        version = _deck_version(path)
+        error, new_version = _save_file_edits(path, {"title": "<p>new</p>"})
+        self.assertIsNone(error)
+        self.assertNotEqual(new_version, version)
+
+        # its content-hash ETag is still checked when the editor sends one
+        error, _ = _save_file_edits(path, {"title": "<p>newer</p>"}, version)
+        self.assertEqual(error[1], 409)
+        error, _ = _save_file_edits(path, {"title": "<p>newer</p>"}, new_version)
+        self.assertIsNone(error)
+
+    def test_a_template_is_saved_without_if_match(self):
+        with tempfile.TemporaryDirectory() as project:
+            with override_settings(MEDIA_ROOT=os.path.join(project, "media"), BASE_DIR=project):
+                path = os.path.join(project, "templates", "volt-gas.html")
+                os.makedirs(os.path.dirname(path))
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write("<html><body><!-- EDIT:start:title -->old<!-- EDIT:end:title --></body></html>")
+                self.assertEqual(_resolve_edit_path("templates/volt-gas.html"), path)
+                error, _ = _save_file_edits(path, {"title": "<p>new</p>"})
+            self.assertIsNone(error)
+            with open(path, encoding="utf-8") as f:
+                self.assertIn("<p>new</p>", f.read())
+
+
+class EditIndexTests(SimpleTestCase):
+    KEYS = ["title", "intro", "price", "footer"]
+
+    def deck(self):
+        return (
+            "<html><body>"
+            "<!-- EDIT:start:title -->Offre <span class=\"def\" data-for=\"price\">défaut</span><!-- EDIT:end:title -->"
+            "<p><span class=\"def\" data-for=\"intro\">défaut</span></p>"
+            "<!-- EDIT:start:intro -->old intro<!-- EDIT:end:intro -->"
+            "<!-- EDIT:start:price -->12 €<!-- EDIT:end:price -->"
+            "<span class=\"def\" data-for=\"footer\">défaut</span>"
+            "<!-- EDIT:start:footer -->a<!-- EDIT:end:footer -->"
+            "<div><!-- EDIT:start:price -->12 €<!-- EDIT:end:price --></div>"
+            "</body></html>"
+        ).encode("utf-8")
+
+    def rescan(self, data, key):
+        """Field and deftag spans of key found by plain regexes over data."""
+        k = re.escape(key.encode("ascii"))
+        fields = [m.span(1) for m in re.finditer(rb"<!-- EDIT:start:%s -->(.*?)<!-- EDIT:end:%s -->" % (k, k), data, re.S)]
+        deftags = [m.span() for m in re.finditer(rb'<span\b[^>]*\bdata-for="%s"[^>]*>.*?</span>' % k, data, re.S)]
+        return fields, deftags
+
+    def assertIndexes(self, index, data):
+        for key in self.KEYS:
+            fields, deftags = self.rescan(data, key)
+            self.assertEqual(index.field_spans(key), fields, key)
+            self.assertEqual(index.deftag_spans(key), deftags, key)
+
+    def test_the_index_follows_edits_that_grow_and_shrink_the_deck(self):
+        rng = random.Random(47)
+        data = self.deck()
+        index = edit_index.EditIndex.build(data)
+        self.assertIndexes(index, data)
+        # more rounds than _MAX_MAPS, so the re-index fallback is crossed too
+        for _ in range(3 * edit_index._MAX_MAPS):
+            keys = rng.sample(self.KEYS, rng.randint(1, len(self.KEYS)))
+            replacements = {key: "é" * rng.randint(0, 3) + "x" * rng.randint(0, 40) for key in keys}
+            data, index = edit_index.apply_edits(data, index, {k: v.encode("utf-8") for k, v in replacements.items()})
+            self.assertIndexes(index, data)
+            for key in keys:
+                self.assertEqual(edit_index.field_content(data, index, key), replacements[key])
+
+    def test_markers_inside_an_edit_are_indexed(self):
+        data = self.deck()
+        index = edit_index.EditIndex.build(data)
+        data, index = edit_index.apply_edits(data, index, {
+            "intro": b'new <span data-for="footer">d</span>',
+            "footer": b"",
+        })
+        self.assertIndexes(index, data)
+        self.assertEqual(len(index.deftag_spans("footer")), 1)
+
+    def test_a_cached_index_is_dropped_when_the_file_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "deck.html")
+            with open(path, "wb") as f:
+                f.write(self.deck())
+            data, index = edit_index.read_indexed(path)
+            new_data, new_index = edit_index.apply_edits(data, index, {"title": b"longer title"})
+            with open(path, "wb") as f:
+                f.write(new_data)
+            edit_index.remember(path, new_index)
+            self.assertIs(edit_index.index_for(path), new_index)
+
+            with open(path, "wb") as f:
+                f.write(self.deck().replace(b"<html>", b"<!doctype html><html>"))
+            data, index = edit_index.read_indexed(path)
+            self.assertIsNot(index, new_index)
+            self.assertIndexes(index, data)
+
+
+@override_settings(DEBUG=True)
+class SaveFileEditBatchTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings = override_settings(MEDIA_ROOT=tmp.name, ARTIFACT_LOCATIONS={})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.version = '"%s"' % ("0" * 24)
+        self.path = os.path.join(tmp.name, "deck.html")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("<html><head><script>window.__VOLT_DECK_VERSION__ = %s;</script></head><body>"
+                    "<!-- EDIT:start:title -->old<!-- EDIT:end:title -->"
+                    "<!-- EDIT:start:intro -->old intro<!-- EDIT:end:intro --></body></html>"
+                    % json.dumps(self.version))
+
+    def read(self):
+        with open(self.path, encoding="utf-8") as f:
+            return f.read()
+
+    def post(self, payload, **headers):
+        body = payload if isinstance(payload, str) else json.dumps(payload)
+        request = RequestFactory().post("/editor/save-file/batch/", body, content_type="application/json",
+                                        HTTP_HOST="localhost", **headers)
+        response = save_file_edit_batch(request)
+        return response, json.loads(response.content)
+
+    def test_every_edit_of_a_batch_is_saved(self):
+        response, data = self.post({"path": "media/deck.html",
+                                    "edits": [{"key": "title", "html": "<p>new</p>"},
+                                              {"key": "intro", "html": "<p>new intro</p>"}]},
+                                   HTTP_IF_MATCH=self.version)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data["saved"], ["title", "intro"])
+        self.assertEqual(response["ETag"], data["version"])
+        self.assertNotEqual(data["version"], self.version)
+        html = self.read()
+        self.assertIn("new</p>", html)
+        self.assertIn("new intro</p>", html)
+        self.assertNotIn(">old<", html)
+
+        # the {key: html} form is the same batch
+        response, _ = self.post({"path": "media/deck.html", "edits": {"title": "<p>newer</p>"}},
+                                HTTP_IF_MATCH=data["version"])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("newer</p>", self.read())
+
+    def test_a_batch_with_one_missing_key_writes_nothing(self):
+        before = self.read()
+        response, data = self.post({"path": "media/deck.html",
+                                    "edits": [{"key": "title", "html": "<p>new</p>"},
+                                              {"key": "nowhere", "html": "<p>lost</p>"}]},
+                                   HTTP_IF_MATCH=self.version)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(data["keys"], ["nowhere"])
+        self.assertEqual(self.read(), before)
+
+    def test_a_stale_batch_is_refused(self):
+        before = self.read()
+        response, data = self.post({"path": "media/deck.html", "edits": {"title": "<p>new</p>"}},
+                                   HTTP_IF_MATCH='"stale"')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(data["version"], self.version)
+        self.assertEqual(self.read(), before)
+
+    def test_a_malformed_batch_is_a_bad_request(self):
+        before = self.read()
+        for payload in (
+            "{not json",
+            "[]",
+            {"path": "media/deck.html"},
+            {"path": "media/deck.html", "edits": []},
+            {"path": ["media/deck.html"], "edits": {"title": "x"}},
+            {"path": "media/deck.html", "edits": ["title"]},
+            {"path": "media/deck.html", "edits": [{"key": "title", "html": 3}]},
+            {"path": "media/deck.html", "edits": {"title": {"html": "x"}}},
+            {"path": "media/deck.html", "edits": [{"key": 3, "html": "x"}]},
+            {"path": "media/deck.html", "edits": [{"key": "a b", "html": "x"}]},
+            {"path": "../deck.html", "edits": {"title": "x"}},
+        ):
+            with self.subTest(payload=payload):
+                response, data = self.post(payload, HTTP_IF_MATCH=self.version)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(data["ok"])
+        self.assertEqual(self.read(), before)
+
+
+@override_settings(DEBUG=True)
+class ShellDeckEditTests(SimpleTestCase):
+    """Edits posted for a shell-layout deck land in the fragment holding the field."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings = override_settings(MEDIA_ROOT=tmp.name, ARTIFACT_LOCATIONS={})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.version = '"%s"' % ("1" * 24)
+        self.path = os.path.join(tmp.name, "deck.html")
+        self.fragments = stream_template_to_file(
+            "volt-electricity.html", _context("volt-electricity.html", 8), self.path, shell_slides=1,
+            head_injection="<script>window.__VOLT_DECK_VERSION__ = %s;</script>" % json.dumps(self.version))
+
+    def read(self, path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def test_an_edit_is_saved_in_the_fragment_holding_the_field(self):
+        shell = self.read(self.path)
+        key = "slide4.profil"
+        self.assertNotIn("EDIT:start:" + key, shell)
+        fragment = next(p for p in self.fragments if "EDIT:start:" + key in self.read(p))
+        others = {p: self.read(p) for p in self.fragments if p != fragment}
+
+        request = RequestFactory().post(
+            "/editor/save-file/", json.dumps({"path": "media/deck.html", "key": key, "html": "<p>Profil revu</p>"}),
+            content_type="application/json", HTTP_HOST="localhost", HTTP_IF_MATCH=self.version)
+        with redirect_stdout(io.StringIO()):
+            response = save_file_edit(request)
+        self.assertEqual(response.status_code, 200, response.content)
+        version = json.loads(response.content)["version"]
+        self.assertNotEqual(version, self.version)
+
+        self.assertIn("Profil revu", self.read(fragment))
+        self.assertEqual({p: self.read(p) for p in others}, others)
+        # the shell only changes by the version it embeds
+        self.assertEqual(self.read(self.path), shell.replace(json.dumps(self.version), json.dumps(version)))
+        self.assertEqual(_deck_version(self.path), version)
+
+        # the old version no longer matches, for any field of the deck
+        error, current = _save_file_edits(self.path, {key: "<p>encore</p>"}, self.version)
+        self.assertEqual(error[1], 409)
+        self.assertEqual(current, version)
+
+
+class _LlmPeer:
+    """The far end of a socketpair handed to urllib3 as the LLM connection:
+    reads one request and, unless status is None, answers it."""
+
+    def __init__(self, status=200, body=b'{"response": "ok"}'):
+        self.client, self.server = socket.socketpair()
+        self.requests = []
+        self.thread = threading.Thread(target=self.serve, args=(status, body), daemon=True)
+        self.thread.start()
+
+    def serve(self, status, body):
+        data = b""
+        while b"\r\n\r\n" not in data:
+            data += self.server.recv(65536)
+        head, _, payload = data.partition(b"\r\n\r\n")
+        length = int(re.search(rb"(?i)content-length: *(\d+)", head).group(1))
+        while len(payload) < length:
+            payload += self.server.recv(65536)
+        self.requests.append(json.loads(payload))
+        if status is not None:
+            self.server.sendall(b"HTTP/1.1 %d X\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s"
+                                % (status, len(body), body))
+
+    def close(self):
+        self.server.close()
+        self.thread.join(5)
+
+
+@override_settings(LLM_API_BASE_URL="http://llm.test", LLM_CONNECT_TIMEOUT=3, LLM_READ_TIMEOUT=0.3,
+                   LLM_CONNECT_RETRIES=2)
+class LlmClientTests(SimpleTestCase):
+    """blog/llm_client.py over a mocked transport: urllib3's create_connection
+    fails or returns one end of a socketpair."""
+
+    def setUp(self):
+        llm_client._session = None  # built from the settings above
+        self.addCleanup(setattr, llm_client, "_session", None)
+        patcher = mock.patch("urllib3.util.retry.Retry.sleep")  # no backoff waits
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connect(self, *outcomes):
+        return mock.patch("urllib3.util.connection.create_connection", side_effect=list(outcomes))
+
+    def test_a_connection_that_cannot_be_opened_is_retried(self):
+        peer = _LlmPeer()
+        self.addCleanup(peer.close)
+        with self.connect(ConnectionRefusedError(), socket.timeout(), peer.client) as create_connection:
+            body = llm_client.generate({"prompt": "analyse"})
+        self.assertEqual(body, {"response": "ok"})
+        self.assertEqual(create_connection.call_count, 3)
+        self.assertEqual({c.args[1] for c in create_connection.call_args_list}, {3})  # the connect timeout
+        self.assertEqual(peer.requests, [{"prompt": "analyse"}])
+
+    def test_connect_retries_are_limited(self):
+        with self.connect(*[ConnectionRefusedError()] * 4) as create_connection:
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                llm_client.generate({"prompt": "analyse"})
+        self.assertEqual(create_connection.call_count, 3)
+
+    def test_a_prompt_that_reached_the_model_is_not_resent(self):
+        for timeout in (None, 0.2):
+            with self.subTest(timeout=timeout):
+                peer = _LlmPeer(status=None)  # never answers
+                self.addCleanup(peer.close)
+                started = time.monotonic()
+                with self.connect(peer.client, peer.client) as create_connection:
+                    with self.assertRaises(requests.exceptions.ReadTimeout):
+                        llm_client.generate({"prompt": "analyse"}, timeout=timeout)
+                self.assertLess(time.monotonic() - started, 2)
+                self.assertEqual(create_connection.call_count, 1)
+                self.assertEqual(peer.requests, [{"prompt": "analyse"}])
+
+    def test_an_error_status_is_raised_without_a_retry(self):
+        peer = _LlmPeer(status=503, body=b'{"error": "busy"}')
+        self.addCleanup(peer.close)
+        with self.connect(peer.client, peer.client) as create_connection:
+            with self.assertRaises(requests.exceptions.HTTPError):
+                llm_client.generate({"prompt": "analyse"})
+        self.assertEqual(create_connection.call_count, 1)
+        self.assertEqual(peer.requests, [{"prompt": "analyse"}])
@@ -12,4 +12,5 @@ urlpatterns = [
     path('api/generate-consumption-analysis/', views.generate_consumption_analysis, name='generate_consumption_analysis'),
     path('api/analyze-gas-invoice/', views.analyze_gas_invoice, name='analyze_gas_invoice'),
     path('editor/save-file/', views.save_file_edit, name='save_file_edit'),
+    path('editor/save-file/batch/', views.save_file_edit_batch, name='save_file_edit_batch'),
 ]
\ No newline at end of file
@@ -1,10 +1,13 @@
 import re, io, base64
+import hashlib
 import urllib.request
 import urllib.error
 import urllib.parse
 import ipaddress
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 from django.utils.html import escape
+from django.utils.http import parse_etags, quote_etag
 from django.utils.safestring import mark_safe
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
@@ -24,7 +27,9 @@ from django.conf import settings
 from django.http import JsonResponse
 import tempfile
 import shutil
+import threading
 import time
+import uuid
 import logging
 from django.contrib.auth.decorators import login_required
 try:
@@ -40,8 +45,22 @@ from zoneinfo import ZoneInfo
 # convert to Paris time explicitly so displayed dates/times match the client's clock.
 PARIS_TZ = ZoneInfo("Europe/Paris")
 from django.templatetags.static import static
-from PyPDF2 import PdfReader, PdfWriter
 from PIL import Image
+from requests.exceptions import RequestException
+
+from . import edit_index, llm_client
+from .deck_writer import (
+    EDIT_BROTLI_QUALITY, FRAGMENT_DIR_SUFFIX, deck_engine, deck_fragment_paths, stream_template_to_file,
+    write_compressed_sidecars,
+)
+from .models import GeneratedArtifact
+from .pdf_pipeline import (
+    postprocess_pdf, preview_paths, render_pdf, schedule_html_previews, write_pdf_previews,
+)
+from .render_cache import get_or_render, payload_key, template_version
+from .render_jobs import RenderJobError, run_job
+from .responsive_images import image_variants
+from .storage import artifact_lock, artifact_storage, cached_digest, remember_digest, storage_for_path
 
 
 @csrf_exempt
@@ -54,34 +73,44 @@ def volt_consulting_presentation(request):
     try:
         # 1️⃣ Parse incoming data
         data = parse_request_data(request)
+        comparatif = data.get("comparatifClientHistoryPdfDto", {})
 
-        # 2️⃣ Generate Chart (if available)
-        chart_base64 = generate_chart(data)
+        def _render():
+            # 2️⃣ Generate Chart (if available)
+            chart_base64 = run_job("chart", generate_chart, data)
 
-        # 3️⃣ Build Comparatif DTO
-        comparatif = data.get("comparatifClientHistoryPdfDto", {})
-        comparatif_dto = build_comparatif_dto(comparatif, request, data)
+            # 3️⃣ Build Comparatif DTO
+            comparatif_dto = build_comparatif_dto(comparatif, request, data)
 
-        # 4️⃣ Build Presentation Data
-        presentation_data = build_presentation_data(data, chart_base64, comparatif_dto, request)
+            # 4️⃣ Build Presentation Data
+            presentation_data = build_presentation_data(data, chart_base64, comparatif_dto, request)
 
-        # 5️⃣ Render HTML
-        html_content = render_html(presentation_data)
+            # 5️⃣ Render HTML
+            html_content = render_html(presentation_data)
 
-        # 6️⃣ Generate PDF
-        pdf_url, pdf_filename = generate_pdf(html_content, request, data, comparatif)
+            # 6️⃣ Generate PDF
+            pdf_url, pdf_filename, pdf_path = generate_pdf(html_content, request, data, comparatif)
+            return {"path": pdf_path, "url": pdf_url, "name": pdf_filename}
+
+        # Identical payloads (double clicks, retries) reuse the existing PDF
+        result, cached = get_or_render(
+            payload_key("volt_consulting_presentation", "volt.html", request.get_host(), data), _render)
 
         return JsonResponse({
             "status": "success",
-            "path": pdf_url,
-            "name": pdf_filename,
-            "title": pdf_filename,
+            "path": result["url"],
+            "name": result["name"],
+            "title": result["name"],
             "mime_type": "application/pdf",
+            "previews": _preview_urls(result["url"], result["path"]),
+            "cached": cached,
             "message": "PDF generated successfully"
         })
 
     except json.JSONDecodeError:
         return JsonResponse({"status": "error", "message": "Invalid JSON"}, status=400)
+    except RenderJobError as e:
+        return JsonResponse(e.as_dict(), status=e.http_status)
     except Exception as e:
         return JsonResponse({
             "status": "error",
@@ -466,29 +495,16 @@ def build_comparatif_dto(comparatif, request, data):
 
 def render_html(presentation_data):
     print("Inside RenderHTML")
-    return render_to_string("volt.html", {"data": presentation_data})
+    return render_to_string("volt.html", {"data": presentation_data}, using=deck_engine("volt.html"))
 
 
 def generate_pdf(html_content, request, data, comparatif):
-    """Generate PDF and return its URL (removes truly blank pages)."""
+    """Generate PDF and return its URL, filename and path (removes truly blank pages)."""
     print("Inside GeneratePDF")
-    host = request.get_host().split(":")[0]
-
-    # Choose base dirs (filesystem vs URL)
-    if host == "volt-crm.caansoft.com":
-        base_dir = settings.STAGING_MEDIA_ROOT
-        base_url = settings.STAGING_MEDIA_URL
-    elif host == "crm.volt-consulting.com":
-        base_dir = settings.PRODUCTION_MEDIA_ROOT
-        base_url = settings.PRODUCTION_MEDIA_URL
-    else:
-        base_dir = settings.MEDIA_ROOT
-        base_url = settings.MEDIA_URL
+    storage = artifact_storage(request)
 
     # Dynamic path: client/<id>/comparatif/
     relative_path = os.path.join("clients", str(data.get("clientId")), "comparatif", str(comparatif.get("id")))
-    pdf_dir = os.path.join(base_dir, relative_path)
-    os.makedirs(pdf_dir, exist_ok=True)
 
     # Generate filename
     pdf_filename = create_comparatif_filename(
@@ -496,119 +512,80 @@ def generate_pdf(html_content, request, data, comparatif):
         data.get("clientTradeName"),
         data.get("comparatifClientHistoryPdfDto", {}).get("energyType")
     )
-    pdf_path = os.path.join(pdf_dir, pdf_filename)
 
-    # Save PDF using WeasyPrint
-    css = CSS(string="""@page { size: 530mm 265mm; margin: 0.0cm; }""")
-    HTML(string=html_content).write_pdf(
-        pdf_path,
-        stylesheets=[css],
-        zoom=0.8,
-        optimize_images=True,
-        presentational_hints=True,
-        font_config=None
-    )
+    # Render PDF using WeasyPrint (optionally one slide per worker process)
+    started = time.perf_counter()
+    pdf_bytes = _render_deck_pdf(html_content)
+    rendered = time.perf_counter()
 
-    # Remove blank pages - improved detection
-    reader = PdfReader(pdf_path)
-    writer = PdfWriter()
+    # Write under the target's lock; a concurrent generation of the same name
+    # gets a versioned one instead of mixing its files with ours
+    with storage.claim(relative_path, pdf_filename) as pdf_path:
+        pdf_filename = os.path.basename(pdf_path)
 
-    for i, page in enumerate(reader.pages):
-        is_blank = True
+        # Remove blank pages, dedupe repeated images and compress — single write
+        postprocess_pdf(pdf_bytes, pdf_path, drop_blank_pages=True)
+        written = time.perf_counter()
+        _write_deck_previews(pdf_path, storage)
 
-        try:
-            # Method 1: Check for text content
-            text = page.extract_text().strip()
-            if len(text) > 20:  # Has meaningful text
-                is_blank = False
-
-            # Method 2: Check for images/XObjects
-            if '/Resources' in page:
-                resources = page['/Resources']
-                if '/XObject' in resources:
-                    xobjects = resources['/XObject'].get_object()
-                    # Check if XObjects actually exist and aren't empty
-                    if len(xobjects) > 0:
-                        is_blank = False
-
-            # Method 3: Check content stream size (more aggressive)
-            if '/Contents' in page and is_blank:
-                contents = page['/Contents']
-
-                if hasattr(contents, 'get_object'):
-                    content_obj = contents.get_object()
-                else:
-                    content_obj = contents
-
-                # Calculate actual content size
-                content_size = 0
-                if isinstance(content_obj, list):
-                    for stream in content_obj:
-                        if hasattr(stream, 'get_data'):
-                            data_content = stream.get_data()
-                            # Filter out whitespace-only content
-                            if data_content and len(data_content.strip()) > 50:
-                                content_size += len(data_content)
-                elif hasattr(content_obj, 'get_data'):
-                    data_content = content_obj.get_data()
-                    if data_content and len(data_content.strip()) > 50:
-                        content_size = len(data_content)
-
-                # Page has substantial content
-                if content_size > 200:
-                    is_blank = False
-
-            # Method 4: Check for graphics/drawing operations
-            if is_blank and '/Contents' in page:
-                try:
-                    contents = page['/Contents']
-                    if hasattr(contents, 'get_object'):
-                        content_obj = contents.get_object()
-                    else:
-                        content_obj = contents
-
-                    if hasattr(content_obj, 'get_data'):
-                        content_data = content_obj.get_data().decode('latin-1', errors='ignore')
-                        # Check for actual drawing commands (not just whitespace)
-                        drawing_commands = ['re', 'f', 'S', 'rg', 'RG', 'cm', 'Do', 'Tm', 'Tj']
-                        command_count = sum(content_data.count(cmd) for cmd in drawing_commands)
-                        if command_count > 2:  # Has actual graphics commands
-                            is_blank = False
-                except:
-                    pass
+        digests = storage.publish(pdf_path)
+        GeneratedArtifact.record(pdf_path, GeneratedArtifact.KIND_PDF, data, comparatif, template="volt.html",
+                                 sha256=digests.get(pdf_path),
+                                 timings={"render_ms": (rendered - started) * 1000,
+                                          "write_ms": (written - rendered) * 1000})
 
-        except Exception as e:
-            print(f"Error checking page {i + 1}: {e}")
-            # When in doubt, check page height - very short pages might be blanks
-            try:
-                mediabox = page.mediabox
-                height = float(mediabox.height)
-                if height < 100:  # Very small page = likely blank
-                    is_blank = True
-                else:
-                    is_blank = False  # Keep it
-            except:
-                is_blank = False
-
-        if not is_blank:
-            writer.add_page(page)
-            print(f"✓ Keeping page {i + 1}")
-        else:
-            print(f"✗ Removing blank page {i + 1}")
+    # Build public URL
+    pdf_url = storage.url(request, relative_path, pdf_filename)
 
-    print(f"Final PDF: {len(writer.pages)} pages (removed {len(reader.pages) - len(writer.pages)} blank pages)")
+    return pdf_url, pdf_filename, pdf_path
 
-    # Write cleaned PDF
-    with open(pdf_path, "wb") as f:
-        writer.write(f)
 
-    # Build public URL
-    pdf_url = request.build_absolute_uri(
-        os.path.join(base_url, "clients", str(data.get("clientId")), "comparatif", str(comparatif.get("id")),
-                     pdf_filename)
+def _render_deck_pdf(html_content):
+    """Lay out a 530mm x 265mm slide deck on the render workers. With
+    PDF_PARALLEL_RENDER on, the slides are split across workers and come back
+    as a list of per-slide PDFs that postprocess_pdf merges in order."""
+    return render_pdf(
+        html_content,
+        """@page { size: 530mm 265mm; margin: 0.0cm; }""",
+        zoom=0.8,
+        parallel=getattr(settings, "PDF_PARALLEL_RENDER", False),
+        min_slides=getattr(settings, "PDF_PARALLEL_MIN_SLIDES", 4),
     )
 
-    return pdf_url, pdf_filename
+
+def _write_deck_previews(artifact_path, storage=None):
+    """Thumbnails of the first DECK_PREVIEW_COUNT pages (PDF, inline — a
+    PyMuPDF rasterization is cheap) or slides (.html deck, read back from disk
+    on the render pool), published to storage once written. A preview failure
+    never fails the deck itself."""
+    count = getattr(settings, "DECK_PREVIEW_COUNT", 1)
+    width = getattr(settings, "DECK_PREVIEW_WIDTH", 480)
+    if not count:
+        return
+    publish = (lambda paths: storage.publish(*paths)) if storage else None
+    try:
+        if artifact_path.lower().endswith(".html"):
+            schedule_html_previews(artifact_path, count, width, on_done=publish)
+        else:
+            written = write_pdf_previews(artifact_path, artifact_path, count, width)
+            if publish:
+                publish(written)
+    except Exception as e:
+        print(f"Preview generation failed for {artifact_path}: {e}")
+
+
+def _preview_urls(artifact_url, artifact_path):
+    """Public URLs of the artifact's previews that exist right now: same URL
+    scheme as the artifact, under the previews/ folder beside it. HTML deck
+    previews are laid out in the background (and may fail), so they are
+    missing from the first response; computed per response rather than
+    cached with the result, a repeated request lists them once written."""
+    base = artifact_url.rsplit("/", 1)[0]
+    return [
+        f"{base}/previews/{os.path.basename(p)}"
+        for p in preview_paths(artifact_path, getattr(settings, "DECK_PREVIEW_COUNT", 1))
+        if os.path.exists(p)
+    ]
 
 
 def create_comparatif_filename(society: str, trade_name: str, energy_type: str) -> str:
@@ -771,6 +748,27 @@ def build_images(data, request, use_http=False):
         "team_office": builder(request, "image/gas-slide2-right-photo.png"),
     })
 
+
+# Photos with srcset/WebP variants (manage.py build_deck_images), and the
+# share of the viewport width their slot takes on a fitted 1920px deck.
+DECK_PHOTO_SIZES = {
+    "hero_turbines": ("image/hero-turbines.jpg", "48vw"),
+    "team_meeting": ("image/team-meeting.jpg", "36vw"),
+    "hero_refinery": ("image/gas-slide1-right-photo.png", "48vw"),
+    "team_office": ("image/gas-slide2-right-photo.png", "36vw"),
+}
+
+
+def build_image_variants(data, request):
+    """srcset/WebP/intrinsic-size attributes for the browser decks' photos.
+    Skipped when the payload brings its own "images" (they would not match)."""
+    print("Inside BuildImageVariants")
+    if "images" in data:
+        return {}
+    url_for = lambda p: build_static_url_http(request, p)
+    return {key: image_variants(path, url_for, sizes) for key, (path, sizes) in DECK_PHOTO_SIZES.items()}
+
+
 def build_static_url_http(request, path):
     """HTTP URL — for browser-rendered templates (volt-electricity.html via energy_offer_summary)."""
     from django.templatetags.static import static
@@ -900,37 +898,47 @@ def volt_consulting_presentation_Electricitry(request):
     try:
         # 1️⃣ Parse incoming data
         data = parse_request_data(request)
+        comparatif = data.get("comparatifClientHistoryPdfDto", {})
 
-        # 2️⃣ Generate Chart (if available)
-        chart_base64 = generate_chart(data)
-        enedis_chart_base64 = generate_enedis_chart(
-            data.get("comparatifClientHistoryPdfDto", {}).get("enedisDataPastYear", {}))
+        def _render():
+            # 2️⃣ Generate Chart (if available)
+            chart_base64 = run_job("chart", generate_chart, data)
+            enedis_chart_base64 = run_job("chart", generate_enedis_chart, comparatif.get("enedisDataPastYear", {}))
 
-        # 3️⃣ Build Comparatif DTO
-        comparatif = data.get("comparatifClientHistoryPdfDto", {})
-        comparatif_dto = build_comparatif_dto_Electricity(comparatif, request, data)
+            # 3️⃣ Build Comparatif DTO
+            comparatif_dto = build_comparatif_dto_Electricity(comparatif, request, data)
+
+            # 4️⃣ Build Presentation Data
+            presentation_data = build_presentation_data_Electricity(data, enedis_chart_base64, chart_base64,
+                                                                    comparatif_dto, request)
 
-        # 4️⃣ Build Presentation Data
-        presentation_data = build_presentation_data_Electricity(data, enedis_chart_base64, chart_base64, comparatif_dto,
-                                                                request)
+            # 5️⃣ Render HTML
+            html_content = render_html_Elecricity(presentation_data)
 
-        # 5️⃣ Render HTML
-        html_content = render_html_Elecricity(presentation_data)
+            # 6️⃣ Generate PDF
+            pdf_url, pdf_filename, pdf_path = generate_pdf_Electricity(html_content, request, data, comparatif)
+            return {"path": pdf_path, "url": pdf_url, "name": pdf_filename}
 
-        # 6️⃣ Generate PDF
-        pdf_url, pdf_filename = generate_pdf_Electricity(html_content, request, data, comparatif)
+        # Identical payloads (double clicks, retries) reuse the existing PDF
+        result, cached = get_or_render(
+            payload_key("volt_consulting_presentation_Electricity", "volt_Electricity.html",
+                        request.get_host(), data), _render)
 
         return JsonResponse({
             "status": "success",
-            "path": pdf_url,
-            "name": pdf_filename,
-            "title": pdf_filename,
+            "path": result["url"],
+            "name": result["name"],
+            "title": result["name"],
             "mime_type": "application/pdf",
+            "previews": _preview_urls(result["url"], result["path"]),
+            "cached": cached,
             "message": "PDF generated successfully"
         })
 
     except json.JSONDecodeError:
         return JsonResponse({"status": "error", "message": "Invalid JSON"}, status=400)
+    except RenderJobError as e:
+        return JsonResponse(e.as_dict(), status=e.http_status)
     except Exception as e:
         return JsonResponse({
             "status": "error",
@@ -940,7 +948,7 @@ def volt_consulting_presentation_Electricitry(request):
 
 def render_html_Elecricity(presentation_data):
     print("Inside RenderHTML")
-    return render_to_string("volt_Electricity.html", {"data": presentation_data})
+    return render_to_string("volt_Electricity.html", {"data": presentation_data}, using=deck_engine("volt_Electricity.html"))
 
 
 def generate_enedis_chart(chart_data):
@@ -1390,25 +1398,12 @@ def build_tender_table_Electricity(data, comparatif_dto):
 
 
 def generate_pdf_Electricity(html_content, request, data, comparatif):
-    """Generate PDF and return its URL (without removing any pages)."""
+    """Generate PDF and return its URL, filename and path (drops the odd overflow pages)."""
     print("Inside GeneratePDF")
-    host = request.get_host().split(":")[0]
-
-    # Choose base dirs (filesystem vs URL)
-    if host == "volt-crm.caansoft.com":
-        base_dir = settings.STAGING_MEDIA_ROOT
-        base_url = settings.STAGING_MEDIA_URL
-    elif host == "crm.volt-consulting.com":
-        base_dir = settings.PRODUCTION_MEDIA_ROOT
-        base_url = settings.PRODUCTION_MEDIA_URL
-    else:
-        base_dir = settings.MEDIA_ROOT
-        base_url = settings.MEDIA_URL
+    storage = artifact_storage(request)
 
     # Dynamic path: client/<id>/comparatif/
     relative_path = os.path.join("clients", str(data.get("clientId")), "comparatif", str(comparatif.get("id")))
-    pdf_dir = os.path.join(base_dir, relative_path)
-    os.makedirs(pdf_dir, exist_ok=True)
 
     # Generate filename
     pdf_filename = create_comparatif_filename(
@@ -1416,42 +1411,37 @@ def generate_pdf_Electricity(html_content, request, data, comparatif):
         data.get("clientTradeName"),
         data.get("comparatifClientHistoryPdfDto", {}).get("energyType")
     )
-    pdf_path = os.path.join(pdf_dir, pdf_filename)
 
-    # Save PDF using WeasyPrint
-    css = CSS(string="""@page { size: 530mm 265mm; margin: 0.0cm; }""")
-    HTML(string=html_content).write_pdf(
-        pdf_path,
-        stylesheets=[css],
-        zoom=0.8,
-        optimize_images=True,
-        presentational_hints=True,
-        font_config=None
-    )
+    # Render PDF using WeasyPrint (optionally one slide per worker process)
+    started = time.perf_counter()
+    pdf_bytes = _render_deck_pdf(html_content)
+    rendered = time.perf_counter()
 
     # ---- Remove unwanted pages (4,6,8,10,12) ----
-    # PyPDF2 uses 0-based index: 3=page4, 5=page6, etc.
+    # 0-based page indices: 3=page4, 5=page6, etc. With PDF_PARALLEL_RENDER the
+    # slides come back as separate PDFs and postprocess_pdf applies these to
+    # each slide's own pages, so a slide that lays out to one page alone
+    # doesn't shift the drop onto the next slides.
     remove_pages = [1, 3, 5, 7, 9, 11, 13, 15, 17, 19, 21, 23, 25, 27, 29, 31, 33, 35, 37, 39, 41, 43, 35, 37, 39, 41,
                     43, 45, 47, 49, 51, 53, 55, 57, 59, 61, 63, 65, 67, 69, 71, 73, 75, 77, 79, 81, 83, 85, 87, 89, 91,
                     93, 95, 97, 99]
 
-    reader = PdfReader(pdf_path)
-    writer = PdfWriter()
-
-    for i in range(len(reader.pages)):
-        if i not in remove_pages:
-            writer.add_page(reader.pages[i])
+    with storage.claim(relative_path, pdf_filename) as pdf_path:
+        pdf_filename = os.path.basename(pdf_path)
+        postprocess_pdf(pdf_bytes, pdf_path, remove_pages=remove_pages)
+        written = time.perf_counter()
+        _write_deck_previews(pdf_path, storage)
 
-    with open(pdf_path, "wb") as f:
-        writer.write(f)
+        digests = storage.publish(pdf_path)
+        GeneratedArtifact.record(pdf_path, GeneratedArtifact.KIND_PDF, data, comparatif,
+                                 template="volt_Electricity.html", sha256=digests.get(pdf_path),
+                                 timings={"render_ms": (rendered - started) * 1000,
+                                          "write_ms": (written - rendered) * 1000})
 
     # Build public URL (mirrors saved path after /uploads/volt/)
-    pdf_url = request.build_absolute_uri(
-        os.path.join(base_url, "clients", str(data.get("clientId")), "comparatif", str(comparatif.get("id")),
-                     pdf_filename)
-    )
+    pdf_url = storage.url(request, relative_path, pdf_filename)
 
-    return pdf_url, pdf_filename
+    return pdf_url, pdf_filename, pdf_path
 
 
 def enedis_Chart(comparatif_dto):
@@ -1569,36 +1559,45 @@ def energy_offer_summary(request):
         # Get comparatif data if available
         comparatif = data.get("comparatifClientHistoryPdfDto", {})
 
-        # 2️⃣ Generate chart (if available)
-        chart_base64 = generate_price_chart_styled(data)
-        chart_12m_base64 = generate_price_chart_styled(data, last_n_months=12)
-        enedis_chart_base64 = generate_enedis_bar_chart(
-            comparatif.get("enedisDataPastYear", {})
-        )
+        def _render():
+            # 2️⃣ Generate chart (if available)
+            chart_base64 = run_job("chart", generate_price_chart_styled, data)
+            chart_12m_base64 = run_job("chart", generate_price_chart_styled, data, last_n_months=12)
+            enedis_chart_base64 = run_job(
+                "chart", generate_enedis_bar_chart, comparatif.get("enedisDataPastYear", {})
+            )
 
-        # 3️⃣ Build Comparatif DTO
-        comparatif_dto = build_comparatif_dto_Electricity(comparatif, request, data)
+            # 3️⃣ Build Comparatif DTO
+            comparatif_dto = build_comparatif_dto_Electricity(comparatif, request, data)
 
-        # 4️⃣ Build presentation data
-        presentation_data = build_presentation_data_energy_offer(data, enedis_chart_base64, chart_base64, chart_12m_base64, comparatif_dto, request)
+            # 4️⃣ Build presentation data
+            presentation_data = build_presentation_data_energy_offer(data, enedis_chart_base64, chart_base64, chart_12m_base64, comparatif_dto, request)
 
-        # 5️⃣ Render HTML
-        html_content = render_to_string("volt-electricity.html", {"data": presentation_data})
+            # 5️⃣ Render HTML straight into the deck file and return its path
+            html_url, html_filename, html_path = save_html_file(
+                "volt-electricity.html", {"data": presentation_data}, request, data, comparatif
+            )
+            return {"path": html_path, "url": html_url, "name": html_filename}
 
-        # 6️⃣ Save HTML file to server and return path
-        html_url, html_filename = save_html_file(html_content, request, data, comparatif)
+        # Identical payloads (double clicks, retries) reuse the existing deck
+        result, cached = get_or_render(
+            payload_key("energy_offer_summary", "volt-electricity.html", request.get_host(), data), _render)
 
         return JsonResponse({
             "status": "success",
-            "path": html_url,
-            "name": html_filename,
-            "title": html_filename,
+            "path": result["url"],
+            "name": result["name"],
+            "title": result["name"],
             "mime_type": "text/html",
+            "previews": _preview_urls(result["url"], result["path"]),
+            "cached": cached,
             "message": "HTML file generated successfully"
         })
 
     except json.JSONDecodeError:
         return JsonResponse({"status": "error", "message": "Invalid JSON"}, status=400)
+    except RenderJobError as e:
+        return JsonResponse(e.as_dict(), status=e.http_status)
     except Exception as e:
         return JsonResponse({
             "status": "error",
@@ -1619,38 +1618,48 @@ def comparatif_gas(request):
         # Get comparatif data if available
         comparatif = data.get("comparatifClientHistoryPdfDto", {})
 
-        # 2️⃣ Generate charts (if available)
-        chart_base64 = generate_price_chart_styled(data)
-        chart_12m_base64 = generate_price_chart_styled(data, last_n_months=12)
-        gas_chart_base64 = generate_enedis_bar_chart(
-            comparatif.get("grdfDataPastYear") or comparatif.get("enedisDataPastYear", {})
-        )
-
-        # 3️⃣ Build Comparatif DTO (GAS)
-        comparatif_dto = build_comparatif_dto_Gas(comparatif, request, data)
-
-        # 4️⃣ Build presentation data
-        presentation_data = build_presentation_data_gas(
-            data, chart_base64, chart_12m_base64, gas_chart_base64, comparatif_dto, request
-        )
-
-        # 5️⃣ Render HTML
-        html_content = render_to_string("volt-gas.html", {"data": presentation_data})
-
-        # 6️⃣ Save HTML file to server and return path
-        html_url, html_filename = save_html_file(html_content, request, data, comparatif)
+        def _render():
+            # 2️⃣ Generate charts (if available)
+            chart_base64 = run_job("chart", generate_price_chart_styled, data)
+            chart_12m_base64 = run_job("chart", generate_price_chart_styled, data, last_n_months=12)
+            gas_chart_base64 = run_job(
+                "chart", generate_enedis_bar_chart,
+                comparatif.get("grdfDataPastYear") or comparatif.get("enedisDataPastYear", {})
+            )
+
+            # 3️⃣ Build Comparatif DTO (GAS)
+            comparatif_dto = build_comparatif_dto_Gas(comparatif, request, data)
+
+            # 4️⃣ Build presentation data
+            presentation_data = build_presentation_data_gas(
+                data, chart_base64, chart_12m_base64, gas_chart_base64, comparatif_dto, request
+            )
+
+            # 5️⃣ Render HTML straight into the deck file and return its path
+            html_url, html_filename, html_path = save_html_file(
+                "volt-gas.html", {"data": presentation_data}, request, data, comparatif
+            )
+            return {"path": html_path, "url": html_url, "name": html_filename}
+
+        # Identical payloads (double clicks, retries) reuse the existing deck
+        result, cached = get_or_render(
+            payload_key("comparatif_gas", "volt-gas.html", request.get_host(), data), _render)
 
         return JsonResponse({
             "status": "success",
-            "path": html_url,
-            "name": html_filename,
-            "title": html_filename,
+            "path": result["url"],
+            "name": result["name"],
+            "title": result["name"],
             "mime_type": "text/html",
+            "previews": _preview_urls(result["url"], result["path"]),
+            "cached": cached,
             "message": "HTML file generated successfully"
         })
 
     except json.JSONDecodeError:
         return JsonResponse({"status": "error", "message": "Invalid JSON"}, status=400)
+    except RenderJobError as e:
+        return JsonResponse(e.as_dict(), status=e.http_status)
     except Exception as e:
         return JsonResponse({
             "status": "error",
@@ -1658,30 +1667,20 @@ def comparatif_gas(request):
         }, status=500)
 
 
-def save_html_file(html_content, request, data, comparatif):
+def save_html_file(template_name, context, request, data, comparatif):
     """
-    Save HTML content as an HTML file on the server.
-    Returns the URL and filename of the saved HTML file.
+    Render template_name with context into an HTML file on the server.
+    The template is streamed node by node into a temp file that is renamed
+    into place, so the full deck is never held in memory.
+    Returns the URL, filename and filesystem path of the saved HTML file.
     Similar to generate_pdf_Electricity but for HTML files.
     """
     print("Inside SaveHTMLFile")
     host = request.get_host().split(":")[0]
-
-    # Choose base dirs (filesystem vs URL)
-    if host == "volt-crm.caansoft.com":
-        base_dir = settings.STAGING_MEDIA_ROOT
-        base_url = settings.STAGING_MEDIA_URL
-    elif host == "crm.volt-consulting.com":
-        base_dir = settings.PRODUCTION_MEDIA_ROOT
-        base_url = settings.PRODUCTION_MEDIA_URL
-    else:
-        base_dir = settings.MEDIA_ROOT
-        base_url = settings.MEDIA_URL
+    storage = artifact_storage(request)
 
     # Dynamic path: client/<id>/energy_offer/
     relative_path = os.path.join("clients", str(data.get("clientId")), "energy_offer")
-    html_dir = os.path.join(base_dir, relative_path)
-    os.makedirs(html_dir, exist_ok=True)
 
     # Generate filename (similar to create_comparatif_filename pattern)
     html_filename = create_energy_offer_filename(
@@ -1689,40 +1688,60 @@ def save_html_file(html_content, request, data, comparatif):
         data.get("clientTradeName"),
         data.get("comparatifClientHistoryPdfDto", {}).get("energyType")
     )
-    html_path = os.path.join(html_dir, html_filename)
-
-    # Embed the exact edit-target so the inline editor writes back to *this*
-    # file in every environment (local media, staging, production) instead of
-    # guessing it from the browser URL. Also embed the API base: on the CRM
-    # hosts the Django service sits behind the /pdf-service/ nginx location,
-    # whereas locally it's served at the root — so the editor's save call needs
-    # the right prefix to actually reach Django.
-    api_base = "/pdf-service" if host in ("volt-crm.caansoft.com", "crm.volt-consulting.com") else ""
-    edit_marker = (
-        "<script>window.__VOLT_EDIT_TARGET__ = "
-        + json.dumps(html_path.replace("\\", "/"))
-        + "; window.__VOLT_API_BASE__ = "
-        + json.dumps(api_base)
-        + ";</script>"
-    )
-    if "</head>" in html_content:
-        html_content = html_content.replace("</head>", edit_marker + "\n</head>", 1)
-    else:
-        html_content = edit_marker + "\n" + html_content
 
-    # Save HTML file
-    with open(html_path, "w", encoding="utf-8") as f:
-        f.write(html_content)
+    # Everything below is written under the deck's lock; a concurrent
+    # generation of the same name gets a versioned one (storage.claim)
+    with storage.claim(relative_path, html_filename) as html_path:
+        html_filename = os.path.basename(html_path)
+
+        # Embed the exact edit-target so the inline editor writes back to *this*
+        # file in every environment (local media, staging, production) instead of
+        # guessing it from the browser URL. Also embed the API base: on the CRM
+        # hosts the Django service sits behind the /pdf-service/ nginx location,
+        # whereas locally it's served at the root — so the editor's save call needs
+        # the right prefix to actually reach Django. The deck's version rides
+        # along, so the editor's If-Match is the version of what it shows.
+        api_base = "/pdf-service" if host in ("volt-crm.caansoft.com", "crm.volt-consulting.com") else ""
+        edit_marker = (
+            "<script>window.__VOLT_EDIT_TARGET__ = "
+            + json.dumps(html_path.replace("\\", "/"))
+            + "; window.__VOLT_API_BASE__ = "
+            + json.dumps(api_base)
+            + "; window.__VOLT_DECK_VERSION__ = "
+            + json.dumps(_new_deck_version())
+            + ";</script>"
+        )
+
+        # Save HTML file (marker goes in front of </head> while streaming). The
+        # "shell" layout keeps only the first slide(s) inline and writes the rest
+        # as fragments the deck fetches on demand; a payload "deckLayout" overrides
+        # the DECK_HTML_LAYOUT setting.
+        layout = data.get("deckLayout") or getattr(settings, "DECK_HTML_LAYOUT", "single")
+        shell_slides = getattr(settings, "DECK_SHELL_SLIDES", 1) if layout == "shell" else None
+        started = time.perf_counter()
+        fragments = stream_template_to_file(template_name, context, html_path, head_injection=edit_marker,
+                                            minify=getattr(settings, "DECK_MINIFY_HTML", True),
+                                            shell_slides=shell_slides)
+        fragments = fragments if shell_slides is not None else []
+        rendered = time.perf_counter()
+        if getattr(settings, "DECK_COMPRESSED_SIDECARS", True):
+            write_compressed_sidecars(html_path)
+            for fragment_path in fragments:
+                write_compressed_sidecars(fragment_path)
+        digests = storage.publish(html_path, *fragments)
+        GeneratedArtifact.record(html_path, GeneratedArtifact.KIND_HTML, data, comparatif, template=template_name,
+                                 sha256=digests.get(html_path),
+                                 timings={"render_ms": (rendered - started) * 1000,
+                                          "sidecars_ms": (time.perf_counter() - rendered) * 1000})
+        _write_deck_previews(html_path, storage)
 
     # Build public URL
-    html_url = request.build_absolute_uri(
-        os.path.join(base_url, relative_path, html_filename)
-    )
+    html_url = storage.url(request, relative_path, html_filename)
 
     print(f"HTML file saved: {html_path}")
     print(f"HTML URL: {html_url}")
 
-    return html_url, html_filename
+    return html_url, html_filename, html_path
 
 
 def create_energy_offer_filename(society: str, trade_name: str, energy_type: str) -> str:
@@ -1791,7 +1810,7 @@ def _compute_chart_date_ranges(data):
 def _call_market_llm(prompt):
     """POST a prompt to the in-house LLM (qwen2.5vl:7b, Ollama-compatible /api/generate).
     Returns the raw response text, or None on any network/timeout/parse failure."""
-    payload = json.dumps({
+    payload = {
         "model": "qwen2.5vl:7b",
         "prompt": prompt,
         "stream": False,
@@ -1799,19 +1818,11 @@ def _call_market_llm(prompt):
         # Keep the model resident in memory so back-to-back / subsequent
         # generations skip the ~40s cold-load cost (load_duration).
         "keep_alive": "30m",
-    }).encode("utf-8")
-
-    req = urllib.request.Request(
-        "https://gpt.caansoft.com/gpt/api/generate",
-        data=payload,
-        headers={"Content-Type": "application/json"},
-        method="POST",
-    )
+    }
 
     try:
-        with urllib.request.urlopen(req, timeout=280) as resp:
-            body = json.loads(resp.read().decode("utf-8"))
-    except (urllib.error.URLError, urllib.error.HTTPError, TimeoutError, ValueError) as e:
+        body = llm_client.generate(payload, timeout=280)
+    except (RequestException, ValueError) as e:
         print(f"Market LLM call failed: {e}")
         return None
 
@@ -2443,6 +2454,10 @@ def build_presentation_data_energy_offer(data, enedis_chart_base64, chart_base64
 
     return {
         "title": data.get("title", "VOLT CONSULTING - Energy Services Presentation"),
+        # Keys the {% cache %} fragments of the static slides/head/scripts
+        "template_version": template_version("volt-electricity.html"),
+        # Base URL of the fingerprinted CSS/JS under static/deck/ (extract_deck_assets)
+        "static_base_url": build_static_url_http(request, ""),
         "headingone": "APPEL D'OFFRE",
         "clientSociety": safe_value(data.get("clientSociety")),
         "clientSiret": safe_value(data.get("clientSiret")),
@@ -2471,6 +2486,7 @@ def build_presentation_data_energy_offer(data, enedis_chart_base64, chart_base64
         },
         "chart_date_ranges": _compute_chart_date_ranges(data),
         "images": build_images(data, request, True),
+        "image_variants": build_image_variants(data, request),
         "company_presentation": build_company_presentation(data),
         "comparatifClientHistoryPdfDto": comparatif_dto,
         "budget_global": build_budget_section(data),
@@ -2806,6 +2822,10 @@ def build_presentation_data_gas(data, chart_base64, chart_12m_base64, gas_chart_
 
     return {
         "title": data.get("title", "VOLT CONSULTING - Gas Services Presentation"),
+        # Keys the {% cache %} fragments of the static slides/head/scripts
+        "template_version": template_version("volt-gas.html"),
+        # Base URL of the fingerprinted CSS/JS under static/deck/ (extract_deck_assets)
+        "static_base_url": build_static_url_http(request, ""),
         "clientSociety": safe_value(data.get("clientSociety")),
         "clientContactName": client_contact_name,
         "clientFirstName": client_first_name,
@@ -2838,6 +2858,7 @@ def build_presentation_data_gas(data, chart_base64, chart_12m_base64, gas_chart_
         "market_analysis": market_analysis,
         "has_chart_data": bool(data.get("chartDataDto")),
         "images": build_images(data, request, True),
+        "image_variants": build_image_variants(data, request),
         "comparatifClientHistoryPdfDto": comparatif_dto,
         "image": build_image_section(data, chart_base64),
         "imageOne": {
@@ -2865,31 +2886,21 @@ def build_presentation_data_gas(data, chart_base64, chart_12m_base64, gas_chart_
 
 def generate_simple_pdf(html_content, request, data, comparatif):
     """Simple PDF generator without complex blank page removal"""
-    host = request.get_host().split(":")[0]
-
-    if host == "volt-crm.caansoft.com":
-        base_dir = settings.STAGING_MEDIA_ROOT
-        base_url = settings.STAGING_MEDIA_URL
-    elif host == "crm.volt-consulting.com":
-        base_dir = settings.PRODUCTION_MEDIA_ROOT
-        base_url = settings.PRODUCTION_MEDIA_URL
-    else:
-        base_dir = settings.MEDIA_ROOT
-        base_url = settings.MEDIA_URL
+    storage = artifact_storage(request)
 
     relative_path = os.path.join("clients", str(data.get("clientId")), "energy_offer")
-    pdf_dir = os.path.join(base_dir, relative_path)
-    os.makedirs(pdf_dir, exist_ok=True)
-
     pdf_filename = f"Energy_Offer_{data.get('clientSociety', 'client')}_{datetime.now().strftime('%Y%m%d')}.pdf"
-    pdf_path = os.path.join(pdf_dir, pdf_filename)
 
     css = CSS(string="@page { size: A4 landscape; margin: 6mm; }")
-    HTML(string=html_content).write_pdf(pdf_path, stylesheets=[css])
+    pdf_bytes = HTML(string=html_content).write_pdf(stylesheets=[css])
+    with storage.claim(relative_path, pdf_filename) as pdf_path:
+        pdf_filename = os.path.basename(pdf_path)
+        postprocess_pdf(pdf_bytes, pdf_path)
+        digests = storage.publish(pdf_path)
+        GeneratedArtifact.record(pdf_path, GeneratedArtifact.KIND_OFFER_PDF, data, comparatif,
+                                 sha256=digests.get(pdf_path))
 
-    pdf_url = request.build_absolute_uri(
-        os.path.join(base_url, relative_path, pdf_filename)
-    )
+    pdf_url = storage.url(request, relative_path, pdf_filename)
 
     return pdf_url, pdf_filename
 
@@ -3155,6 +3166,8 @@ def _download_pdf_bytes(url, max_bytes=20 * 1024 * 1024, timeout=45):
 
 def _extract_pdf_text(pdf_bytes):
     """Extract all text from a PDF (PyPDF2). Returns a string ('' if none)."""
+    from PyPDF2 import PdfReader  # the only PyPDF2 use left (generate_pdf* post-process with PyMuPDF)
+
     try:
         reader = PdfReader(io.BytesIO(pdf_bytes))
     except Exception as e:
@@ -3359,34 +3372,37 @@ def _image_to_base64_png(pil_image):
     return base64.b64encode(buf.getvalue()).decode("utf-8")
 
 
+def _render_file_to_vision_images(file_bytes, dpi=_GAS_CHART_VISION_DPI, max_pages=_GAS_CHART_VISION_MAX_PAGES):
+    """Rasterize + downscale + PNG-encode every page in one go, so the whole
+    CPU/memory-heavy part runs as a single supervised "invoice" render job
+    and only the small base64 payloads cross the process boundary.
+    Returns [(page_number, image_b64), ...]."""
+    return [
+        (page_num, _image_to_base64_png(_resize_image_for_vision(img)))
+        for page_num, img in _render_file_to_images(file_bytes, dpi=dpi, max_pages=max_pages)
+    ]
+
+
 def _call_vision_llm(prompt, image_b64, model=_GAS_CHART_VISION_MODEL,
                       num_ctx=_GAS_CHART_VISION_NUM_CTX, timeout=280):
     """Vision counterpart of _call_market_llm: same Ollama-compatible
-    /api/generate endpoint and urllib.request usage, plus an attached image
-    and an explicit context window (a rendered page costs meaningfully more
-    context as vision tokens than a text prompt does). Returns the raw
+    /api/generate endpoint and pooled llm_client connection, plus an attached
+    image and an explicit context window (a rendered page costs meaningfully
+    more context as vision tokens than a text prompt does). Returns the raw
     response text, or None on any network/timeout/parse failure (mirrors
     _call_market_llm's failure contract)."""
-    payload = json.dumps({
+    payload = {
         "model": model,
         "prompt": prompt,
         "images": [image_b64],
         "stream": False,
         "options": {"num_ctx": num_ctx},
         "keep_alive": "30m",
-    }).encode("utf-8")
-
-    req = urllib.request.Request(
-        "https://gpt.caansoft.com/gpt/api/generate",
-        data=payload,
-        headers={"Content-Type": "application/json"},
-        method="POST",
-    )
+    }
 
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            body = json.loads(resp.read().decode("utf-8"))
-    except (urllib.error.URLError, urllib.error.HTTPError, TimeoutError, ValueError) as e:
+        body = llm_client.generate(payload, timeout=timeout)
+    except (RequestException, ValueError) as e:
         print(f"Vision LLM call failed: {e}")
         return None
 
@@ -3430,7 +3446,13 @@ def _extract_gas_monthly_via_vision(file_bytes, max_pages=_GAS_CHART_VISION_MAX_
         the caller can tell "confirmed no chart" apart from "couldn't check."
     """
     try:
-        pages = _render_file_to_images(file_bytes, dpi=_GAS_CHART_VISION_DPI, max_pages=max_pages)
+        pages = run_job("invoice", _render_file_to_vision_images, file_bytes,
+                        dpi=_GAS_CHART_VISION_DPI, max_pages=max_pages)
+    except RenderJobError as e:
+        if e.code != "failed":
+            raise  # timeout / memory / crash: report it as such, not as "LLM unavailable"
+        print(f"Could not render file to images for vision extraction: {e}")
+        return None
     except Exception as e:
         print(f"Could not render file to images for vision extraction: {e}")
         return None
@@ -3438,10 +3460,7 @@ def _extract_gas_monthly_via_vision(file_bytes, max_pages=_GAS_CHART_VISION_MAX_
     prompt = _build_gas_vision_prompt()
     any_call_succeeded = False
 
-    for page_num, img in pages:
-        img = _resize_image_for_vision(img)
-        img_b64 = _image_to_base64_png(img)
-
+    for page_num, img_b64 in pages:
         raw = _call_vision_llm(prompt, img_b64)
         if raw is None:
             continue  # this page's call failed; still try the remaining pages
@@ -3592,6 +3611,8 @@ def analyze_gas_invoice(request):
             "monthly": split["monthly"],
             "consumptionAnalysis": analysis or {},
         })
+    except RenderJobError as e:
+        return JsonResponse({**e.as_dict(), "pce": pce}, status=e.http_status)
     except Exception as e:
         return JsonResponse({"status": "error", "message": str(e)}, status=500)
 
@@ -3788,6 +3809,317 @@ def _generate_consumption_analysis_gas(pairs):
 # analyze_gas_invoice, defined above — it reuses the helpers in this section.
 
 
+# Sanitizer for edited deck fragments. Keep the editing hooks (contenteditable /
+# data-edit-key / spellcheck) on every element so the saved field stays editable
+# and re-savable on the next render — otherwise bleach strips them and the field
+# "locks". The configuration is built once; bleach's Cleaner keeps parser state,
+# so each worker thread gets its own instance of it.
+EDIT_ALLOWED_TAGS = ['div', 'p', 'br', 'b', 'i', 'strong', 'em', 'ul', 'ol', 'li', 'a', 'span']
+EDIT_ALLOWED_ATTRS = {
+    '*': ['style', 'class', 'contenteditable', 'data-edit-key', 'spellcheck'],
+    'a': ['href', 'title', 'rel', 'target'],
+}
+EDIT_ALLOWED_CSS = [
+    'color', 'font-size', 'line-height', 'text-align', 'margin', 'padding',
+    'background', 'background-color', 'border', 'border-radius', 'font-weight',
+    'font-style', 'font-family', 'letter-spacing'
+]
+EDIT_KEY_RE = re.compile(r'^[\w.\-]+$')
+
+
+def _build_edit_css_sanitizer():
+    try:
+        from bleach.css_sanitizer import CSSSanitizer
+        return CSSSanitizer(allowed_css_properties=EDIT_ALLOWED_CSS)
+    except Exception:
+        return None
+
+
+_edit_css_sanitizer = _build_edit_css_sanitizer() if bleach else None
+_edit_cleaners = threading.local()
+
+
+def _edit_cleaner():
+    cleaner = getattr(_edit_cleaners, 'cleaner', None)
+    if cleaner is None:
+        cleaner = bleach.sanitizer.Cleaner(
+            tags=EDIT_ALLOWED_TAGS,
+            attributes=EDIT_ALLOWED_ATTRS,
+            css_sanitizer=_edit_css_sanitizer,
+            strip=True,
+        )
+        _edit_cleaners.cleaner = cleaner
+    return cleaner
+
+
+def _resolve_edit_path(rel_path):
+    """Absolute path of the file the editor posted, or None when it lies outside
+    the roots the editor may write within or isn't an .html file."""
+    # Generated decks embed their own absolute target (window.__VOLT_EDIT_TARGET__);
+    # the template preview sends a path relative to BASE_DIR. A leading "media/"
+    # (local dev URL) is relative to MEDIA_ROOT.
+    raw = str(rel_path).replace('\\', '/').strip()
+    if os.path.isabs(raw):
+        abs_path = os.path.abspath(raw)
+    elif raw.startswith('media/') and getattr(settings, 'MEDIA_ROOT', None):
+        abs_path = os.path.abspath(os.path.join(str(settings.MEDIA_ROOT), raw[len('media/'):]))
+    else:
+        abs_path = os.path.abspath(os.path.join(settings.BASE_DIR, raw.lstrip('/')))
+
+    # Allowlisted roots the editor may write within: project templates, the
+    # generated-decks dir, and the media/upload roots used in prod & staging.
+    allowed_roots = [
+        os.path.abspath(os.path.join(settings.BASE_DIR, 'templates')),
+        os.path.abspath(os.path.join(settings.BASE_DIR, 'clients')),
+    ]
+    for attr in ('BASE_UPLOAD_DIR', 'MEDIA_ROOT', 'STAGING_MEDIA_ROOT', 'PRODUCTION_MEDIA_ROOT'):
+        val = getattr(settings, attr, None)
+        if val:
+            allowed_roots.append(os.path.abspath(str(val)))
+
+    within_allowed = any(
+        abs_path == root or abs_path.startswith(root + os.sep)
+        for root in allowed_roots
+    )
+    if not within_allowed or not abs_path.lower().endswith('.html'):
+        return None
+    return abs_path
+
+
+def _sanitize_edit_fragment(html_fragment, key):
+    """The posted outerHTML of the field, sanitized, with its editing hooks."""
+    if bleach:
+        clean_html = _edit_cleaner().clean(html_fragment)
+    else:
+        print('[save_file_edit] WARNING: bleach not installed, preserving HTML tags for saved fragment')
+        clean_html = html_fragment
+        # Remove dangerous elements if bleach is unavailable.
+        clean_html = re.sub(r'(?is)<(script|style|iframe|object|embed|link|meta)[^>]*>.*?</\1>', '', clean_html)
+        clean_html = re.sub(r'(?is)on\w+\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+)', '', clean_html)
+
+    # Guarantee the saved wrapper keeps its editing hooks even if the sanitizer
+    # dropped them (some bleach versions strip contenteditable / data-* attrs).
+    # Without this the field re-renders as a plain <p> and can no longer be edited.
+    m = re.match(r'(\s*)<([A-Za-z][\w-]*)([^>]*)>', clean_html)
+    if not m:
+        return clean_html
+    lead, tag, attrs = m.group(1), m.group(2), m.group(3)
+    if 'contenteditable' not in attrs:
+        attrs += ' contenteditable="true"'
+    if 'data-edit-key' not in attrs:
+        attrs += ' data-edit-key="{}"'.format(key)
+    if 'spellcheck' not in attrs:
+        attrs += ' spellcheck="false"'
+    return '{}<{}{}>'.format(lead, tag, attrs) + clean_html[m.end():]
+
+
+def _merge_style_attrs(new_fragment, old_fragment, key):
+    """Carry the saved field's style/class over from the fragment it replaces
+    when the posted one lost them, and keep its editing hooks."""
+    m_new = re.match(r'(\s*)<([A-Za-z][\w-]*)([^>]*)>', new_fragment)
+    m_old = re.match(r'(\s*)<([A-Za-z][\w-]*)([^>]*)>', old_fragment)
+    if not m_new or not m_old:
+        return new_fragment
+
+    lead_new, tag_new, attrs_new = m_new.group(1), m_new.group(2), m_new.group(3)
+    attrs_old = m_old.group(3)
+
+    def _get_attr_string(attrs, name):
+        m = re.search(r'\b' + re.escape(name) + r'\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+)', attrs)
+        return m.group(1) if m else ''
+
+    for attr in ['style', 'class']:
+        if attr not in attrs_new and attr in attrs_old:
+            attrs_new += ' ' + attr + '=' + _get_attr_string(attrs_old, attr)
+
+    if 'contenteditable' not in attrs_new:
+        attrs_new += ' contenteditable="true"'
+    if 'data-edit-key' not in attrs_new:
+        attrs_new += ' data-edit-key="{}"'.format(key)
+    if 'spellcheck' not in attrs_new:
+        attrs_new += ' spellcheck="false"'
+
+    return '{}<{}{}>'.format(lead_new, tag_new, attrs_new) + new_fragment[m_new.end():]
+
+
+def _locate_edit_keys(abs_path, keys):
+    """({file: [keys]}, missing keys) for the deck at abs_path. A shell-layout
+    deck keeps most slides in fragment files beside it; the editor still posts
+    the shell's path, so the markers are looked up there too."""
+    candidates = [abs_path] + deck_fragment_paths(abs_path)
+    targets = {}
+    missing = []
+    for key in keys:
+        for candidate in candidates:
+            if key in edit_index.index_for(candidate):
+                targets.setdefault(candidate, []).append(key)
+                break
+        else:
+            missing.append(key)
+    return targets, missing
+
+
+def _splice_file_edits(path, edits):
+    """(new bytes, their EditIndex) of the file at path with the edits
+    ({key: sanitized html}) of the keys it holds spliced in, or None when it
+    holds none of them."""
+    data, index = edit_index.read_indexed(path)
+    replacements = {
+        key: ('\n' + _merge_style_attrs(html, edit_index.field_content(data, index, key), key) + '\n').encode('utf-8')
+        for key, html in edits.items() if key in index
+    }
+    if not replacements:
+        return None
+    # The splice also drops each saved field's "défaut" marker (span.deftag
+    # with data-for=key), so it doesn't reappear when this saved deck is
+    # re-rendered/reopened. (deftags are the only elements using data-for,
+    # so this can't hit an editable field.)
+    return edit_index.apply_edits(data, index, replacements)
+
+
+def _apply_file_edits(abs_path, edits):
+    """Replace the region between the EDIT markers of every key in edits
+    ({key: sanitized html}) in the deck at abs_path — or in the shell-layout
+    fragments holding them — with one read and one temp file + rename per
+    file touched. Regions are found through the cached marker index
+    (blog/edit_index.py), so no edit scans the document. All or nothing: if
+    any key's markers are missing nothing is written. A deck carrying an
+    embedded version gets a new one. Call with the deck's artifact_lock
+    held. Returns None, or (error, http_status, keys)."""
+    targets, missing = _locate_edit_keys(abs_path, edits)
+    if missing:
+        return 'markers not found', 400, missing
+    version = _new_deck_version() if _embedded_version(abs_path) is not None else None
+
+    # Only artifacts get sidecars and are published: an edited template
+    # stays a plain file in the source tree
+    storage = storage_for_path(abs_path)
+    changed = {}
+    for path in targets:
+        spliced = _splice_file_edits(path, edits)
+        if spliced is not None:
+            changed[path] = spliced
+    if version is not None:
+        new_data, new_index = changed.get(abs_path) or edit_index.read_indexed(abs_path)
+        # Same length as the version it replaces, so new_index stays valid
+        changed[abs_path] = (_DECK_VERSION_RE.sub(lambda m: _version_marker(version), new_data, count=1), new_index)
+
+    for path, (new_data, new_index) in changed.items():
+        # Atomic write
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-', suffix='.html')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(new_data)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+            edit_index.remember(path, new_index)
+            # publish() (and the ETag of a deck without an embedded version)
+            # then needn't read the file back
+            remember_digest(path, hashlib.sha256(new_data).hexdigest())
+            if path == abs_path and version is not None:
+                _remember_embedded_version(path, version)
+            # Keep the precompressed copies nginx serves in step with the edit
+            if storage and getattr(settings, "DECK_COMPRESSED_SIDECARS", True):
+                write_compressed_sidecars(path, new_data, brotli_quality=EDIT_BROTLI_QUALITY)
+        finally:
+            try:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            except Exception:
+                pass
+    if storage and changed:
+        storage.publish(*changed)
+    return None
+
+
+_embedded_versions = OrderedDict()
+_embedded_versions_guard = threading.Lock()
+_DECK_VERSION_RE = re.compile(rb'window\.__VOLT_DECK_VERSION__ = "\\"[0-9a-f]{24}\\""')
+
+
+def _deck_of(path):
+    """The deck a shell-layout fragment belongs to (path itself for a deck)."""
+    directory = os.path.dirname(path)
+    if directory.endswith(FRAGMENT_DIR_SUFFIX):
+        return directory[:-len(FRAGMENT_DIR_SUFFIX)] + '.html'
+    return path
+
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _remember_embedded_version(deck, version, stamp=None):
+    with _embedded_versions_guard:
+        _embedded_versions[deck] = (stamp or _file_stamp(deck), version)
+        _embedded_versions.move_to_end(deck)
+        while len(_embedded_versions) > 512:
+            _embedded_versions.popitem(last=False)
+
+
+def _new_deck_version():
+    return quote_etag(uuid.uuid4().hex[:24])
+
+
+def _version_marker(version):
+    return b'window.__VOLT_DECK_VERSION__ = ' + json.dumps(version).encode()
+
+
+def _embedded_version(deck):
+    """The version generation (and every save since) wrote into the deck's
+    <head> as window.__VOLT_DECK_VERSION__ (an ETag); None for files
+    without one (templates, decks generated before it was added)."""
+    stamp = _file_stamp(deck)
+    with _embedded_versions_guard:
+        hit = _embedded_versions.get(deck)
+        if hit is not None and hit[0] == stamp:
+            _embedded_versions.move_to_end(deck)
+            return hit[1]
+    with open(deck, 'rb') as f:
+        m = _DECK_VERSION_RE.search(f.read())
+    version = json.loads(m.group(0).split(b' = ', 1)[1]) if m else None
+    _remember_embedded_version(deck, version, stamp)
+    return version
+
+
+def _deck_version(abs_path):
+    """ETag of the deck at abs_path as the editor sees it. A generated deck
+    carries it in its page (_embedded_version), so the editor sends back the
+    version of what it loaded. Decks without one are versioned by a hash of
+    their content and their fragments' (storage.cached_digest, which every
+    save primes with the bytes it wrote)."""
+    deck = _deck_of(abs_path)
+    embedded = _embedded_version(deck)
+    if embedded is not None:
+        return embedded
+    h = hashlib.sha256()
+    for path in [deck] + deck_fragment_paths(deck):
+        h.update(cached_digest(path).encode())
+    return quote_etag(h.hexdigest()[:24])
+
+
+def _save_file_edits(abs_path, edits, if_match=None):
+    """Apply edits ({key: sanitized html}) to the deck at abs_path.
+    if_match is the request's If-Match header: when the deck's version is
+    none of its ETags, nothing is written (409). A deck that embeds its
+    version isn't written without it (428); others (templates, decks
+    generated before versions were embedded, whose editor may not send one)
+    stay last-writer-wins then. Returns (None or (error, http_status, keys),
+    the deck's version afterwards)."""
+    # Read-modify-write under the deck's write lock, so a concurrent edit
+    # or regeneration of the same deck can't be lost or interleaved
+    with artifact_lock(abs_path):
+        if if_match:
+            current = _deck_version(abs_path)
+            etags = parse_etags(if_match)
+            if '*' not in etags and current not in etags and 'W/' + current not in etags:
+                return ('version conflict', 409, list(edits)), current
+        elif _embedded_version(_deck_of(abs_path)) is not None:
+            return ('If-Match required', 428, list(edits)), _deck_version(abs_path)
+        return _apply_file_edits(abs_path, edits), _deck_version(abs_path)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def save_file_edit(request):
@@ -3811,165 +4143,80 @@ def save_file_edit(request):
 
         # The key is interpolated into the EDIT markers/regex, so restrict it to a
         # simple token (letters, digits, dot, dash, underscore).
-        if not re.match(r'^[\w.\-]+$', str(key)):
+        if not EDIT_KEY_RE.match(str(key)):
             return JsonResponse({'ok': False, 'error': 'invalid key'}, status=400)
 
-        # Resolve the target path. Generated decks embed their own absolute target
-        # (window.__VOLT_EDIT_TARGET__); the template preview sends a path relative
-        # to BASE_DIR. A leading "media/" (local dev URL) is dropped.
-        raw = str(rel_path).replace('\\', '/').strip()
-        if raw.startswith('media/'):
-            raw = raw[len('media/'):]
-        if os.path.isabs(raw):
-            abs_path = os.path.abspath(raw)
-        else:
-            abs_path = os.path.abspath(os.path.join(settings.BASE_DIR, raw.lstrip('/')))
-
-        # Allowlisted roots the editor may write within: project templates, the
-        # generated-decks dir, and the media/upload roots used in prod & staging.
-        allowed_roots = [
-            os.path.abspath(os.path.join(settings.BASE_DIR, 'templates')),
-            os.path.abspath(os.path.join(settings.BASE_DIR, 'clients')),
-        ]
-        for attr in ('BASE_UPLOAD_DIR', 'MEDIA_ROOT', 'STAGING_MEDIA_ROOT', 'PRODUCTION_MEDIA_ROOT'):
-            val = getattr(settings, attr, None)
-            if val:
-                allowed_roots.append(os.path.abspath(str(val)))
-
-        within_allowed = any(
-            abs_path == root or abs_path.startswith(root + os.sep)
-            for root in allowed_roots
-        )
-        if not within_allowed or not abs_path.lower().endswith('.html'):
+        abs_path = _resolve_edit_path(rel_path)
+        if abs_path is None:
             return JsonResponse({'ok': False, 'error': 'invalid path'}, status=400)
 
         print(f"[save_file_edit] key={key!r} abs_path={abs_path!r}")
 
-        # Sanitize fragment. Keep the editing hooks (contenteditable / data-edit-key /
-        # spellcheck) on every element so the saved field stays editable and re-savable
-        # on the next render — otherwise bleach strips them and the field "locks".
-        if bleach:
-            allowed_tags = ['div', 'p', 'br', 'b', 'i', 'strong', 'em', 'ul', 'ol', 'li', 'a', 'span']
-            allowed_attrs = {
-                '*': ['style', 'class', 'contenteditable', 'data-edit-key', 'spellcheck'],
-                'a': ['href', 'title', 'rel', 'target'],
-            }
-            css_sanitizer = None
-            try:
-                from bleach.css_sanitizer import CSSSanitizer
-                css_sanitizer = CSSSanitizer(allowed_css_properties=[
-                    'color', 'font-size', 'line-height', 'text-align', 'margin', 'padding',
-                    'background', 'background-color', 'border', 'border-radius', 'font-weight',
-                    'font-style', 'font-family', 'letter-spacing'
-                ])
-            except Exception:
-                css_sanitizer = None
-
-            if css_sanitizer:
-                clean_html = bleach.clean(
-                    html_fragment,
-                    tags=allowed_tags,
-                    attributes=allowed_attrs,
-                    css_sanitizer=css_sanitizer,
-                    strip=True,
-                )
-            else:
-                clean_html = bleach.clean(html_fragment, tags=allowed_tags, attributes=allowed_attrs, strip=True)
+        clean_html = _sanitize_edit_fragment(html_fragment, key)
+
+        error, version = _save_file_edits(abs_path, {key: clean_html}, request.headers.get('If-Match'))
+        if error:
+            response = JsonResponse({'ok': False, 'error': error[0], 'version': version}, status=error[1])
         else:
-            print('[save_file_edit] WARNING: bleach not installed, preserving HTML tags for saved fragment')
-            clean_html = html_fragment
-            # Remove dangerous elements if bleach is unavailable.
-            clean_html = re.sub(r'(?is)<(script|style|iframe|object|embed|link|meta)[^>]*>.*?</\1>', '', clean_html)
-            clean_html = re.sub(r'(?is)on\w+\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+)', '', clean_html)
-
-        # Guarantee the saved wrapper keeps its editing hooks even if the sanitizer
-        # dropped them (some bleach versions strip contenteditable / data-* attrs).
-        # Without this the field re-renders as a plain <p> and can no longer be edited.
-        def _reattach_edit_attrs(fragment):
-            m = re.match(r'(\s*)<([A-Za-z][\w-]*)([^>]*)>', fragment)
-            if not m:
-                return fragment
-            lead, tag, attrs = m.group(1), m.group(2), m.group(3)
-            if 'contenteditable' not in attrs:
-                attrs += ' contenteditable="true"'
-            if 'data-edit-key' not in attrs:
-                attrs += ' data-edit-key="{}"'.format(key)
-            if 'spellcheck' not in attrs:
-                attrs += ' spellcheck="false"'
-            return '{}<{}{}>'.format(lead, tag, attrs) + fragment[m.end():]
-
-        clean_html = _reattach_edit_attrs(clean_html)
-
-        start = f'<!-- EDIT:start:{key} -->'
-        end = f'<!-- EDIT:end:{key} -->'
-
-        with open(abs_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        if start not in content or end not in content:
-            return JsonResponse({'ok': False, 'error': 'markers not found'}, status=400)
-
-        pattern = re.compile(re.escape(start) + r'(.*?)' + re.escape(end), re.S)
-        orig_match = pattern.search(content)
-        orig_fragment = orig_match.group(1) if orig_match else ''
-
-        def _merge_style_attrs(new_fragment, old_fragment):
-            m_new = re.match(r'(\s*)<([A-Za-z][\w-]*)([^>]*)>', new_fragment)
-            m_old = re.match(r'(\s*)<([A-Za-z][\w-]*)([^>]*)>', old_fragment)
-            if not m_new or not m_old:
-                return new_fragment
-
-            lead_new, tag_new, attrs_new = m_new.group(1), m_new.group(2), m_new.group(3)
-            attrs_old = m_old.group(3)
-
-            def _get_attr_string(attrs, name):
-                m = re.search(r'\b' + re.escape(name) + r'\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+)', attrs)
-                return m.group(1) if m else ''
-
-            for attr in ['style', 'class']:
-                if attr not in attrs_new and attr in attrs_old:
-                    attrs_new += ' ' + attr + '=' + _get_attr_string(attrs_old, attr)
-
-            if 'contenteditable' not in attrs_new:
-                attrs_new += ' contenteditable="true"'
-            if 'data-edit-key' not in attrs_new:
-                attrs_new += ' data-edit-key="{}"'.format(key)
-            if 'spellcheck' not in attrs_new:
-                attrs_new += ' spellcheck="false"'
-
-            return '{}<{}{}>'.format(lead_new, tag_new, attrs_new) + new_fragment[m_new.end():]
-
-        clean_html = _merge_style_attrs(clean_html, orig_fragment)
-        replacement = start + '\n' + clean_html + '\n' + end
-        new_content, n = pattern.subn(replacement, content)
-        if n == 0:
-            return JsonResponse({'ok': False, 'error': 'replace failed'}, status=500)
-
-        # A field that was just saved is no longer showing a default — drop its
-        # "défaut" marker (span.deftag with data-for=key) so it doesn't reappear
-        # when this saved deck is re-rendered/reopened. (deftags are the only
-        # elements using data-for, so this can't hit an editable field.)
-        new_content = re.sub(
-            r'<span\b[^>]*\bdata-for="' + re.escape(key) + r'"[^>]*>.*?</span>',
-            '', new_content, flags=re.S)
+            response = JsonResponse({'ok': True, 'version': version})
+        response['ETag'] = version
+        return response
+    except json.JSONDecodeError:
+        return JsonResponse({'ok': False, 'error': 'invalid json'}, status=400)
+    except Exception as e:
+        logging.exception('save_file_edit failed')
+        return JsonResponse({'ok': False, 'error': str(e)}, status=500)
 
-        # Atomic write
-        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(abs_path), prefix='.tmp-', suffix='.html')
-        os.close(fd)
-        try:
-            with open(tmp_path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            os.replace(tmp_path, abs_path)
-        finally:
-            try:
-                if os.path.exists(tmp_path):
-                    os.remove(tmp_path)
-            except Exception:
-                pass
 
-        return JsonResponse({'ok': True})
+@csrf_exempt
+@require_http_methods(["POST"])
+def save_file_edit_batch(request):
+    """Like save_file_edit, for many fields of one file at once:
+    {path, edits: [{key, html}, ...]} (or edits as a {key: html} object).
+    Every field is sanitized first, then all of them are applied in a single
+    read-modify-write — all or nothing. Requires authenticated staff user.
+    """
+    try:
+        if not settings.DEBUG and not getattr(request.user, 'is_staff', False):
+            return JsonResponse({'ok': False, 'error': 'permission'}, status=403)
+
+        data = json.loads(request.body.decode('utf-8') if isinstance(request.body, (bytes, bytearray)) else request.body)
+        if not isinstance(data, dict):
+            return JsonResponse({'ok': False, 'error': 'invalid payload'}, status=400)
+        rel_path = data.get('path')
+        edits = data.get('edits')
+        if isinstance(edits, dict):
+            edits = [{'key': k, 'html': v} for k, v in edits.items()]
+
+        if not rel_path or not isinstance(rel_path, str) or not isinstance(edits, list) or not edits:
+            return JsonResponse({'ok': False, 'error': 'missing parameters'}, status=400)
+        if not all(isinstance(edit, dict) and isinstance(edit.get('html', ''), str) for edit in edits):
+            return JsonResponse({'ok': False, 'error': 'invalid payload'}, status=400)
+
+        keys = [edit.get('key') for edit in edits]
+        invalid = [k for k in keys if not isinstance(k, str) or not EDIT_KEY_RE.match(k)]
+        if invalid:
+            return JsonResponse({'ok': False, 'error': 'invalid key', 'keys': invalid}, status=400)
+
+        abs_path = _resolve_edit_path(rel_path)
+        if abs_path is None:
+            return JsonResponse({'ok': False, 'error': 'invalid path'}, status=400)
+
+        print(f"[save_file_edit_batch] {len(edits)} edits abs_path={abs_path!r}")
+
+        # A key posted twice keeps its last value
+        cleaned = {edit['key']: _sanitize_edit_fragment(edit.get('html', ''), edit['key']) for edit in edits}
+
+        error, version = _save_file_edits(abs_path, cleaned, request.headers.get('If-Match'))
+        if error:
+            response = JsonResponse({'ok': False, 'error': error[0], 'keys': error[2], 'version': version},
+                                    status=error[1])
+        else:
+            response = JsonResponse({'ok': True, 'saved': list(cleaned), 'version': version})
+        response['ETag'] = version
+        return response
     except json.JSONDecodeError:
         return JsonResponse({'ok': False, 'error': 'invalid json'}, status=400)
     except Exception as e:
-        logging.exception('save_file_edit failed')
-        return JsonResponse({'ok': False, 'error': str(e)}, status=500)
\ No newline at end of file
+        logging.exception('save_file_edit_batch failed')
+        return JsonResponse({'ok': False, 'error': str(e)}, status=500)
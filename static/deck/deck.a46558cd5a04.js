@@ -0,0 +1,1430 @@
+(() => {
+            const DESIGN_W_DEFAULT = 1123;
+            const DESIGN_H_DEFAULT = 794;
+            const OVERLAY_HIDE_MS = 1800;
+            const VALIDATE_ATTR = 'no_overflowing_text,no_overlapping_text,slide_sized_text';
+
+            const pad2 = (n) => String(n).padStart(2, '0');
+
+            const stylesheet = `
+    :host {
+      position: fixed;
+      inset: 0;
+      display: block;
+      background: #000;
+      color: #fff;
+      font-family: -apple-system, BlinkMacSystemFont, "Helvetica Neue", Helvetica, Arial, sans-serif;
+      overflow: hidden;
+    }
+    :host([data-fonts-pending]) .stage,
+    :host([data-fonts-pending]) .rail { opacity: 0; pointer-events: none; }
+
+    .stage {
+      position: absolute;
+      inset: 0;
+      display: flex;
+      align-items: center;
+      justify-content: center;
+    }
+
+    .canvas {
+      position: relative;
+      transform-origin: center center;
+      flex-shrink: 0;
+      background: #fff;
+      will-change: transform;
+    }
+
+    ::slotted(*) {
+      position: absolute !important;
+      inset: 0 !important;
+      width: 100% !important;
+      height: 100% !important;
+      box-sizing: border-box !important;
+      overflow: hidden;
+      opacity: 0;
+      pointer-events: none;
+      visibility: hidden;
+    }
+    ::slotted([data-deck-active]) {
+      opacity: 1;
+      pointer-events: auto;
+      visibility: visible;
+    }
+
+    .tapzones {
+      position: fixed;
+      inset: 0;
+      display: flex;
+      z-index: 2147482000;
+      pointer-events: none;
+    }
+    .tapzone {
+      flex: 1;
+      pointer-events: auto;
+      -webkit-tap-highlight-color: transparent;
+    }
+    @media (hover: hover) and (pointer: fine) {
+      .tapzones { display: none; }
+    }
+
+    .overlay {
+      position: fixed;
+      left: 50%;
+      bottom: 22px;
+      transform: translate(-50%, 6px) scale(0.92);
+      filter: blur(6px);
+      display: flex;
+      align-items: center;
+      gap: 4px;
+      padding: 4px;
+      background: #000;
+      color: #fff;
+      border-radius: 999px;
+      font-size: 12px;
+      font-feature-settings: "tnum" 1;
+      letter-spacing: 0.01em;
+      opacity: 0;
+      pointer-events: none;
+      transition: opacity 260ms ease, transform 260ms cubic-bezier(.2,.8,.2,1), filter 260ms ease;
+      transform-origin: center bottom;
+      z-index: 2147483000;
+      user-select: none;
+    }
+    .overlay[data-visible] {
+      opacity: 1;
+      pointer-events: auto;
+      transform: translate(-50%, 0) scale(1);
+      filter: blur(0);
+    }
+
+    .btn {
+      appearance: none;
+      -webkit-appearance: none;
+      background: transparent;
+      border: 0;
+      margin: 0;
+      padding: 0;
+      color: inherit;
+      font: inherit;
+      cursor: default;
+      display: inline-flex;
+      align-items: center;
+      justify-content: center;
+      height: 28px;
+      min-width: 28px;
+      border-radius: 999px;
+      color: rgba(255,255,255,0.72);
+      transition: background 140ms ease, color 140ms ease;
+      -webkit-tap-highlight-color: transparent;
+    }
+    .btn:hover { background: rgba(255,255,255,0.12); color: #fff; }
+    .btn:active { background: rgba(255,255,255,0.18); }
+    .btn:focus { outline: none; }
+    .btn:focus-visible { outline: none; }
+    .btn::-moz-focus-inner { border: 0; }
+    .btn svg { width: 14px; height: 14px; display: block; }
+    .btn.reset {
+      font-size: 11px;
+      font-weight: 500;
+      letter-spacing: 0.02em;
+      padding: 0 10px 0 12px;
+      gap: 6px;
+      color: rgba(255,255,255,0.72);
+    }
+    .btn.reset .kbd {
+      display: inline-flex;
+      align-items: center;
+      justify-content: center;
+      min-width: 16px;
+      height: 16px;
+      padding: 0 4px;
+      font-family: ui-monospace, "SF Mono", Menlo, Consolas, monospace;
+      font-size: 10px;
+      line-height: 1;
+      color: rgba(255,255,255,0.88);
+      background: rgba(255,255,255,0.12);
+      border-radius: 4px;
+    }
+
+    .count {
+      font-variant-numeric: tabular-nums;
+      color: #fff;
+      font-weight: 500;
+      padding: 0 8px;
+      min-width: 42px;
+      text-align: center;
+      font-size: 12px;
+    }
+    .count .sep { color: rgba(255,255,255,0.45); margin: 0 3px; font-weight: 400; }
+    .count .total { color: rgba(255,255,255,0.55); }
+
+    .divider {
+      width: 1px;
+      height: 14px;
+      background: rgba(255,255,255,0.18);
+      margin: 0 2px;
+    }
+
+    .rail {
+      position: fixed;
+      left: 0;
+      top: 0;
+      bottom: 0;
+      width: var(--deck-rail-w, 188px);
+      background: #141414;
+      border-right: 1px solid rgba(255,255,255,0.08);
+      overflow-y: auto;
+      overflow-x: hidden;
+      padding: 12px 10px;
+      box-sizing: border-box;
+      display: flex;
+      flex-direction: column;
+      gap: 12px;
+      z-index: 2147482500;
+      scrollbar-width: thin;
+      scrollbar-color: rgba(255,255,255,0.18) transparent;
+    }
+    .rail::-webkit-scrollbar { width: 8px; }
+    .rail::-webkit-scrollbar-track { background: transparent; margin: 2px; }
+    .rail::-webkit-scrollbar-thumb {
+      background: rgba(255,255,255,0.18);
+      border-radius: 4px;
+      border: 2px solid transparent;
+      background-clip: content-box;
+    }
+    .rail::-webkit-scrollbar-thumb:hover {
+      background: rgba(255,255,255,0.28);
+      border: 2px solid transparent;
+      background-clip: content-box;
+    }
+    :host([no-rail]) .rail,
+    :host([noscale]) .rail { display: none; }
+    .rail[data-presenting] { display: none; }
+    .rail[data-user-hidden] { transform: translateX(-100%); }
+    :host([data-rail-anim]) .rail { transition: transform 200ms cubic-bezier(.3,.7,.4,1); }
+    :host([data-rail-anim]) .stage { transition: left 200ms cubic-bezier(.3,.7,.4,1); }
+    :host([data-rail-anim]) .canvas { transition: transform 200ms cubic-bezier(.3,.7,.4,1); }
+    :host([data-rail-anim]) .overlay {
+      transition: margin-left 200ms cubic-bezier(.3,.7,.4,1),
+                  opacity 260ms ease,
+                  transform 260ms cubic-bezier(.2,.8,.2,1),
+                  filter 260ms ease;
+    }
+    :host([data-rail-anim]) .tapzones { transition: left 200ms cubic-bezier(.3,.7,.4,1); }
+
+    .thumb {
+      position: relative;
+      display: flex;
+      align-items: flex-start;
+      gap: 8px;
+      cursor: pointer;
+      user-select: none;
+    }
+    .thumb .num {
+      width: 16px;
+      flex-shrink: 0;
+      font-size: 11px;
+      font-weight: 500;
+      text-align: right;
+      color: rgba(255,255,255,0.55);
+      padding-top: 2px;
+      font-variant-numeric: tabular-nums;
+    }
+    .thumb .frame {
+      position: relative;
+      flex: 1;
+      min-width: 0;
+      aspect-ratio: var(--deck-aspect);
+      background: #fff;
+      border-radius: 4px;
+      outline: 2px solid transparent;
+      outline-offset: 0;
+      overflow: hidden;
+      transition: outline-color 120ms ease;
+    }
+    .thumb:hover .frame { outline-color: rgba(255,255,255,0.25); }
+    .thumb { outline: none; }
+    .thumb:focus-visible .frame { outline-color: rgba(255,255,255,0.5); }
+    .thumb[data-current] .num { color: #fff; }
+    .thumb[data-current] .frame { outline-color: #D97757; }
+    .thumb[data-dragging] { opacity: 0.35; }
+    .thumb::before {
+      content: '';
+      position: absolute;
+      left: 24px;
+      right: 0;
+      height: 3px;
+      border-radius: 2px;
+      background: #D97757;
+      opacity: 0;
+      pointer-events: none;
+    }
+    .thumb[data-drop="before"]::before { top: -8px; opacity: 1; }
+    .thumb[data-drop="after"]::before { bottom: -8px; opacity: 1; }
+    .thumb[data-skip] .frame { opacity: 0.35; }
+    .thumb[data-skip] .frame::after {
+      content: 'Skipped';
+      position: absolute;
+      inset: 0;
+      display: flex;
+      align-items: center;
+      justify-content: center;
+      background: rgba(0,0,0,0.45);
+      color: #fff;
+      font-size: 10px;
+      font-weight: 500;
+      letter-spacing: 0.04em;
+    }
+
+    .ctxmenu {
+      position: fixed;
+      min-width: 150px;
+      padding: 4px;
+      background: #242424;
+      border: 1px solid rgba(255,255,255,0.12);
+      border-radius: 7px;
+      box-shadow: 0 8px 24px rgba(0,0,0,0.45);
+      z-index: 2147483100;
+      display: none;
+      font-size: 12px;
+    }
+    .ctxmenu[data-open] { display: block; }
+    .ctxmenu button {
+      display: block;
+      width: 100%;
+      appearance: none;
+      border: 0;
+      background: transparent;
+      color: #e8e8e8;
+      font: inherit;
+      text-align: left;
+      padding: 6px 10px;
+      border-radius: 4px;
+      cursor: pointer;
+    }
+    .ctxmenu button:hover:not(:disabled) { background: rgba(255,255,255,0.08); }
+    .ctxmenu button:disabled { opacity: 0.35; cursor: default; }
+    .ctxmenu hr {
+      border: 0;
+      border-top: 1px solid rgba(255,255,255,0.1);
+      margin: 4px 2px;
+    }
+
+    .rail-resize {
+      position: fixed;
+      left: calc(var(--deck-rail-w, 188px) - 3px);
+      top: 0;
+      bottom: 0;
+      width: 6px;
+      cursor: col-resize;
+      z-index: 2147482600;
+      touch-action: none;
+    }
+    .rail-resize:hover,
+    .rail-resize[data-dragging] { background: rgba(255,255,255,0.12); }
+    :host([no-rail]) .rail-resize,
+    :host([noscale]) .rail-resize,
+    .rail[data-presenting] + .rail-resize,
+    .rail[data-user-hidden] + .rail-resize { display: none; }
+
+    .confirm-backdrop {
+      position: fixed;
+      inset: 0;
+      background: rgba(0,0,0,0.45);
+      z-index: 2147483200;
+      display: none;
+      align-items: center;
+      justify-content: center;
+    }
+    .confirm-backdrop[data-open] { display: flex; }
+    .confirm {
+      width: 320px;
+      max-width: calc(100vw - 32px);
+      background: #2a2a2a;
+      color: #e8e8e8;
+      border: 1px solid rgba(255,255,255,0.12);
+      border-radius: 12px;
+      box-shadow: 0 12px 32px rgba(0,0,0,0.5);
+      overflow: hidden;
+      font-family: inherit;
+      animation: deck-confirm-in 0.18s ease;
+    }
+    @keyframes deck-confirm-in {
+      from { opacity: 0; transform: scale(0.96); }
+      to { opacity: 1; transform: scale(1); }
+    }
+    .confirm .body { padding: 20px 20px 16px; }
+    .confirm .title { font-size: 14px; font-weight: 600; margin-bottom: 4px; }
+    .confirm .msg { font-size: 13px; line-height: 1.5; color: rgba(255,255,255,0.65); }
+    .confirm .footer {
+      padding: 14px 20px;
+      background: #1f1f1f;
+      border-top: 1px solid rgba(255,255,255,0.08);
+      display: flex;
+      justify-content: flex-end;
+      gap: 8px;
+    }
+    .confirm button {
+      appearance: none;
+      font: inherit;
+      font-size: 13px;
+      font-weight: 500;
+      padding: 8px 16px;
+      border-radius: 8px;
+      cursor: pointer;
+    }
+    .confirm .cancel {
+      background: transparent;
+      border: 0;
+      color: rgba(255,255,255,0.8);
+    }
+    .confirm .cancel:hover { background: rgba(255,255,255,0.08); }
+    .confirm .danger {
+      background: #c96442;
+      border: 1px solid rgba(0,0,0,0.15);
+      color: #fff;
+      box-shadow: 0 1px 3px rgba(166,50,68,0.3), 0 2px 6px rgba(166,50,68,0.18);
+    }
+    .confirm .danger:hover { background: #b5563a; }
+
+    @media print {
+      :host {
+        position: static;
+        inset: auto;
+        background: none;
+        overflow: visible;
+        color: inherit;
+      }
+      .stage { position: static; display: block; }
+      .canvas {
+        transform: none !important;
+        width: auto !important;
+        height: auto !important;
+        background: none;
+        will-change: auto;
+      }
+      ::slotted(*) {
+        position: relative !important;
+        inset: auto !important;
+        width: var(--deck-design-w) !important;
+        height: var(--deck-design-h) !important;
+        box-sizing: border-box !important;
+        opacity: 1 !important;
+        visibility: visible !important;
+        pointer-events: auto;
+        break-after: page;
+        page-break-after: always;
+        break-inside: avoid;
+        overflow: hidden;
+      }
+      ::slotted(*:last-child),
+      ::slotted([data-deck-last-visible]) {
+        break-after: auto;
+        page-break-after: auto;
+      }
+      ::slotted([data-deck-skip]) { display: none !important; }
+      .overlay, .tapzones, .rail, .rail-resize, .ctxmenu, .confirm-backdrop { display: none !important; }
+    }
+  `;
+
+            class DeckStage extends HTMLElement {
+                static get observedAttributes() { return ['width', 'height', 'noscale', 'no-rail']; }
+
+                constructor() {
+                    super();
+                    this._root = this.attachShadow({ mode: 'open' });
+                    this._index = 0;
+                    this._slides = [];
+                    this._notes = [];
+                    this._hideTimer = null;
+                    this._mouseIdleTimer = null;
+                    this._menuIndex = -1;
+
+                    this._onKey = this._onKey.bind(this);
+                    this._onResize = this._onResize.bind(this);
+                    this._onSlotChange = this._onSlotChange.bind(this);
+                    this._onMouseMove = this._onMouseMove.bind(this);
+                    this._onTapBack = this._onTapBack.bind(this);
+                    this._onTapForward = this._onTapForward.bind(this);
+                    this._onMessage = this._onMessage.bind(this);
+                    this._onDocClick = (e) => {
+                        if (this._menu && e.composedPath && e.composedPath().includes(this._menu)) return;
+                        this._closeMenu();
+                    };
+                }
+
+                get designWidth() {
+                    return parseInt(this.getAttribute('width'), 10) || DESIGN_W_DEFAULT;
+                }
+                get designHeight() {
+                    return parseInt(this.getAttribute('height'), 10) || DESIGN_H_DEFAULT;
+                }
+
+                connectedCallback() {
+                    if (/[?&]_snthumb=/.test(location.search)) this.setAttribute('no-rail', '');
+                    this._render();
+                    this._loadNotes();
+                    this._syncPrintPageRule();
+                    window.addEventListener('keydown', this._onKey);
+                    window.addEventListener('resize', this._onResize);
+                    window.addEventListener('mousemove', this._onMouseMove, { passive: true });
+                    window.addEventListener('message', this._onMessage);
+                    window.addEventListener('click', this._onDocClick, true);
+                    this._enableRail();
+                    this.setAttribute('data-fonts-pending', '');
+                    const reveal = () => this.removeAttribute('data-fonts-pending');
+                    requestAnimationFrame(() => {
+                        Promise.race([
+                            document.fonts ? document.fonts.ready : Promise.resolve(),
+                            new Promise((r) => setTimeout(r, 2000)),
+                        ]).then(reveal, reveal);
+                    });
+                }
+
+                _enableRail() {
+                    if (this._railEnabled || this.hasAttribute('no-rail')) return;
+                    this._railEnabled = true;
+                    this._railVisible = true;
+                    try {
+                        if (localStorage.getItem('deck-stage.railVisible') === '0') this._railVisible = false;
+                    } catch (e) { }
+                    const OWN_ATTRS = /^data-(deck-|screen-label$|om-validate$)/;
+                    this._liveDirty = new Set();
+                    this._liveObserver = new MutationObserver((records) => {
+                        for (const r of records) {
+                            if (r.type === 'attributes' && OWN_ATTRS.test(r.attributeName || '')) continue;
+                            let n = r.target;
+                            while (n && n.parentElement !== this) n = n.parentElement;
+                            if (n && this._slideSet && this._slideSet.has(n)) this._liveDirty.add(n);
+                        }
+                        if (this._liveDirty.size && !this._liveTimer) {
+                            this._liveTimer = setTimeout(() => {
+                                this._liveTimer = null;
+                                this._liveDirty.forEach((s) => this._refreshThumb(s));
+                                this._liveDirty.clear();
+                            }, 200);
+                        }
+                    });
+                    this._liveObserver.observe(this, {
+                        subtree: true, childList: true, characterData: true, attributes: true,
+                    });
+                    this._railObserver = new IntersectionObserver((entries) => {
+                        entries.forEach((e) => {
+                            if (e.isIntersecting && e.target.__deckThumb) {
+                                this._materialize(e.target.__deckThumb);
+                            }
+                        });
+                    }, { root: this._rail, rootMargin: '400px 0px' });
+                    this._onTweakChange = () => {
+                        clearTimeout(this._tweakTimer);
+                        this._tweakTimer = setTimeout(() => {
+                            this._snapshotAuthorCss();
+                            const cs = getComputedStyle(this);
+                            (this._thumbs || []).forEach((t) => {
+                                if (t.host) this._syncThumbHostAttrs(t.host, cs);
+                            });
+                        }, 120);
+                    };
+                    window.addEventListener('tweakchange', this._onTweakChange);
+                    this._snapshotAuthorCss();
+                    this._syncRailHidden();
+                    this._renderRail();
+                    this._fit();
+                }
+
+                _snapshotAuthorCss() {
+                    const authorCss = Array.from(document.styleSheets).map((sh) => {
+                        try {
+                            return Array.from(sh.cssRules).map((r) => r.cssText).join('\n');
+                        } catch (e) { return ''; }
+                    }).join('\n')
+                        .replace(/:root((?:\[[^\]]*\]|[.#][-\w]+|:[-\w]+(?:\([^)]*\))?)+)/g, ':host($1)')
+                        .replace(/:root\b/g, ':host')
+                        .replace(/(^|[\s,>~+(}])html((?:\[[^\]]*\]|[.#][-\w]+|:[-\w]+(?:\([^)]*\))?)+)(?![-\w])/g, '$1:host($2)')
+                        .replace(/(^|[\s,>~+(}])html(?![-\w])/g, '$1:host');
+                    this._authorVars = new Set(authorCss.match(/--[\w-]+/g) || []);
+                    try {
+                        if (!this._adoptedSheet) this._adoptedSheet = new CSSStyleSheet();
+                        this._adoptedSheet.replaceSync(authorCss);
+                    } catch (e) {
+                        this._adoptedSheet = null;
+                        this._authorCss = authorCss;
+                    }
+                }
+
+                _syncThumbHostAttrs(host, cs) {
+                    const de = document.documentElement;
+                    for (let i = host.attributes.length - 1; i >= 0; i--) {
+                        const n = host.attributes[i].name;
+                        if ((n.startsWith('data-') || n === 'class' || n === 'lang')
+                            && !de.hasAttribute(n)) {
+                            host.removeAttribute(n);
+                        }
+                    }
+                    for (const a of de.attributes) {
+                        if (a.name.startsWith('data-') || a.name === 'class' || a.name === 'lang') {
+                            host.setAttribute(a.name, a.value);
+                        }
+                    }
+                    const vars = this._authorVars || new Set();
+                    for (let i = host.style.length - 1; i >= 0; i--) {
+                        const p = host.style[i];
+                        if (p.startsWith('--') && !vars.has(p)) host.style.removeProperty(p);
+                    }
+                    const live = cs || getComputedStyle(this);
+                    vars.forEach((p) => {
+                        const v = live.getPropertyValue(p);
+                        if (v) host.style.setProperty(p, v.trim());
+                        else host.style.removeProperty(p);
+                    });
+                }
+
+                disconnectedCallback() {
+                    window.removeEventListener('keydown', this._onKey);
+                    window.removeEventListener('resize', this._onResize);
+                    window.removeEventListener('mousemove', this._onMouseMove);
+                    window.removeEventListener('message', this._onMessage);
+                    window.removeEventListener('click', this._onDocClick, true);
+                    if (this._hideTimer) clearTimeout(this._hideTimer);
+                    if (this._mouseIdleTimer) clearTimeout(this._mouseIdleTimer);
+                    if (this._liveTimer) clearTimeout(this._liveTimer);
+                    if (this._tweakTimer) clearTimeout(this._tweakTimer);
+                    if (this._railAnimTimer) clearTimeout(this._railAnimTimer);
+                    if (this._scaleRaf) cancelAnimationFrame(this._scaleRaf);
+                    if (this._liveObserver) this._liveObserver.disconnect();
+                    if (this._railObserver) this._railObserver.disconnect();
+                    if (this._onTweakChange) window.removeEventListener('tweakchange', this._onTweakChange);
+                }
+
+                attributeChangedCallback() {
+                    if (this._canvas) {
+                        this._canvas.style.width = this.designWidth + 'px';
+                        this._canvas.style.height = this.designHeight + 'px';
+                        this._canvas.style.setProperty('--deck-design-w', this.designWidth + 'px');
+                        this._canvas.style.setProperty('--deck-design-h', this.designHeight + 'px');
+                        if (this._rail) {
+                            this._rail.style.setProperty('--deck-aspect', this.designWidth + '/' + this.designHeight);
+                        }
+                        this._fit();
+                        this._scaleThumbs();
+                        this._syncPrintPageRule();
+                    }
+                }
+
+                _render() {
+                    const style = document.createElement('style');
+                    style.textContent = stylesheet;
+
+                    const stage = document.createElement('div');
+                    stage.className = 'stage';
+
+                    const canvas = document.createElement('div');
+                    canvas.className = 'canvas';
+                    canvas.style.width = this.designWidth + 'px';
+                    canvas.style.height = this.designHeight + 'px';
+                    canvas.style.setProperty('--deck-design-w', this.designWidth + 'px');
+                    canvas.style.setProperty('--deck-design-h', this.designHeight + 'px');
+
+                    const slot = document.createElement('slot');
+                    slot.addEventListener('slotchange', this._onSlotChange);
+                    canvas.appendChild(slot);
+                    stage.appendChild(canvas);
+
+                    const tapzones = document.createElement('div');
+                    tapzones.className = 'tapzones export-hidden';
+                    tapzones.setAttribute('aria-hidden', 'true');
+                    tapzones.setAttribute('data-noncommentable', '');
+                    const tzBack = document.createElement('div');
+                    tzBack.className = 'tapzone tapzone--back';
+                    const tzMid = document.createElement('div');
+                    tzMid.className = 'tapzone tapzone--mid';
+                    tzMid.style.pointerEvents = 'none';
+                    const tzFwd = document.createElement('div');
+                    tzFwd.className = 'tapzone tapzone--fwd';
+                    tzBack.addEventListener('click', this._onTapBack);
+                    tzFwd.addEventListener('click', this._onTapForward);
+                    tapzones.append(tzBack, tzMid, tzFwd);
+
+                    const overlay = document.createElement('div');
+                    overlay.className = 'overlay export-hidden';
+                    overlay.setAttribute('role', 'toolbar');
+                    overlay.setAttribute('aria-label', 'Deck controls');
+                    overlay.setAttribute('data-noncommentable', '');
+                    overlay.innerHTML = `
+        <button class="btn prev" type="button" aria-label="Previous slide" title="Previous (←)">
+          <svg viewBox="0 0 16 16" fill="none" stroke="currentColor" stroke-width="1.8" stroke-linecap="round" stroke-linejoin="round" aria-hidden="true"><path d="M10 3L5 8l5 5"/></svg>
+        </button>
+        <span class="count" aria-live="polite"><span class="current">1</span><span class="sep">/</span><span class="total">1</span></span>
+        <button class="btn next" type="button" aria-label="Next slide" title="Next (→)">
+          <svg viewBox="0 0 16 16" fill="none" stroke="currentColor" stroke-width="1.8" stroke-linecap="round" stroke-linejoin="round" aria-hidden="true"><path d="M6 3l5 5-5 5"/></svg>
+        </button>
+        <span class="divider"></span>
+        <button class="btn reset" type="button" aria-label="Reset to first slide" title="Reset (R)">Reset<span class="kbd">R</span></button>
+      `;
+
+                    overlay.querySelector('.prev').addEventListener('click', () => this._advance(-1, 'click'));
+                    overlay.querySelector('.next').addEventListener('click', () => this._advance(1, 'click'));
+                    overlay.querySelector('.reset').addEventListener('click', () => this._go(0, 'click'));
+
+                    const rail = document.createElement('div');
+                    rail.className = 'rail export-hidden';
+                    rail.setAttribute('data-noncommentable', '');
+                    rail.style.setProperty('--deck-aspect', this.designWidth + '/' + this.designHeight);
+                    rail.addEventListener('dragover', (e) => {
+                        if (this._dragFrom == null) return;
+                        const r = rail.getBoundingClientRect();
+                        const EDGE = 40;
+                        const dt = e.clientY - r.top;
+                        const db = r.bottom - e.clientY;
+                        if (dt < EDGE) rail.scrollTop -= Math.ceil((EDGE - dt) / 3);
+                        else if (db < EDGE) rail.scrollTop += Math.ceil((EDGE - db) / 3);
+                    });
+
+                    const menu = document.createElement('div');
+                    menu.className = 'ctxmenu export-hidden';
+                    menu.setAttribute('data-noncommentable', '');
+                    menu.innerHTML = `
+        <button type="button" data-act="skip">Skip slide</button>
+        <button type="button" data-act="up">Move up</button>
+        <button type="button" data-act="down">Move down</button>
+        <hr>
+        <button type="button" data-act="delete">Delete slide</button>
+      `;
+                    menu.addEventListener('click', (e) => {
+                        const act = e.target && e.target.getAttribute && e.target.getAttribute('data-act');
+                        if (!act) return;
+                        const i = this._menuIndex;
+                        this._closeMenu();
+                        if (act === 'skip') this._toggleSkip(i);
+                        else if (act === 'up') this._moveSlide(i, i - 1);
+                        else if (act === 'down') this._moveSlide(i, i + 1);
+                        else if (act === 'delete') this._openConfirm(i);
+                    });
+                    menu.addEventListener('contextmenu', (e) => e.preventDefault());
+
+                    const resize = document.createElement('div');
+                    resize.className = 'rail-resize export-hidden';
+                    resize.setAttribute('data-noncommentable', '');
+                    resize.addEventListener('pointerdown', (e) => {
+                        e.preventDefault();
+                        resize.setPointerCapture(e.pointerId);
+                        resize.setAttribute('data-dragging', '');
+                        const move = (ev) => this._setRailWidth(ev.clientX);
+                        const up = () => {
+                            resize.removeEventListener('pointermove', move);
+                            resize.removeEventListener('pointerup', up);
+                            resize.removeEventListener('pointercancel', up);
+                            resize.removeAttribute('data-dragging');
+                            try { localStorage.setItem('deck-stage.railWidth', String(this._railPx)); } catch (err) { }
+                        };
+                        resize.addEventListener('pointermove', move);
+                        resize.addEventListener('pointerup', up);
+                        resize.addEventListener('pointercancel', up);
+                    });
+
+                    const confirm = document.createElement('div');
+                    confirm.className = 'confirm-backdrop export-hidden';
+                    confirm.setAttribute('data-noncommentable', '');
+                    confirm.innerHTML = `
+        <div class="confirm" role="dialog" aria-modal="true">
+          <div class="body">
+            <div class="title">Delete slide?</div>
+            <div class="msg">This slide will be removed from the deck.</div>
+          </div>
+          <div class="footer">
+            <button type="button" class="cancel">Cancel</button>
+            <button type="button" class="danger">Delete</button>
+          </div>
+        </div>
+      `;
+                    confirm.addEventListener('click', (e) => {
+                        if (e.target === confirm) this._closeConfirm();
+                    });
+                    confirm.querySelector('.cancel').addEventListener('click', () => this._closeConfirm());
+                    confirm.querySelector('.danger').addEventListener('click', () => {
+                        const i = this._confirmIndex;
+                        this._closeConfirm();
+                        this._deleteSlide(i);
+                    });
+
+                    this._root.append(style, rail, resize, stage, tapzones, overlay, menu, confirm);
+                    this._canvas = canvas;
+                    this._slot = slot;
+                    this._overlay = overlay;
+                    this._tapzones = tapzones;
+                    this._rail = rail;
+                    this._resize = resize;
+                    this._menu = menu;
+                    this._confirm = confirm;
+                    this._countEl = overlay.querySelector('.current');
+                    this._totalEl = overlay.querySelector('.total');
+
+                    let rw = 188;
+                    try {
+                        const s = localStorage.getItem('deck-stage.railWidth');
+                        if (s) rw = parseInt(s, 10) || rw;
+                    } catch (err) { }
+                    this._setRailWidth(rw);
+                    this._syncRailHidden();
+                }
+
+                _setRailWidth(px) {
+                    const w = Math.max(120, Math.min(360, Math.round(px)));
+                    this._railPx = w;
+                    this.style.setProperty('--deck-rail-w', w + 'px');
+                    this._fit();
+                    if (!this._scaleRaf) {
+                        this._scaleRaf = requestAnimationFrame(() => {
+                            this._scaleRaf = null;
+                            this._scaleThumbs();
+                        });
+                    }
+                }
+
+                _syncPrintPageRule() {
+                    const id = 'deck-stage-print-page';
+                    let tag = document.getElementById(id);
+                    if (!tag) {
+                        tag = document.createElement('style');
+                        tag.id = id;
+                        document.head.appendChild(tag);
+                    }
+                    tag.textContent =
+                        '@page { size: ' + this.designWidth + 'px ' + this.designHeight + 'px; margin: 0; } ' +
+                        '@media print { html, body { margin: 0 !important; padding: 0 !important; background: none !important; overflow: visible !important; height: auto !important; } ' +
+                        '* { -webkit-print-color-adjust: exact; print-color-adjust: exact; } }';
+                }
+
+                _onSlotChange() {
+                    if (this._squelchSlotChange) { this._squelchSlotChange = false; return; }
+                    this._collectSlides();
+                    this._restoreIndex();
+                    this._applyIndex({ showOverlay: false, broadcast: true, reason: 'init' });
+                    this._fit();
+                }
+
+                _collectSlides() {
+                    const assigned = this._slot.assignedElements({ flatten: true });
+                    this._slides = assigned.filter((el) => {
+                        const tag = el.tagName;
+                        return tag !== 'TEMPLATE' && tag !== 'SCRIPT' && tag !== 'STYLE';
+                    });
+                    this._slideSet = new Set(this._slides);
+
+                    this._slides.forEach((slide, i) => {
+                        const n = i + 1;
+                        let label = slide.getAttribute('data-label');
+                        if (!label) {
+                            const existing = slide.getAttribute('data-screen-label');
+                            if (existing) {
+                                label = existing.replace(/^\s*\d+\s*/, '').trim() || existing;
+                            }
+                        }
+                        if (!label) {
+                            const h = slide.querySelector('h1, h2, h3, [data-title]');
+                            if (h) label = (h.textContent || '').trim().slice(0, 40);
+                        }
+                        if (!label) label = 'Slide';
+                        slide.setAttribute('data-screen-label', `${pad2(n)} ${label}`);
+
+                        if (!slide.hasAttribute('data-om-validate')) {
+                            slide.setAttribute('data-om-validate', VALIDATE_ATTR);
+                        }
+
+                        slide.setAttribute('data-deck-slide', String(i));
+                    });
+
+                    if (this._totalEl) this._totalEl.textContent = String(this._slides.length || 1);
+                    if (this._index >= this._slides.length) this._index = Math.max(0, this._slides.length - 1);
+                    this._markLastVisible();
+                    this._renderRail();
+                }
+
+                _markLastVisible() {
+                    let last = null;
+                    this._slides.forEach((s) => {
+                        s.removeAttribute('data-deck-last-visible');
+                        if (!s.hasAttribute('data-deck-skip')) last = s;
+                    });
+                    if (last) last.setAttribute('data-deck-last-visible', '');
+                }
+
+                _loadNotes() {
+                    const tag = document.getElementById('speaker-notes');
+                    if (!tag) { this._notes = []; return; }
+                    try {
+                        const parsed = JSON.parse(tag.textContent || '[]');
+                        if (Array.isArray(parsed)) this._notes = parsed;
+                    } catch (e) {
+                        console.warn('[deck-stage] Failed to parse #speaker-notes JSON:', e);
+                        this._notes = [];
+                    }
+                }
+
+                _restoreIndex() {
+                    const h = (location.hash || '').match(/^#(\d+)$/);
+                    if (h) {
+                        const n = parseInt(h[1], 10) - 1;
+                        if (n >= 0 && n < this._slides.length) this._index = n;
+                    }
+                }
+
+                _applyIndex({ showOverlay = true, broadcast = true, reason = 'init' } = {}) {
+                    if (!this._slides.length) return;
+                    const prev = this._prevIndex == null ? -1 : this._prevIndex;
+                    const curr = this._index;
+                    try { history.replaceState(null, '', '#' + (curr + 1)); } catch (e) { }
+                    this._slides.forEach((s, i) => {
+                        if (i === curr) s.setAttribute('data-deck-active', '');
+                        else s.removeAttribute('data-deck-active');
+                    });
+                    if (this._countEl) this._countEl.textContent = String(curr + 1);
+                    this._syncRail(reason !== 'mutation');
+
+                    if (broadcast) {
+                        try { window.postMessage({ slideIndexChanged: curr, deckTotal: this._slides.length, deckSkipped: this._skippedIndices() }, '*'); } catch (e) { }
+
+                        const detail = {
+                            index: curr,
+                            previousIndex: prev,
+                            total: this._slides.length,
+                            slide: this._slides[curr] || null,
+                            previousSlide: prev >= 0 ? (this._slides[prev] || null) : null,
+                            reason: reason,
+                        };
+                        this.dispatchEvent(new CustomEvent('slidechange', {
+                            detail,
+                            bubbles: true,
+                            composed: true,
+                        }));
+                    }
+
+                    this._prevIndex = curr;
+                    if (showOverlay) this._flashOverlay();
+                }
+
+                _flashOverlay() {
+                    if (!this._overlay || this._presenting) return;
+                    this._overlay.setAttribute('data-visible', '');
+                    if (this._hideTimer) clearTimeout(this._hideTimer);
+                    this._hideTimer = setTimeout(() => {
+                        this._overlay.removeAttribute('data-visible');
+                    }, OVERLAY_HIDE_MS);
+                }
+
+                _railWidth() {
+                    if (!this._railEnabled || !this._railVisible || this.hasAttribute('no-rail')
+                        || this.hasAttribute('noscale') || this._presenting) return 0;
+                    return this._railPx || 0;
+                }
+
+                _fit() {
+                    if (!this._canvas) return;
+                    const stage = this._canvas.parentElement;
+                    if (this.hasAttribute('noscale')) {
+                        this._canvas.style.transform = 'none';
+                        if (stage) stage.style.left = '0';
+                        if (this._overlay) this._overlay.style.marginLeft = '0';
+                        if (this._tapzones) this._tapzones.style.left = '0';
+                        return;
+                    }
+                    const rw = this._railWidth();
+                    if (stage) stage.style.left = rw + 'px';
+                    if (this._overlay) this._overlay.style.marginLeft = (rw / 2) + 'px';
+                    if (this._tapzones) this._tapzones.style.left = rw + 'px';
+                    const vw = window.innerWidth - rw;
+                    const vh = window.innerHeight;
+                    const s = Math.min(vw / this.designWidth, vh / this.designHeight);
+                    this._canvas.style.transform = `scale(${s})`;
+                }
+
+                _onResize() { this._fit(); }
+
+                _onMouseMove() {
+                    this._flashOverlay();
+                }
+
+                _onMessage(e) {
+                    const d = e.data;
+                    if (d && typeof d.__omelette_presenting === 'boolean') {
+                        this._presenting = d.__omelette_presenting;
+                        if (this._presenting && this._overlay) {
+                            this._overlay.removeAttribute('data-visible');
+                            if (this._hideTimer) clearTimeout(this._hideTimer);
+                        }
+                        this._syncRailHidden();
+                        this._closeMenu();
+                        this._closeConfirm();
+                        this._fit();
+                        this._scaleThumbs();
+                    }
+                    if (d && d.type === '__deck_rail_visible' && typeof d.on === 'boolean') {
+                        if (d.on === this._railVisible) return;
+                        this._railVisible = d.on;
+                        try { localStorage.setItem('deck-stage.railVisible', d.on ? '1' : '0'); } catch (e) { }
+                        this.setAttribute('data-rail-anim', '');
+                        void (this._rail && this._rail.offsetHeight);
+                        this._syncRailHidden();
+                        this._fit();
+                        this._scaleThumbs();
+                        clearTimeout(this._railAnimTimer);
+                        this._railAnimTimer = setTimeout(() => this.removeAttribute('data-rail-anim'), 220);
+                    }
+                    if (d && d.type === '__omelette_rail_enabled') this._enableRail();
+                }
+
+                _syncRailHidden() {
+                    if (!this._rail) return;
+                    const hard = !this._railEnabled || this._presenting;
+                    if (hard) this._rail.setAttribute('data-presenting', '');
+                    else this._rail.removeAttribute('data-presenting');
+                    if (!this._railVisible) this._rail.setAttribute('data-user-hidden', '');
+                    else this._rail.removeAttribute('data-user-hidden');
+                    this._rail.inert = hard || !this._railVisible;
+                }
+
+                _onTapBack(e) {
+                    e.preventDefault();
+                    this._advance(-1, 'tap');
+                }
+
+                _onTapForward(e) {
+                    e.preventDefault();
+                    this._advance(1, 'tap');
+                }
+
+                _onKey(e) {
+                    const t = e.target;
+                    if (t && (t.isContentEditable || /^(INPUT|TEXTAREA|SELECT)$/.test(t.tagName))) return;
+                    if (this._confirm && this._confirm.hasAttribute('data-open')) {
+                        if (e.key === 'Escape') { this._closeConfirm(); e.preventDefault(); }
+                        return;
+                    }
+                    if (e.key === 'Escape' && this._menu && this._menu.hasAttribute('data-open')) {
+                        this._closeMenu();
+                        e.preventDefault();
+                        return;
+                    }
+                    if (e.metaKey || e.ctrlKey || e.altKey) return;
+
+                    const key = e.key;
+                    let handled = true;
+
+                    if (key === 'ArrowRight' || key === 'ArrowDown' || key === 'PageDown' || key === ' ' || key === 'Spacebar') {
+                        this._advance(1, 'keyboard');
+                    } else if (key === 'ArrowLeft' || key === 'ArrowUp' || key === 'PageUp') {
+                        this._advance(-1, 'keyboard');
+                    } else if (key === 'Home') {
+                        this._go(0, 'keyboard');
+                    } else if (key === 'End') {
+                        this._go(this._slides.length - 1, 'keyboard');
+                    } else if (key === 'r' || key === 'R') {
+                        this._go(0, 'keyboard');
+                    } else if (/^[0-9]$/.test(key)) {
+                        const n = key === '0' ? 9 : parseInt(key, 10) - 1;
+                        if (n < this._slides.length) this._go(n, 'keyboard');
+                    } else {
+                        handled = false;
+                    }
+
+                    if (handled) {
+                        e.preventDefault();
+                        this._flashOverlay();
+                    }
+                }
+
+                _go(i, reason = 'api') {
+                    if (!this._slides.length) return;
+                    const clamped = Math.max(0, Math.min(this._slides.length - 1, i));
+                    if (clamped === this._index) {
+                        this._flashOverlay();
+                        return;
+                    }
+                    this._index = clamped;
+                    this._applyIndex({ showOverlay: true, broadcast: true, reason });
+                }
+
+                _advance(dir, reason) {
+                    if (!this._slides.length) return;
+                    let i = this._index + dir;
+                    while (i >= 0 && i < this._slides.length && this._slides[i].hasAttribute('data-deck-skip')) {
+                        i += dir;
+                    }
+                    if (i < 0 || i >= this._slides.length) { this._flashOverlay(); return; }
+                    this._go(i, reason);
+                }
+
+                _renderRail() {
+                    if (!this._rail || !this._railEnabled) { this._thumbs = []; return; }
+                    const prevTops = new Map();
+                    (this._thumbs || []).forEach(({ thumb, slide, host }) => {
+                        if (host) prevTops.set(slide, thumb.getBoundingClientRect().top);
+                    });
+                    const st = this._rail.scrollTop;
+
+                    const bySlide = new Map();
+                    (this._thumbs || []).forEach((t) => bySlide.set(t.slide, t));
+                    const next = [];
+                    this._slides.forEach((slide) => {
+                        let t = bySlide.get(slide);
+                        if (t) bySlide.delete(slide);
+                        else t = this._makeThumb(slide);
+                        next.push(t);
+                    });
+                    bySlide.forEach((t) => {
+                        if (this._railObserver) this._railObserver.unobserve(t.frame);
+                        t.thumb.remove();
+                    });
+                    next.forEach((t, i) => {
+                        const want = t.thumb;
+                        const at = this._rail.children[i];
+                        if (at !== want) this._rail.insertBefore(want, at || null);
+                        t.i = i;
+                        t.num.textContent = String(i + 1);
+                        if (t.slide.hasAttribute('data-deck-skip')) t.thumb.setAttribute('data-skip', '');
+                        else t.thumb.removeAttribute('data-skip');
+                    });
+                    this._thumbs = next;
+
+                    this._rail.scrollTop = st;
+                    if (prevTops.size) {
+                        const moved = [];
+                        this._thumbs.forEach(({ thumb, slide }) => {
+                            const old = prevTops.get(slide);
+                            if (old == null) return;
+                            const dy = old - thumb.getBoundingClientRect().top;
+                            if (Math.abs(dy) < 1) return;
+                            thumb.style.transition = 'none';
+                            thumb.style.transform = `translateY(${dy}px)`;
+                            moved.push(thumb);
+                        });
+                        if (moved.length) {
+                            void this._rail.offsetHeight;
+                            moved.forEach((t) => {
+                                t.style.transition = 'transform 180ms cubic-bezier(.2,.7,.3,1)';
+                                t.style.transform = '';
+                            });
+                            setTimeout(() => moved.forEach((t) => { t.style.transition = ''; }), 220);
+                        }
+                    }
+                    requestAnimationFrame(() => this._scaleThumbs());
+                    this._syncRail(false);
+                }
+
+                _makeThumb(slide) {
+                    const thumb = document.createElement('div');
+                    thumb.className = 'thumb';
+                    thumb.tabIndex = 0;
+                    const num = document.createElement('div');
+                    num.className = 'num';
+                    const frame = document.createElement('div');
+                    frame.className = 'frame';
+                    thumb.append(num, frame);
+
+                    const entry = { thumb, num, frame, slide, clone: null, host: null, i: -1 };
+                    const idx = () => entry.i;
+
+                    thumb.addEventListener('click', () => this._go(idx(), 'click'));
+                    thumb.addEventListener('keydown', (e) => {
+                        if (e.key !== 'ArrowUp' && e.key !== 'ArrowDown') return;
+                        if (e.metaKey || e.ctrlKey || e.altKey) return;
+                        e.preventDefault();
+                        e.stopPropagation();
+                        this._go(idx() + (e.key === 'ArrowDown' ? 1 : -1), 'keyboard');
+                        const cur = this._thumbs && this._thumbs[this._index];
+                        if (cur) cur.thumb.focus({ preventScroll: true });
+                    });
+                    thumb.addEventListener('contextmenu', (e) => {
+                        e.preventDefault();
+                        this._openMenu(idx(), e.clientX, e.clientY);
+                    });
+                    thumb.draggable = true;
+                    thumb.addEventListener('dragstart', (e) => {
+                        this._dragFrom = idx();
+                        thumb.setAttribute('data-dragging', '');
+                        e.dataTransfer.effectAllowed = 'move';
+                        try { e.dataTransfer.setData('text/plain', String(this._dragFrom)); } catch (err) { }
+                    });
+                    thumb.addEventListener('dragend', () => {
+                        thumb.removeAttribute('data-dragging');
+                        this._clearDrop();
+                        this._dragFrom = null;
+                    });
+                    thumb.addEventListener('dragover', (e) => {
+                        if (this._dragFrom == null) return;
+                        e.preventDefault();
+                        e.dataTransfer.dropEffect = 'move';
+                        const r = thumb.getBoundingClientRect();
+                        this._setDrop(idx(), e.clientY < r.top + r.height / 2 ? 'before' : 'after');
+                    });
+                    thumb.addEventListener('drop', (e) => {
+                        if (this._dragFrom == null) return;
+                        e.preventDefault();
+                        const i = idx();
+                        const r = thumb.getBoundingClientRect();
+                        let to = e.clientY >= r.top + r.height / 2 ? i + 1 : i;
+                        if (this._dragFrom < to) to--;
+                        const from = this._dragFrom;
+                        this._clearDrop();
+                        this._dragFrom = null;
+                        if (to !== from) this._moveSlide(from, to);
+                    });
+
+                    if (this._railObserver) this._railObserver.observe(frame);
+                    frame.__deckThumb = entry;
+                    return entry;
+                }
+
+                _materialize(entry) {
+                    if (entry.host) return;
+                    const dw = this.designWidth, dh = this.designHeight;
+                    let clone = entry.slide.cloneNode(true);
+                    clone.removeAttribute('id');
+                    clone.removeAttribute('data-deck-active');
+                    clone.querySelectorAll('[id]').forEach((el) => el.removeAttribute('id'));
+                    clone.querySelectorAll('iframe, audio, object, embed').forEach((el) => {
+                        el.removeAttribute('src');
+                        el.removeAttribute('srcdoc');
+                        el.removeAttribute('data');
+                        el.innerHTML = '';
+                    });
+                    clone.querySelectorAll('video').forEach((el) => {
+                        if (!el.poster) { el.removeAttribute('src'); el.innerHTML = ''; return; }
+                        const img = document.createElement('img');
+                        img.src = el.poster;
+                        img.alt = '';
+                        img.style.cssText = el.style.cssText + ';object-fit:cover;width:100%;height:100%;';
+                        img.className = el.className;
+                        el.replaceWith(img);
+                    });
+                    clone.querySelectorAll('img').forEach((el) => {
+                        el.loading = 'lazy';
+                        el.decoding = 'async';
+                        if (el.srcset) el.sizes = (this._railPx || 188) + 'px';
+                    });
+                    const neuter = (el) => {
+                        const box = document.createElement('div');
+                        box.style.cssText = (el.getAttribute('style') || '') +
+                            ';background:rgba(0,0,0,0.06);border:1px dashed rgba(0,0,0,0.15);';
+                        box.className = el.className;
+                        for (const a of el.attributes) {
+                            const n = a.name;
+                            if (n.startsWith('data-') || n.startsWith('aria-') ||
+                                n === 'lang' || n === 'dir' || n === 'role' || n === 'title') {
+                                box.setAttribute(n, a.value);
+                            }
+                        }
+                        while (el.firstChild) box.appendChild(el.firstChild);
+                        return box;
+                    };
+                    // <image-slot> is a custom element whose visible content is an <img>
+                    // in its shadow DOM. The generic neuter below would blank it, so
+                    // thumbnails would lose every image. Convert each slot to a plain
+                    // <img> using the *live* slot's currently displayed source (which
+                    // reflects the server src or any dropped/reframed image). Clone tree
+                    // order matches the original, so we pair them up by index.
+                    const _origSlots = entry.slide.querySelectorAll('image-slot');
+                    clone.querySelectorAll('image-slot').forEach((cEl, i) => {
+                        const orig = _origSlots[i];
+                        let src = '';
+                        try {
+                            const oimg = orig && orig.shadowRoot &&
+                                orig.shadowRoot.querySelector('.frame img');
+                            if (oimg && oimg.style.display !== 'none') {
+                                src = oimg.currentSrc || oimg.src || '';
+                            }
+                        } catch (e) { /* ignore cross-realm/shadow access issues */ }
+                        if (!src) src = cEl.getAttribute('src') || '';
+                        if (!src) return; // no image -> let neuter draw a placeholder box
+                        const img = document.createElement('img');
+                        img.src = src;
+                        img.alt = '';
+                        img.loading = 'lazy';
+                        img.decoding = 'async';
+                        // Match the slot's real framing: default fit is 'cover' (fills +
+                        // crops), not 'contain'. Honor its fit/position attrs, then let the
+                        // slot's own inline style (box size, explicit object-fit) win.
+                        const _fit = cEl.getAttribute('fit') || 'cover';
+                        const _pos = cEl.getAttribute('position') || '50% 50%';
+                        img.style.cssText = 'display:block;object-fit:' + _fit +
+                            ';object-position:' + _pos + ';' + (cEl.getAttribute('style') || '');
+                        cEl.replaceWith(img);
+                    });
+                    if (clone.tagName.includes('-')) clone = neuter(clone);
+                    clone.querySelectorAll('*').forEach((el) => {
+                        if (el.tagName.includes('-')) el.replaceWith(neuter(el));
+                    });
+                    clone.style.cssText += ';position:absolute;top:0;left:0;transform-origin:0 0;' +
+                        'pointer-events:none;width:' + dw + 'px;height:' + dh + 'px;' +
+                        'box-sizing:border-box;overflow:hidden;visibility:visible;opacity:1;';
+                    const host = document.createElement('div');
+                    host.style.cssText = 'position:absolute;inset:0;';
+                    this._syncThumbHostAttrs(host);
+                    const sr = host.attachShadow({ mode: 'open' });
+                    if (this._adoptedSheet) sr.adoptedStyleSheets = [this._adoptedSheet];
+                    else {
+                        const st = document.createElement('style');
+                        st.textContent = this._authorCss || '';
+                        sr.appendChild(st);
+                    }
+                    sr.appendChild(clone);
+                    entry.frame.appendChild(host);
+                    entry.host = host;
+                    entry.clone = clone;
+                    if (this._thumbScale) clone.style.transform = 'scale(' + this._thumbScale + ')';
+                    if (this._railObserver) this._railObserver.unobserve(entry.frame);
+                }
+
+                _refreshThumb(slide) {
+                    const entry = (this._thumbs || []).find((t) => t.slide === slide);
+                    if (!entry || !entry.host) return;
+                    entry.host.remove();
+                    entry.host = entry.clone = null;
+                    this._materialize(entry);
+                }
+
+                _scaleThumbs() {
+                    if (!this._thumbs || !this._thumbs.length) return;
+                    const fw = this._thumbs[0].frame.offsetWidth;
+                    if (!fw) return;
+                    this._thumbScale = fw / this.designWidth;
+                    this._thumbs.forEach(({ clone }) => {
+                        if (clone) clone.style.transform = 'scale(' + this._thumbScale + ')';
+                    });
+                }
+
+                _setDrop(i, where) {
+                    const t = this._thumbs && this._thumbs[i];
+                    if (this._dropOn && this._dropOn !== t) {
+                        this._dropOn.thumb.removeAttribute('data-drop');
+                    }
+                    if (t) t.thumb.setAttribute('data-drop', where);
+                    this._dropOn = t || null;
+                }
+
+                _clearDrop() {
+                    if (this._dropOn) this._dropOn.thumb.removeAttribute('data-drop');
+                    this._dropOn = null;
+                }
+
+                _syncRail(follow) {
+                    if (!this._thumbs) return;
+                    this._thumbs.forEach(({ thumb }, i) => {
+                        if (i === this._index) {
+                            thumb.setAttribute('data-current', '');
+                            if (follow && typeof thumb.scrollIntoView === 'function') {
+                                thumb.scrollIntoView({ block: 'nearest' });
+                            }
+                        } else {
+                            thumb.removeAttribute('data-current');
+                        }
+                    });
+                }
+
+                _openMenu(i, x, y) {
+                    if (!this._menu) return;
+                    this._menuIndex = i;
+                    const slide = this._slides[i];
+                    const skip = slide && slide.hasAttribute('data-deck-skip');
+                    this._menu.querySelector('[data-act="skip"]').textContent = skip ? 'Unskip slide' : 'Skip slide';
+                    this._menu.querySelector('[data-act="up"]').disabled = i <= 0;
+                    this._menu.querySelector('[data-act="down"]').disabled = i >= this._slides.length - 1;
+                    this._menu.querySelector('[data-act="delete"]').disabled = this._slides.length <= 1;
+                    this._menu.style.left = x + 'px';
+                    this._menu.style.top = y + 'px';
+                    this._menu.setAttribute('data-open', '');
+                    const r = this._menu.getBoundingClientRect();
+                    const nx = Math.min(x, window.innerWidth - r.width - 4);
+                    const ny = Math.min(y, window.innerHeight - r.height - 4);
+                    this._menu.style.left = Math.max(4, nx) + 'px';
+                    this._menu.style.top = Math.max(4, ny) + 'px';
+                }
+
+                _closeMenu() {
+                    if (this._menu) this._menu.removeAttribute('data-open');
+                    this._menuIndex = -1;
+                }
+
+                _openConfirm(i) {
+                    if (!this._confirm) return;
+                    this._confirmIndex = i;
+                    this._confirm.querySelector('.title').textContent = 'Delete slide ' + (i + 1) + '?';
+                    this._confirm.setAttribute('data-open', '');
+                    const btn = this._confirm.querySelector('.danger');
+                    if (btn && btn.focus) btn.focus();
+                }
+
+                _closeConfirm() {
+                    if (this._confirm) this._confirm.removeAttribute('data-open');
+                    this._confirmIndex = -1;
+                }
+
+                _emitDeckChange(detail) {
+                    this.dispatchEvent(new CustomEvent('deckchange', {
+                        detail, bubbles: true, composed: true,
+                    }));
+                }
+
+                _deleteSlide(i) {
+                    const slide = this._slides[i];
+                    if (!slide || this._slides.length <= 1) return;
+                    const wasCurrent = i === this._index;
+                    if (i < this._index || (wasCurrent && i === this._slides.length - 1)) this._index--;
+                    this._squelchSlotChange = true;
+                    slide.remove();
+                    this._emitDeckChange({ action: 'delete', from: i, slide });
+                    this._collectSlides();
+                    this._applyIndex({ showOverlay: true, broadcast: true, reason: 'mutation' });
+                }
+
+                _toggleSkip(i) {
+                    const slide = this._slides[i];
+                    if (!slide) return;
+                    const on = !slide.hasAttribute('data-deck-skip');
+                    if (on) slide.setAttribute('data-deck-skip', '');
+                    else slide.removeAttribute('data-deck-skip');
+                    if (this._thumbs && this._thumbs[i]) {
+                        if (on) this._thumbs[i].thumb.setAttribute('data-skip', '');
+                        else this._thumbs[i].thumb.removeAttribute('data-skip');
+                    }
+                    this._markLastVisible();
+                    this._emitDeckChange({ action: on ? 'skip' : 'unskip', from: i, slide });
+                    try { window.postMessage({ slideIndexChanged: this._index, deckTotal: this._slides.length, deckSkipped: this._skippedIndices() }, '*'); } catch (e) { }
+                }
+
+                _skippedIndices() {
+                    const out = [];
+                    for (let i = 0; i < this._slides.length; i++) {
+                        if (this._slides[i].hasAttribute('data-deck-skip')) out.push(i);
+                    }
+                    return out;
+                }
+
+                _moveSlide(i, j) {
+                    if (j < 0 || j >= this._slides.length || j === i) return;
+                    const slide = this._slides[i];
+                    const ref = j < i ? this._slides[j] : this._slides[j].nextSibling;
+                    const cur = this._index;
+                    if (cur === i) this._index = j;
+                    else if (i < cur && j >= cur) this._index = cur - 1;
+                    else if (i > cur && j <= cur) this._index = cur + 1;
+                    this._squelchSlotChange = true;
+                    this.insertBefore(slide, ref);
+                    this._emitDeckChange({ action: 'move', from: i, to: j, slide });
+                    this._collectSlides();
+                    this._applyIndex({ showOverlay: false, broadcast: true, reason: 'mutation' });
+                }
+
+                get index() { return this._index; }
+                get length() { return this._slides.length; }
+                goTo(i) { this._go(i, 'api'); }
+                next() { this._advance(1, 'api'); }
+                prev() { this._advance(-1, 'api'); }
+                reset() { this._go(0, 'api'); }
+            }
+
+            if (!customElements.get('deck-stage')) {
+                customElements.define('deck-stage', DeckStage);
+            }
+        })();
@@ -0,0 +1,172 @@
+// Small unobtrusive editor: floating Save button for contenteditable regions.
+        (function () {
+            function getCookie(name) {
+                const v = document.cookie.match('(^|;)\\s*' + name + '\\s*=\\s*([^;]+)');
+                return v ? v.pop() : '';
+            }
+
+            // Inject styles for the floating editor button (pill + spinner + hover).
+            const editorStyle = document.createElement('style');
+            editorStyle.textContent =
+                '@keyframes vh-spin{to{transform:rotate(360deg)}}' +
+                '.vh-save-btn{display:none;align-items:center;gap:5px;position:absolute;z-index:2147483600;' +
+                'padding:4px 9px;border:none;border-radius:999px;cursor:pointer;color:#fff;' +
+                "font:600 10px/1 system-ui,-apple-system,'Segoe UI',sans-serif;letter-spacing:.01em;white-space:nowrap;" +
+                'box-shadow:0 4px 12px rgba(0,0,0,.22);transition:background .15s ease,transform .1s ease,opacity .15s ease;}' +
+                '.vh-save-btn:hover:not(:disabled){transform:translateY(-1px);filter:brightness(1.06);}' +
+                '.vh-save-btn:active:not(:disabled){transform:translateY(0);}' +
+                '.vh-save-btn:disabled{cursor:default;}' +
+                '.vh-save-btn svg{display:block;flex-shrink:0;}';
+            document.head.appendChild(editorStyle);
+
+            const ICONS = {
+                save: '<svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="M19 21H5a2 2 0 0 1-2-2V5a2 2 0 0 1 2-2h11l5 5v11a2 2 0 0 1-2 2z"/><path d="M17 21v-8H7v8"/><path d="M7 3v5h8"/></svg>',
+                spin: '<svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.4" stroke-linecap="round" style="animation:vh-spin .7s linear infinite"><path d="M21 12a9 9 0 1 1-6.219-8.56"/></svg>',
+                check: '<svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.6" stroke-linecap="round" stroke-linejoin="round"><path d="M20 6 9 17l-5-5"/></svg>',
+                error: '<svg width="12" height="12" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.6" stroke-linecap="round"><path d="M18 6 6 18M6 6l12 12"/></svg>'
+            };
+
+            function createSaveButton() {
+                const btn = document.createElement('button');
+                btn.type = 'button';
+                btn.className = 'vh-save-btn';
+                btn.setAttribute('aria-label', 'Enregistrer les modifications');
+                document.body.appendChild(btn);
+                return btn;
+            }
+
+            const saveBtn = createSaveButton();
+            let currentEl = null;
+            let originalHTML = '';
+            const apiBase = window.__VOLT_API_BASE__ || '';
+            // Version (ETag) of the deck this page shows, embedded by the server
+            // when it wrote the deck. Every save sends it as If-Match, so a save
+            // made on a copy someone else has changed since is refused (409)
+            // instead of silently overwriting their edit.
+            let deckVersion = window.__VOLT_DECK_VERSION__ || null;
+
+            function editTarget() {
+                const rawPath = decodeURIComponent((window.location.pathname || '').replace(/^\/+/, ''));
+                // Prefer the exact target the server embedded into this generated deck;
+                // fall back to deriving it from the URL (template preview / local dev).
+                return window.__VOLT_EDIT_TARGET__
+                    || (rawPath.startsWith('media/')
+                        ? rawPath.slice('media/'.length).replace(/\\/g, '/')
+                        : 'templates/volt-electricity.html');
+            }
+
+            // Disable the browser's native spellcheck (red squiggles) on the
+            // editable fields — the content is French and shouldn't be flagged.
+            document.querySelectorAll('[contenteditable="true"]').forEach(function (el) {
+                el.setAttribute('spellcheck', 'false');
+            });
+
+            function setState(state) {
+                const map = {
+                    idle:   { icon: ICONS.save,  label: 'Enregistrer',     bg: '#c96442', dis: true,  op: '.55' },
+                    dirty:  { icon: ICONS.save,  label: 'Enregistrer',     bg: '#c96442', dis: false, op: '1' },
+                    saving: { icon: ICONS.spin,  label: 'Enregistrement…', bg: '#a94f31', dis: true,  op: '1' },
+                    saved:  { icon: ICONS.check, label: 'Enregistré',      bg: '#1f8a5b', dis: true,  op: '1' },
+                    error:  { icon: ICONS.error, label: 'Erreur',          bg: '#c0392b', dis: true,  op: '1' },
+                    conflict: { icon: ICONS.error, label: 'Modifié ailleurs — rechargez', bg: '#c0392b', dis: true, op: '1' }
+                };
+                const s = map[state] || map.idle;
+                saveBtn.innerHTML = s.icon + '<span>' + s.label + '</span>';
+                saveBtn.style.background = s.bg;
+                saveBtn.style.opacity = s.op;
+                saveBtn.disabled = s.dis;
+            }
+
+            function positionBtnFor(el) {
+                const r = el.getBoundingClientRect();
+                const bw = saveBtn.offsetWidth || 110;
+                // Sit just below the box, right-aligned, so it's clear of the text.
+                const top = window.scrollY + r.bottom + 5;
+                const left = Math.max(8, window.scrollX + r.right - bw);
+                saveBtn.style.top = top + 'px';
+                saveBtn.style.left = left + 'px';
+            }
+
+            function showFor(el) {
+                currentEl = el;
+                originalHTML = el.innerHTML;
+                setState('idle');
+                saveBtn.style.display = 'inline-flex';
+                positionBtnFor(el);
+            }
+
+            function hideBtn() {
+                saveBtn.style.display = 'none';
+                currentEl = null;
+            }
+
+            document.addEventListener('focusin', (e) => {
+                const el = e.target;
+                if (el && el.isContentEditable) {
+                    showFor(el);
+                }
+            });
+
+            document.addEventListener('click', (e) => {
+                if (!currentEl) return;
+                if (e.target === saveBtn || saveBtn.contains(e.target)) return;
+                if (currentEl && !currentEl.contains(e.target) && !e.target.isContentEditable) {
+                    hideBtn();
+                }
+            }, true);
+
+            document.addEventListener('input', (e) => {
+                if (!currentEl) return;
+                if (e.target === currentEl || currentEl.contains(e.target)) {
+                    const changed = currentEl.innerHTML !== originalHTML;
+                    setState(changed ? 'dirty' : 'idle');
+                    positionBtnFor(currentEl);
+                }
+            });
+
+            window.addEventListener('resize', () => {
+                if (currentEl) positionBtnFor(currentEl);
+            });
+
+            saveBtn.addEventListener('click', () => {
+                if (!currentEl) return;
+                const payload = {
+                    path: editTarget(),
+                    key: currentEl.getAttribute('data-edit-key') || null,
+                    html: currentEl.outerHTML,
+                };
+                setState('saving');
+                positionBtnFor(currentEl);
+                const headers = {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': getCookie('csrftoken'),
+                };
+                if (deckVersion) headers['If-Match'] = deckVersion;
+                let conflict = false;
+                fetch(apiBase + '/editor/save-file/', {
+                    method: 'POST',
+                    headers: headers,
+                    body: JSON.stringify(payload),
+                    credentials: 'same-origin',
+                }).then((r) => {
+                    conflict = r.status === 409;
+                    if (!r.ok) throw new Error(conflict ? 'Conflict' : 'Network');
+                    return r.json().catch(() => ({}));
+                }).then((json) => {
+                    const ok = json && (json.ok === true || json.status === 'ok');
+                    if (json && json.version) deckVersion = json.version;
+                    setState(ok ? 'saved' : 'error');
+                    if (ok) {
+                        originalHTML = currentEl.innerHTML;
+                        // A saved field is no longer showing a default — fade out its "défaut" tag.
+                        var _k = currentEl.getAttribute('data-edit-key');
+                        if (_k) document.querySelectorAll('.deftag[data-for="' + _k + '"]').forEach(function (t) { t.style.opacity = '0'; setTimeout(function () { t.remove(); }, 220); });
+                    }
+                }).catch(() => { setState(conflict ? 'conflict' : 'error'); })
+                  .finally(() => {
+                      // A conflict stays up: saving again can't succeed until the page is reloaded
+                      if (conflict) return;
+                      setTimeout(() => { if (saveBtn) { setState('idle'); if (currentEl) positionBtnFor(currentEl); } }, 1300);
+                  });
+            });
+        })();
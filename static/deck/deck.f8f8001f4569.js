@@ -0,0 +1,23 @@
+// Force the image-slot shadow DOM to show full image
+        (function fixImageSlot() {
+            setTimeout(() => {
+                const imageSlot = document.querySelector('#team-2');
+                if (imageSlot && imageSlot.shadowRoot) {
+                    const shadow = imageSlot.shadowRoot;
+                    const img = shadow.querySelector('img');
+                    if (img) {
+                        img.style.width = '50%';
+                        img.style.height = '50%';
+                        img.style.objectFit = 'contain';
+                        img.style.transform = 'none';
+                        img.style.maxWidth = '60%';
+                        img.style.maxHeight = '60%';
+                        img.style.position = 'static';
+                    }
+                    const frame = shadow.querySelector('.frame');
+                    if (frame) {
+                        frame.style.overflow = 'visible';
+                    }
+                }
+            }, 150);
+        })();